@@ -1,4 +1,4 @@
-
+import sys
 
 from glypy.structure.named_structures import monosaccharides, glycans, motifs, monosaccharide_residues
 from glypy.structure import Glycan, Monosaccharide, Substituent, Link, ReducedEnd
@@ -16,3 +16,21 @@ __all__ = [
     "Composition", "GlycanComposition", "MonosaccharideResidue",
     "root", "tree", "OrderedMultiMap", "glycan_composition"
 ]
+
+
+# Subpackages which are not needed to use the core data structures are only
+# imported the first time they are accessed as attributes of this module
+_lazy_submodules = {"io", "plot", "algorithms", "enzyme"}
+
+if sys.version_info < (3, 7):  # pragma: no cover
+    # Module __getattr__ is not supported, so import the subpackages and readers
+    # which have always been available as attributes eagerly
+    from glypy import io, algorithms
+    from glypy.io import glycoct as _glycoct
+
+
+def __getattr__(name):
+    if name in _lazy_submodules:
+        import importlib
+        return importlib.import_module("glypy." + name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -1,3 +1,3 @@
-from .storage import  DistinctGlycanSet
+from .storage import  DistinctGlycanSet, ShardedDistinctGlycanSet
 
-__all__ = ['subtree_search', 'similarity', 'canonicalize', "DistinctGlycanSet"]
+__all__ = ['subtree_search', 'similarity', 'canonicalize', "DistinctGlycanSet", "ShardedDistinctGlycanSet"]
@@ -1,12 +1,25 @@
 import os
+import zlib
 import sqlite3
 import logging
+import binascii
 import functools
-from collections import Counter, Iterable, Callable
+import bisect
+import heapq
+import threading
+import multiprocessing
+from contextlib import contextmanager
+
+try:
+    from urllib.request import pathname2url
+except ImportError:  # pragma: no cover
+    from urllib import pathname2url
+from collections import Counter, Iterable, Iterator, Callable
 
 import glypy
 
-from glypy.utils import pickle, classproperty, make_struct
+from glypy.utils import pickle, classproperty, make_struct, basestring
+from glypy.io.binary import get_codec
 from glypy.io.nomenclature.identity import naive_name_monosaccharide
 from glypy.algorithms import subtree_search
 
@@ -19,6 +32,59 @@ DatabaseEntry = make_struct("DatabaseEntry", ("database", "id"))
 Motif = make_struct("Motif", ("name", "id", "motif_class"))
 
 
+if bytes is str:  # pragma: no cover
+    _binary_types = (bytearray, sqlite3.Binary)
+else:
+    _binary_types = (bytes, bytearray, memoryview)
+
+
+def _sql_literal(value):
+    '''Render `value` as an SQL literal for statements which cannot use bound
+    parameters.
+    '''
+    if value is None:
+        return "NULL"
+    elif isinstance(value, _binary_types):
+        return "X'{}'".format(binascii.hexlify(bytes(value)).decode('ascii'))
+    elif isinstance(value, basestring):
+        return "'{}'".format(value.replace("'", "''"))
+    elif isinstance(value, bool):
+        return str(int(value))
+    return repr(value)
+
+
+# The first byte of a zlib stream with the default window size. Pickles never begin
+# with this byte, so uncompressed payloads from older databases remain readable.
+_ZLIB_HEADER = b'\x78'
+
+
+def _pack_payload(data, compress=True):
+    if compress:
+        data = zlib.compress(data, 1)
+    return sqlite3.Binary(data)
+
+
+def _unpack_payload(data):
+    data = bytes(data)
+    if data[:1] == _ZLIB_HEADER:
+        data = zlib.decompress(data)
+    return data
+
+
+def _render_sql(statement, params):
+    '''Substitute each ``?`` placeholder in `statement` with the literal form
+    of the matching value in `params`.
+    '''
+    parts = statement.split("?")
+    if len(parts) != len(params) + 1:
+        raise ValueError("Expected %d parameters, got %d" % (len(parts) - 1, len(params)))
+    rendered = [parts[0]]
+    for value, part in zip(params, parts[1:]):
+        rendered.append(_sql_literal(value))
+        rendered.append(part)
+    return ''.join(rendered)
+
+
 def _resolve_column_data_mro(cls):
     '''
     Given a class with :attr:`__column_data_map` mangled attributes
@@ -163,11 +229,22 @@ class GlycanRecordBase(object):
 
     The translation to SQL values is carried out by :meth:`.to_sql`, and is restored from
     a query row by :meth:`.from_sql`.
+
+    When :attr:`structure_codec` is set, :attr:`structure` is packed with that
+    :class:`~.StructureCodec` when the record is pickled instead of pickling its
+    object graph, which is both smaller and faster to restore.
     '''
 
     #: Default table name used
     __table_name = "GlycanRecord"
 
+    #: The name of the :class:`~.StructureCodec` used to pack :attr:`structure`
+    #: when pickling this record. If |None|, the structure is pickled directly.
+    structure_codec = None
+
+    #: Whether to compress the pickled record stored in the `structure` column
+    compress_payload = True
+
     #: The default table schema. Additional
     #: items are added on, replacing /*rest*/
     __table_schema__ = '''
@@ -175,7 +252,7 @@ class GlycanRecordBase(object):
     CREATE TABLE {table_name}(
         glycan_id INTEGER UNIQUE PRIMARY KEY NOT NULL,
         mass float NOT NULL,
-        structure TEXT NOT NULL/*rest*/
+        structure BLOB NOT NULL/*rest*/
     );
     '''
 
@@ -249,6 +326,24 @@ class GlycanRecordBase(object):
         for index in cls._collect_ext_indices(kwargs.get("inherits", {})):
             yield index
 
+    @classmethod
+    def upgrade_schema(cls, database):
+        '''
+        Create any tables this record type needs which are missing from `database`,
+        an existing database written by an older version of this class, and fill
+        them from its records.
+
+        Parameters
+        ----------
+        database: :class:`RecordDatabase`
+
+        Returns
+        -------
+        bool:
+            Whether any tables were created
+        '''
+        return False
+
     def __init__(self, structure, motifs=None, dbxref=None, aglycones=None, taxa=None, **kwargs):
         self.structure = structure
         self.motifs = motifs or []
@@ -293,11 +388,29 @@ class GlycanRecordBase(object):
     def __getstate__(self):
         state = dict(self.__dict__)
         state.pop("_bound_db", None)
+        if self.structure_codec is not None:
+            codec = get_codec(self.structure_codec)
+            state['structure'] = codec.pack(self.structure)
+            state['_structure_codec_name'] = codec.name
         return state
 
-    def to_sql(self, id=None, mass_params=None, inherits=None):
+    def __setstate__(self, state):
+        codec_name = state.pop('_structure_codec_name', None)
+        if codec_name is not None:
+            state['structure'] = get_codec(codec_name).unpack(state['structure'])
+        self.__dict__.update(state)
+
+    def _pickle_structure(self):
+        _bound_db = getattr(self, "_bound_db", None)
+        self._bound_db = None
+        try:
+            return _pack_payload(pickle.dumps(self, -1), self.compress_payload)
+        finally:
+            self._bound_db = _bound_db
+
+    def to_sql_parameters(self, id=None, mass_params=None, inherits=None):
         '''
-        Translates the :class:`GlycanRecord` instance into SQL.
+        Translates the :class:`GlycanRecord` instance into parameterized SQL.
 
         Parameters
         ----------
@@ -312,64 +425,80 @@ class GlycanRecordBase(object):
         Yields
         ------
         str:
-            The SQL insert statement adding this record to the database
+            An SQL insert statement using ``?`` placeholders
+        tuple:
+            The values to bind to the statement's placeholders. The pickled
+            record is bound as a BLOB.
         '''
-        inherits = dict(inherits or {})
-        inherits.update(inherits)
-
-        template = '''INSERT INTO {table_name} (glycan_id, mass, structure /*rest*/)
-         VALUES ({id}, {mass}, "{structure}" /*values*/);'''
-        ext_names = ', '.join(inherits)
-        if len(ext_names) > 0:
-            ext_names = ', ' + ext_names
-        ext_values = ', '.join(["{}".format(v) for k, v in self._collect_ext_data().items()])
-        if len(ext_values) > 0:
-            ext_values = ', ' + ext_values
         if id is not None:
             self.id = id
+        ext_data = self._collect_ext_data()
+        ext_names = ''.join(', ' + name for name in ext_data)
+        template = '''INSERT INTO {table_name} (glycan_id, mass, structure{ext_names})
+         VALUES (?, ?, ?{ext_values});'''.format(
+            table_name=self.__table_name, ext_names=ext_names,
+            ext_values=', ?' * len(ext_data))
+        values = [self.id, self.mass(**(mass_params or {})), self._pickle_structure()]
+        values.extend(ext_data.values())
+        yield template, tuple(values)
 
-        template = template.replace("/*rest*/", ext_names).replace("/*values*/", ext_values)
-        values = {}
-        values['id'] = self.id
-        values['mass'] = self.mass(**(mass_params or {}))
-        _bound_db = getattr(self, "_bound_db", None)
-        self._bound_db = None
-        values['structure'] = pickle.dumps(self)
-        self._bound_db = _bound_db
-        values['table_name'] = self.__table_name
-        yield template.format(**values)
-
-    def to_update_sql(self, mass_params=None, inherits=None, *args, **kwargs):
+    def to_sql(self, *args, **kwargs):
         '''
-        Generates SQL for use with ``UPDATE {table_name} set ... where glycan_id = {id};``.
+        Translates the :class:`GlycanRecord` instance into SQL, with all values
+        written inline as literals.
 
-        Called by :meth:`update`
+        Accepts the same arguments as :meth:`to_sql_parameters`, which should be
+        preferred as it allows statements to be executed in bulk.
+
+        Yields
+        ------
+        str:
+            The SQL insert statement adding this record to the database
         '''
+        for statement, params in self.to_sql_parameters(*args, **kwargs):
+            yield _render_sql(statement, params)
 
-        inherits = dict(inherits or {})
-        inherits.update(inherits)
+    def to_update_sql_parameters(self, mass_params=None, inherits=None, *args, **kwargs):
+        '''
+        Generates parameterized SQL for use with ``UPDATE {table_name} set ... where glycan_id = ?;``.
 
-        template = '''UPDATE {table_name} SET mass = {mass},
-         structure = "{structure}" /*rest*/ WHERE glycan_id = {id};'''
+        Called by :meth:`update`
+        '''
+        ext_data = self._collect_ext_data()
+        ext_parts = ''.join(", {} = ?".format(name) for name in ext_data)
+        template = '''UPDATE {table_name} SET mass = ?,
+         structure = ?{ext_parts} WHERE glycan_id = ?;'''.format(
+            table_name=self.__table_name, ext_parts=ext_parts)
+        values = [self.mass(**(mass_params or {})), self._pickle_structure()]
+        values.extend(ext_data.values())
+        values.append(self.id)
+        yield template, tuple(values)
 
-        ext_names = list(inherits)
-        ext_values = ["{}".format(v) for k, v in self._collect_ext_data().items()]
-        ext_parts = ', '.join(["{} = {}".format(name, value) for name, value in zip(ext_names, ext_values)])
-        if len(ext_parts) > 0:
-            ext_parts = ", " + ext_parts
+    def to_update_sql(self, *args, **kwargs):
+        '''
+        Generates SQL for use with ``UPDATE {table_name} set ... where glycan_id = {id};``,
+        with all values written inline as literals.
+        '''
+        for statement, params in self.to_update_sql_parameters(*args, **kwargs):
+            yield _render_sql(statement, params)
 
-        template = template.replace("/*rest*/", ext_parts)
-        values = {}
-        values['id'] = self.id
-        values['mass'] = self.mass(**(mass_params or {}))
-        values['structure'] = pickle.dumps(self)
-        values['table_name'] = self.__table_name
+    def to_delete_sql_parameters(self):
+        '''
+        Generates parameterized SQL removing this record and every row which refers to it.
 
-        yield template.format(**values)
+        Yields
+        ------
+        str:
+            An SQL delete statement using ``?`` placeholders
+        tuple:
+            The values to bind to the statement's placeholders
+        '''
+        yield "DELETE FROM {table_name} WHERE glycan_id = ?;".format(table_name=self.__table_name), (self.id,)
 
     def update(self, mass_params=None, inherits=None, commit=True, *args, **kwargs):
         """Execute SQL ``UPDATE`` instructions, writing this object's values back to the
-        database it was last extracted from.
+        database it was last extracted from. Records extracted from a shard of a
+        :class:`ShardedRecordDatabase` are written back through :meth:`ShardedRecordDatabase.update`.
 
         Parameters
         ----------
@@ -384,9 +513,14 @@ class GlycanRecordBase(object):
         """
         if self._bound_db is None:
             raise ValueError("Cannot commit an unbound record")
+        sharded_database = getattr(self._bound_db, "sharded_database", None)
+        if sharded_database is not None:
+            # The record may need to move to another shard
+            sharded_database.update(self, mass_params=mass_params, inherits=inherits, commit=commit)
+            return
         cur = self._bound_db.cursor()
-        for stmt in self.to_update_sql(mass_params=mass_params, inherits=inherits):
-            cur.execute(stmt)
+        for stmt, params in self.to_update_sql_parameters(mass_params=mass_params, inherits=inherits):
+            cur.execute(stmt, params)
         if commit:
             cur.connection.commit()
 
@@ -424,7 +558,7 @@ class GlycanRecordBase(object):
             more complex operations like decompressing or joining other tables in
             the database.
         '''
-        record = pickle.loads(bytes(row["structure"]))
+        record = pickle.loads(_unpack_payload(row["structure"]))
         record._bound_db = kwargs.get("database")
         return record
 
@@ -476,7 +610,8 @@ def extract_composition(record, max_size=120):
 
     Transforms the resulting, e.g. Counter({u'GlcNA': 6, u'Gal': 4, u'aMan': 2, u'Fuc': 1, u'Man': 1})
     into the string "Gal:4 aMan:2 Fuc:1 GlcNA:6 Man:1" which could be partially matched in
-    queries using SQL's LIKE operator.
+    queries using SQL's LIKE operator. The string is not quoted, as it is bound as a query
+    parameter.
 
     Parameters
     ----------
@@ -495,7 +630,7 @@ def extract_composition(record, max_size=120):
     if sum(map(len, composition_list)) + len(composition_list) > max_size:
         raise ValueError(
             "The resulting composition string is larger than {} characters.".format(max_size))
-    return '\"' + ' '.join(composition_list) + '\"'
+    return ' '.join(composition_list)
 
 
 def _query_composition(prefix=None, **kwargs):
@@ -508,6 +643,69 @@ def _query_composition(prefix=None, **kwargs):
     return ' AND '.join(composition_list)
 
 
+def _motif_name(motif):
+    for attr in ("motif_name", "name"):
+        name = getattr(motif, attr, None)
+        if name is not None:
+            return str(name)
+    return str(motif)
+
+
+def annotate_motifs(record, motifs):
+    '''
+    Add the name of each motif in `motifs` found in `record.structure` to
+    `record.motifs`, if it is not already listed.
+
+    Parameters
+    ----------
+    record: :class:`GlycanRecordBase`
+    motifs: dict or :class:`~.MotifAnnotator`
+        Maps motif names to motif structures, like :data:`glypy.motifs`. When annotating
+        many records, build a :class:`~.MotifAnnotator` once and pass it instead.
+
+    Returns
+    -------
+    list:
+        `record.motifs`
+    '''
+    if not isinstance(motifs, subtree_search.MotifAnnotator):
+        motifs = subtree_search.MotifAnnotator(motifs)
+    present = {_motif_name(motif) for motif in record.motifs}
+    for name in motifs.annotate(record.structure):
+        if name not in present:
+            record.motifs.append(name)
+            present.add(name)
+    return record.motifs
+
+
+def _residue_count_condition(table, residue, value):
+    '''Build an SQL condition and its parameters requiring the count of `residue`
+    in each row of `table` to match `value`, an exact count or an inclusive
+    ``(lower, upper)`` pair where either bound may be |None|.
+    '''
+    if isinstance(value, (tuple, list)):
+        lower, upper = value
+    else:
+        lower = upper = value
+    lower = lower or 0
+    count = ("COALESCE((SELECT rc.count FROM RecordResidueCount rc WHERE rc.glycan_id = "
+             "{table}.glycan_id AND rc.residue = ?), 0)").format(table=table)
+    params = [residue]
+    if lower > 0:
+        # Only records containing the residue can match, so the index on
+        # (residue, count) can drive the search
+        condition = ("{table}.glycan_id IN (SELECT rc.glycan_id FROM RecordResidueCount rc "
+                     "WHERE rc.residue = ? AND rc.count >= ?").format(table=table)
+        params = [residue, lower]
+        if upper is not None:
+            condition += " AND rc.count <= ?"
+            params.append(upper)
+        return condition + ")", params
+    if upper is None:
+        return "1", []
+    return count + " <= ?", params + [upper]
+
+
 def is_n_glycan(record):
     '''
     A predicate testing if the :title:`N-linked Glycan` core motif is present in `record.structure`.
@@ -528,7 +726,7 @@ n_glycan_core = glypy.glycans["N-Linked Core"]
 
 @column_data("composition", "VARCHAR(120)", extract_composition)
 @column_data("is_n_glycan", "BOOLEAN", is_n_glycan)
-@column_data("glycoct", "TEXT", lambda x: "\"{}\"".format(str(x.structure)))
+@column_data("glycoct", "TEXT", lambda x: str(x.structure))
 class GlycanRecord(GlycanRecordBase):
     '''
     An extension of :class:`GlycanRecordBase` to add additional features and better support for extension
@@ -537,12 +735,92 @@ class GlycanRecord(GlycanRecordBase):
 
     __column_data_map = {}
 
+    __side_table_schema__ = '''
+    DROP TABLE IF EXISTS RecordResidueCount;
+    CREATE TABLE RecordResidueCount(
+        glycan_id INTEGER NOT NULL,
+        residue VARCHAR(40) NOT NULL,
+        count INTEGER NOT NULL
+    );
+    DROP TABLE IF EXISTS RecordMotif;
+    CREATE TABLE RecordMotif(
+        glycan_id INTEGER NOT NULL,
+        motif TEXT NOT NULL
+    );
+    '''
+
+    __side_tables__ = ("RecordResidueCount", "RecordMotif")
+
     @querymethod
     def query_like_composition(cls, conn, record=None, prefix=None):
         stmt = "SELECT * FROM {table_name} WHERE " + _query_composition(prefix, **record.monosaccharides) + ";"
         for result in conn.from_sql(conn.execute(stmt)):
             yield result
 
+    @querymethod
+    def query_by_residue_counts(cls, conn, counts=None, exact=False, **kwargs):
+        '''
+        Find records by the counts of each residue in :attr:`monosaccharides`,
+        using the indexed ``RecordResidueCount`` table.
+
+        .. code-block:: python
+
+            # At least four HexNAc and exactly one dHex
+            db.query_by_residue_counts({"HexNAc": (4, None), "dHex": 1})
+            # Exactly this composition and nothing else
+            db.query_by_residue_counts({"Hex": 5, "HexNAc": 2}, exact=True)
+
+        Parameters
+        ----------
+        counts: dict
+            Maps residue names to either an exact count or an inclusive ``(lower, upper)``
+            range, where either bound may be |None|. Residue names may also be passed as
+            keyword arguments.
+        exact: bool
+            If |True|, records containing any residue not named in `counts` are excluded
+
+        Yields
+        ------
+        :attr:`RecordDatabase.record_type`
+        '''
+        counts = dict(counts or {}, **kwargs)
+        table = conn.record_type.table_name
+        conditions = []
+        params = []
+        for residue, value in sorted(counts.items()):
+            condition, condition_params = _residue_count_condition(table, residue, value)
+            conditions.append(condition)
+            params.extend(condition_params)
+        if exact:
+            conditions.append(
+                "NOT EXISTS (SELECT 1 FROM RecordResidueCount rc WHERE rc.glycan_id = {table}.glycan_id"
+                " AND rc.residue NOT IN ({names}))".format(table=table, names=", ".join("?" * len(counts))))
+            params.extend(sorted(counts))
+        stmt = "SELECT * FROM {table_name} WHERE " + (" AND ".join(conditions) or "1") + ";"
+        for result in conn.from_sql(conn.execute(stmt, tuple(params))):
+            yield result
+
+    @querymethod
+    def query_by_motif(cls, conn, *motifs):
+        '''
+        Find records which contain every motif in `motifs`, using the indexed
+        ``RecordMotif`` table.
+
+        Parameters
+        ----------
+        *motifs: str or motif
+            The motifs to require, by name
+
+        Yields
+        ------
+        :attr:`RecordDatabase.record_type`
+        '''
+        names = [_motif_name(motif) for motif in motifs]
+        stmt = "SELECT * FROM {table_name} WHERE " + (" AND ".join(
+            "glycan_id IN (SELECT glycan_id FROM RecordMotif WHERE motif = ?)" for name in names) or "1") + ";"
+        for result in conn.from_sql(conn.execute(stmt, tuple(names))):
+            yield result
+
     @classmethod
     def add_index(cls, *args, **kwargs):
         '''
@@ -557,6 +835,31 @@ class GlycanRecord(GlycanRecordBase):
             yield stmt
         for stmt in cls._collect_ext_indices(kwargs.get("inherits", {})):
             yield stmt
+        yield "CREATE INDEX IF NOT EXISTS ResidueCountIndex ON RecordResidueCount(residue, count);"
+        yield "CREATE INDEX IF NOT EXISTS ResidueCountIndex2 ON RecordResidueCount(glycan_id, residue);"
+        yield "CREATE INDEX IF NOT EXISTS MotifIndex ON RecordMotif(motif);"
+        yield "CREATE INDEX IF NOT EXISTS MotifIndex2 ON RecordMotif(glycan_id);"
+
+    @classmethod
+    def upgrade_schema(cls, database):
+        existing = {row[0] for row in database.execute("SELECT name FROM sqlite_master WHERE type = 'table';")}
+        if cls.table_name not in existing or all(name in existing for name in cls.__side_tables__):
+            return False
+        # The side tables are derived entirely from the records, so rebuild them together
+        database.executescript(cls.__side_table_schema__)
+        with database.transaction():
+            for record in database:
+                for stmt, params in record._side_table_parameters():
+                    database.execute(stmt, params)
+        database.apply_indices()
+        return True
+
+    def _side_table_parameters(self):
+        for residue, count in sorted(self.monosaccharides.items()):
+            yield "INSERT INTO RecordResidueCount (glycan_id, residue, count) VALUES (?, ?, ?);", (
+                self.id, residue, count)
+        for name in sorted({_motif_name(motif) for motif in self.motifs}):
+            yield "INSERT INTO RecordMotif (glycan_id, motif) VALUES (?, ?);", (self.id, name)
 
     @property
     def monosaccharides(self):
@@ -595,22 +898,36 @@ class GlycanRecord(GlycanRecordBase):
     def sql_schema(cls, *args, **kwargs):
         meta_map = dict(cls.__column_data_map)
         meta_map.update(kwargs.pop("inherits", {}))
-        return super(GlycanRecord, cls).sql_schema(inherits=_resolve_column_data_mro(cls))
+        for line in super(GlycanRecord, cls).sql_schema(inherits=_resolve_column_data_mro(cls)):
+            yield line
+        yield cls.__side_table_schema__
 
-    def to_sql(self, *args, **kwargs):
-        inherits = _resolve_column_data_mro(self.__class__)
-        return super(GlycanRecord, self).to_sql(*args, inherits=inherits, **kwargs)
+    def to_sql_parameters(self, *args, **kwargs):
+        kwargs['inherits'] = _resolve_column_data_mro(self.__class__)
+        for line in super(GlycanRecord, self).to_sql_parameters(*args, **kwargs):
+            yield line
+        for line in self._side_table_parameters():
+            yield line
 
-    def to_update_sql(self, *args, **kwargs):
-        inherits = _resolve_column_data_mro(self.__class__)
-        inherits = inherits or _resolve_column_data_mro(self.__class__)
-        kwargs['inherits'] = inherits
-        return super(GlycanRecord, self).to_update_sql(*args, **kwargs)
+    def to_update_sql_parameters(self, *args, **kwargs):
+        kwargs['inherits'] = kwargs.get('inherits') or _resolve_column_data_mro(self.__class__)
+        for line in super(GlycanRecord, self).to_update_sql_parameters(*args, **kwargs):
+            yield line
+        yield "DELETE FROM RecordResidueCount WHERE glycan_id = ?;", (self.id,)
+        yield "DELETE FROM RecordMotif WHERE glycan_id = ?;", (self.id,)
+        for line in self._side_table_parameters():
+            yield line
+
+    def to_delete_sql_parameters(self):
+        for line in super(GlycanRecord, self).to_delete_sql_parameters():
+            yield line
+        yield "DELETE FROM RecordResidueCount WHERE glycan_id = ?;", (self.id,)
+        yield "DELETE FROM RecordMotif WHERE glycan_id = ?;", (self.id,)
 
     def update(self, mass_params=None, inherits=None, commit=True, *args, **kwargs):
         inherits = inherits or _resolve_column_data_mro(self.__class__)
         kwargs['inherits'] = inherits
-        super(GlycanRecord, self).update(mass_params=mass_params, *args, **kwargs)
+        super(GlycanRecord, self).update(mass_params=mass_params, commit=commit, *args, **kwargs)
 
     def _collect_ext_data(self):
         inherits = _resolve_column_data_mro(self.__class__)
@@ -646,13 +963,18 @@ class GlycanRecordWithTaxon(GlycanRecord):
         yield "CREATE INDEX IF NOT EXISTS TaxonomyIndex ON RecordTaxonomy(taxon_id);"
         yield "CREATE INDEX IF NOT EXISTS TaxonomyIndex2 ON RecordTaxonomy(glycan_id);"
 
-    def to_sql(self, *args, **kwargs):
-        for line in super(GlycanRecordWithTaxon, self).to_sql(*args, **kwargs):
+    def to_sql_parameters(self, *args, **kwargs):
+        for line in super(GlycanRecordWithTaxon, self).to_sql_parameters(*args, **kwargs):
             yield line
         for taxon in self.taxa:
-            yield "INSERT OR REPLACE INTO RecordTaxonomy (glycan_id, taxon_id) VALUES ({}, {});".format(
+            yield "INSERT OR REPLACE INTO RecordTaxonomy (glycan_id, taxon_id) VALUES (?, ?);", (
                 self.id, int(taxon.tax_id))
 
+    def to_delete_sql_parameters(self):
+        for line in super(GlycanRecordWithTaxon, self).to_delete_sql_parameters():
+            yield line
+        yield "DELETE FROM RecordTaxonomy WHERE glycan_id = ?;", (self.id,)
+
     @querymethod
     def query_by_taxon_id(cls, conn, taxon_ids):
         # Passed an iterable of taxa to search
@@ -674,6 +996,100 @@ class GlycanRecordWithTaxon(GlycanRecord):
                 (int(taxon_ids),)))
 
 
+def _connect_read_only(path):
+    '''Open a read-only connection to the database file at `path` which may be used
+    from threads other than the one which opened it.
+    '''
+    if path == ":memory:":
+        raise ValueError("A private in-memory database cannot be opened read-only")
+    uri = "file:{}?mode=ro".format(pathname2url(os.path.abspath(path)))
+    try:
+        return sqlite3.connect(uri, uri=True, check_same_thread=False)
+    except TypeError:
+        # Python 2's sqlite3 does not accept URIs, so refuse writes on the connection instead
+        if not os.path.exists(path):
+            raise sqlite3.OperationalError("unable to open database file")
+        connection = sqlite3.connect(path, check_same_thread=False)
+        connection.execute("PRAGMA query_only = ON")
+        return connection
+
+
+class RecordView(object):
+    '''
+    A lightweight view of a row of a :class:`RecordDatabase` table.
+
+    Column values are read directly from the row with ``view[column]``. Any
+    other attribute access unpickles the stored record on first use, or fetches
+    it by id if the `structure` column was not selected, and forwards to it.
+
+    Attributes
+    ----------
+    id: int
+        The record's primary key
+    record: :class:`GlycanRecordBase`
+        The record, loaded on first access
+    '''
+
+    __slots__ = ("_row", "_database", "_record")
+
+    def __init__(self, row, database):
+        self._row = row
+        self._database = database
+        self._record = None
+
+    @property
+    def id(self):
+        return self._row["glycan_id"]
+
+    def keys(self):
+        return self._row.keys()
+
+    def __getitem__(self, key):
+        return self._row[key]
+
+    def __contains__(self, key):
+        return key in self._row.keys()
+
+    @property
+    def record(self):
+        if self._record is None:
+            if "structure" in self._row.keys():
+                record = self._database.record_type.from_sql(self._row, database=self._database)
+                self._database.bind(record)
+            else:
+                record = self._database[self.id]
+            self._record = record
+        return self._record
+
+    def is_loaded(self):
+        return self._record is not None
+
+    def mass(self, *args, **kwargs):
+        '''Returns the stored mass without loading the record when called without
+        arguments, otherwise calls :meth:`GlycanRecordBase.mass` on :attr:`record`.
+        '''
+        if not args and not kwargs and "mass" in self._row.keys():
+            return self._row["mass"]
+        return self.record.mass(*args, **kwargs)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.record, name)
+
+    def __eq__(self, other):
+        if isinstance(other, RecordView):
+            other = other.record
+        return self.record == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "RecordView(%s)" % (", ".join(
+            "%s=%r" % (key, self._row[key]) for key in self._row.keys() if key != "structure"),)
+
+
 class RecordDatabase(object):
     '''
     A wrapper around an Sqlite3 database for storing and searching GlycanRecord
@@ -709,8 +1125,36 @@ class RecordDatabase(object):
         The class type of the records assumed to be stored in this database. Defaults to :class:`GlycanRecord`
     records: list
         A list of `record_type` records to insert immediately on table creation.
+    flag: str
+        "c" to open or create the database, "w" to replace any existing tables, or
+        "r" to open an existing database read-only. Read-only connections may be used
+        from any thread.
+    structure_codec: str or :class:`~.StructureCodec`, optional
+        If provided, the codec records loaded through :meth:`load_data` use to
+        pack their structures. See :attr:`GlycanRecordBase.structure_codec`
+    check_same_thread: bool
+        Whether the connection may only be used by the thread which created it. Callers
+        which disable this are responsible for serializing access to the connection.
+    motif_index: dict or :class:`~.MotifAnnotator`, optional
+        If provided, a mapping of motif names to motif structures, like :data:`glypy.motifs`,
+        used to annotate each record loaded through :meth:`load_data` with :func:`annotate_motifs`
+    journal_mode: str, optional
+        If provided, the SQLite ``journal_mode`` to use, e.g. ``"WAL"``. See :meth:`set_pragmas`
+    synchronous: str, optional
+        If provided, the SQLite ``synchronous`` level to use, e.g. ``"NORMAL"``. See :meth:`set_pragmas`
     '''
-    def __init__(self, connection_string=":memory:", record_type=GlycanRecord, records=None, flag='c'):
+
+    #: The number of records inserted with each call to :meth:`sqlite3.Connection.executemany`
+    #: by :meth:`load_data`
+    batch_size = 1000
+
+    #: The :class:`ShardedRecordDatabase` this database is a shard of, if any. Records
+    #: bound to a shard are written back through it.
+    sharded_database = None
+
+    def __init__(self, connection_string=":memory:", record_type=GlycanRecord, records=None, flag='c',
+                 structure_codec=None, journal_mode=None, synchronous=None, motif_index=None,
+                 check_same_thread=True):
 
         created_new = False
         if connection_string == ":memory:" or not os.path.exists(connection_string):
@@ -722,11 +1166,23 @@ class RecordDatabase(object):
         elif flag == "w":
             created_new = True
             # If 'w', clear the table before taking any operations
+        elif flag == "r":
+            created_new = False
+            # If 'r', open an existing database without permission to write to it
 
         self.connection_string = connection_string
-        self.connection = sqlite3.connect(connection_string)
+        self.structure_codec = structure_codec
+        self.motif_index = motif_index
+        self.mass_index = None
+        self.substructure_index = None
+        self.flag = flag
+        if flag == "r":
+            self.connection = _connect_read_only(connection_string)
+        else:
+            self.connection = sqlite3.connect(connection_string, check_same_thread=check_same_thread)
         self.connection.row_factory = sqlite3.Row
         self.cursor = self.connection.cursor
+        self.set_pragmas(journal_mode=journal_mode, synchronous=synchronous)
 
         # Check to see if the record type matches what is already
         # stored in the database.
@@ -757,6 +1213,8 @@ class RecordDatabase(object):
             self.apply_schema()
         else:
             self._id = len(self)
+            if flag != "r":
+                self.record_type.upgrade_schema(self)
         try:
             self._patch_querymethods()
         except Exception as e:
@@ -795,36 +1253,130 @@ class RecordDatabase(object):
             self.execute(ix_stmt)
         self.commit()
 
-    def load_data(self, record_list, commit=True, set_id=True, cast=True, **kwargs):
+    _journal_modes = ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF")
+    _synchronous_levels = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+    def set_pragmas(self, journal_mode=None, synchronous=None):
+        '''
+        Configure how SQLite writes changes to disk. Relaxing these settings makes bulk
+        loading much faster at the cost of durability if the machine fails mid-write.
+
+        Parameters
+        ----------
+        journal_mode: str, optional
+            One of "DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL" or "OFF". "WAL" allows
+            readers to continue while a write is in progress.
+        synchronous: str, optional
+            One of "OFF", "NORMAL", "FULL" or "EXTRA".
+
+        Raises
+        ------
+        ValueError:
+            If an unrecognized value is given
+        '''
+        if journal_mode is not None:
+            journal_mode = str(journal_mode).upper()
+            if journal_mode not in self._journal_modes:
+                raise ValueError("Unknown journal_mode %r" % (journal_mode,))
+            self.connection.execute("PRAGMA journal_mode = %s;" % (journal_mode,)).fetchall()
+        if synchronous is not None:
+            synchronous = str(synchronous).upper()
+            if synchronous not in self._synchronous_levels:
+                raise ValueError("Unknown synchronous level %r" % (synchronous,))
+            self.connection.execute("PRAGMA synchronous = %s;" % (synchronous,))
+
+    @contextmanager
+    def transaction(self):
+        '''
+        A context manager which commits all changes made within it together, or rolls
+        them all back if an exception is raised.
+
+        .. code-block:: python
+
+            with db.transaction():
+                db.load_data(records, commit=False)
+                db.set_metadata("source", "glycomedb")
+        '''
+        try:
+            yield self
+        except Exception:
+            self.rollback()
+            raise
+        else:
+            self.commit()
+
+    def _prepare_records(self, record_list, set_id, cast):
+        codec_name = None
+        if self.structure_codec is not None:
+            codec_name = get_codec(self.structure_codec).name
+        motif_annotator = self.motif_index
+        if motif_annotator is not None and not isinstance(motif_annotator, subtree_search.MotifAnnotator):
+            motif_annotator = subtree_search.MotifAnnotator(motif_annotator)
+        for record in record_list:
+            if set_id:
+                self._id += 1
+                record.id = self._id
+            if cast and not isinstance(record, self.record_type):
+                record = self.record_type.replicate(record)
+            if codec_name is not None:
+                record.structure_codec = codec_name
+            if motif_annotator is not None:
+                annotate_motifs(record, motif_annotator)
+            yield record
+
+    def _insert_batch(self, batch, **kwargs):
+        statements = {}
+        for record in batch:
+            for statement, params in record.to_sql_parameters(**kwargs):
+                try:
+                    statements[statement].append(params)
+                except KeyError:
+                    statements[statement] = [params]
+        for statement, param_list in statements.items():
+            self.connection.executemany(statement, param_list)
+
+    def load_data(self, record_list, commit=True, set_id=True, cast=True, batch_size=None, **kwargs):
         '''
         Given an iterable of :attr:`.record_type` objects,
         assign each a primary key value and insert them into the
         database.
 
-        Forwards all ``**kwargs`` to :meth:`to_sql` calls.
+        Records are inserted in batches of `batch_size` using bound parameters and
+        :meth:`sqlite3.Connection.executemany`, with the pickled records stored as BLOBs.
+
+        Forwards all ``**kwargs`` to :meth:`to_sql_parameters` calls.
 
         Parameters
         ----------
         record_list: GlycanRecord or iterable of GlycanRecords
         commit: bool
-            Whether or not to commit all changes to the database
+            Whether or not to commit all changes to the database. If |True|,
+            any error will roll back the whole load.
         set_id: bool
         cast: bool
+        batch_size: int, optional
+            The number of records to insert at a time. Defaults to :attr:`batch_size`
         '''
-        if not isinstance(record_list, Iterable):
+        if not isinstance(record_list, Iterable) or isinstance(record_list, GlycanRecordBase):
             record_list = [record_list]
-        for record in record_list:
-            if set_id:
-                self._id += 1
-                record.id = self._id
-            if cast and not isinstance(record, self.record_type):
-                record = self.record_type.replicate(record)
-            for stmt in record.to_sql(**kwargs):
-                try:
-                    self.connection.execute(stmt)
-                except:
-                    print(stmt)
-                    raise
+        if batch_size is None:
+            batch_size = self.batch_size
+        # The in-memory indices are snapshots which would miss the new records
+        self.mass_index = None
+        self.substructure_index = None
+        try:
+            batch = []
+            for record in self._prepare_records(record_list, set_id, cast):
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    self._insert_batch(batch, **kwargs)
+                    batch = []
+            if batch:
+                self._insert_batch(batch, **kwargs)
+        except Exception:
+            if commit:
+                self.rollback()
+            raise
         if commit:
             self.commit()
 
@@ -884,7 +1436,7 @@ class RecordDatabase(object):
         -------
         int
         """
-        res = (self.execute("SELECT count(glycan_id) FROM {table_name};").next())["count(glycan_id)"]
+        res = next(self.execute("SELECT count(glycan_id) FROM {table_name};"))["count(glycan_id)"]
         return res or 0
 
     def create(self, structure, *args, **kwargs):
@@ -928,7 +1480,7 @@ class RecordDatabase(object):
 
             results = list(self.from_sql(
                 self.execute(
-                    "SELECT * FROM {table_name} WHERE glycan_id BETWEEN ? AND ?", begin, end)))
+                    "SELECT * FROM {table_name} WHERE glycan_id BETWEEN ? AND ?", (begin, end))))
         elif key_type is tuple:
             group = tuple(map(int, keys))
             if len(group) == 1:
@@ -1016,19 +1568,256 @@ class RecordDatabase(object):
         spread = mass * tolerance
         return (mass - spread, mass + spread)
 
-    def ppm_match_tolerance_search(self, mass, tolerance, mass_shift=0):
+    def ppm_match_tolerance_search(self, mass, tolerance, mass_shift=0, lazy=False):
         '''
         Rapidly search the database for entries with a recorded mass within
         ``tolerance`` parts per million mass error of ``mass``.
 
         :math:`[mass - (tolerance * mass), mass + (tolerance * mass)]`
 
+        If `lazy` is |True|, :class:`RecordView` objects are yielded instead
+        of records, deferring unpickling until each record is used.
         '''
         lower, upper = self._find_boundaries(mass + mass_shift, tolerance)
         results = self.execute("SELECT * FROM {table_name}\
          WHERE mass BETWEEN ? AND ?;", (lower, upper))
-        for result in results:
-            yield self.record_type.from_sql(result, database=self)
+        if lazy:
+            for result in results:
+                yield RecordView(result, self)
+        else:
+            for result in results:
+                yield self.record_type.from_sql(result, database=self)
+
+    def build_mass_index(self):
+        '''
+        Build an in-memory :class:`~.MassIndex` over the masses of all records
+        currently in the database and store it in :attr:`mass_index`. Requires
+        :mod:`numpy`.
+
+        The index is a snapshot. It is discarded by :meth:`load_data`, and must be
+        rebuilt to reflect records changed in place with :meth:`~.GlycanRecordBase.update`.
+
+        Returns
+        -------
+        :class:`~.MassIndex`
+        '''
+        from glypy.algorithms.mass_index import MassIndex
+        self.mass_index = MassIndex.from_database(self)
+        return self.mass_index
+
+    def ppm_match_tolerance_search_many(self, masses, tolerance, mass_shifts=(0,)):
+        '''
+        Search for many masses and mass shifts at once using :attr:`mass_index`,
+        building it first if necessary.
+
+        Parameters
+        ----------
+        masses: array-like
+            The query masses
+        tolerance: float
+            The relative mass error tolerance, as in :meth:`ppm_match_tolerance_search`
+        mass_shifts: array-like
+            The mass shifts to apply to every query mass
+
+        Returns
+        -------
+        :class:`~.MassSearchResult`
+            The matched ids and mass errors. Records are only loaded when
+            :meth:`~.MassSearchResult.records` is called.
+        '''
+        if self.mass_index is None:
+            self.build_mass_index()
+        return self.mass_index.search(masses, tolerance, mass_shifts)
+
+    def build_substructure_index(self, processes=None):
+        '''
+        Build an in-memory :class:`~.SubstructureIndex` of the screening features of
+        all records currently in the database and store it in :attr:`substructure_index`.
+
+        The index is a snapshot. It is discarded by :meth:`load_data`, and must be
+        rebuilt to reflect records changed in place with :meth:`~.GlycanRecordBase.update`.
+
+        Parameters
+        ----------
+        processes: int, optional
+            The number of worker processes to compute the features with. See :meth:`map`
+
+        Returns
+        -------
+        :class:`~.SubstructureIndex`
+        '''
+        self.substructure_index = subtree_search.SubstructureIndex.from_database(self, processes=processes)
+        return self.substructure_index
+
+    def substructure_search(self, query, exact=False, include_substituents=True, tolerance=0):
+        '''
+        Find the records whose structures contain `query`, as tested by
+        :func:`~.subtree_of`, using :attr:`substructure_index` to skip records which
+        cannot contain it, building the index first if necessary.
+
+        Parameters
+        ----------
+        query: :class:`~.Glycan`
+            The structure to search for
+        exact: bool
+            Whether to use :func:`~.exact_ordering_inclusion`
+        include_substituents: bool
+            Whether to compare substituents
+        tolerance: int
+            The similarity error to tolerate
+
+        Returns
+        -------
+        :class:`list` of :attr:`record_type`
+        '''
+        if self.substructure_index is None:
+            self.build_substructure_index()
+        candidates = self.substructure_index.candidates(
+            query, exact=exact, include_substituents=include_substituents, tolerance=tolerance)
+        if not candidates:
+            return []
+        records = self[candidates]
+        if not isinstance(records, list):
+            records = [records]
+        return [record for record in records if subtree_search.subtree_of(
+            query, record.structure, exact=exact, include_substituents=include_substituents,
+            tolerance=tolerance) is not None]
+
+    def read_pool(self, max_workers=4):
+        '''Create a :class:`RecordDatabaseReadPool` of read-only connections to this
+        database's file. Pending changes should be committed first to be visible
+        to the pool.
+
+        Returns
+        -------
+        :class:`RecordDatabaseReadPool`
+        '''
+        return RecordDatabaseReadPool(self.connection_string, self.record_type, max_workers)
+
+    def _id_ranges(self, chunk_size):
+        ids = [row[0] for row in self.execute("SELECT glycan_id FROM {table_name} ORDER BY glycan_id;")]
+        return [(ids[i], ids[min(i + chunk_size, len(ids)) - 1]) for i in range(0, len(ids), chunk_size)]
+
+    def map(self, fn, processes=None, chunk_size=500, ordered=True, write_back=False):
+        '''
+        Apply `fn` to every record in the database, optionally spreading the work
+        across worker processes.
+
+        The records are split into ranges of `chunk_size` consecutive ids. Each worker
+        process opens its own read-only connection and loads and processes one range
+        at a time, so records are never sent to the workers.
+
+        Parameters
+        ----------
+        fn: callable
+            A function taking a record. When using worker processes it must be
+            picklable, i.e. defined at module level.
+        processes: int, optional
+            The number of worker processes to use. If |None| or 1, records are processed
+            in this process.
+        chunk_size: int
+            The number of records each worker loads at a time
+        ordered: bool
+            Whether results are yielded in order of record id, or as soon as each
+            chunk is finished
+        write_back: bool
+            If |True|, `fn` should return the record after modifying it, or |None| to leave
+            it unchanged. Each returned record is written to the database with :meth:`~.GlycanRecordBase.update`,
+            one transaction per chunk, and :attr:`mass_index` and :attr:`substructure_index` are discarded.
+
+        Yields
+        ------
+        tuple:
+            The id of each record and the value returned by `fn` for it
+        '''
+        # Workers read through their own connections, so they can only see committed data
+        self.commit()
+        id_ranges = self._id_ranges(chunk_size)
+        if processes is None or processes <= 1:
+            chunks = (_map_chunk(self, fn, id_range) for id_range in id_ranges)
+            pool = None
+        else:
+            if self.connection_string == ":memory:":
+                raise ValueError("A private in-memory database cannot be read by worker processes")
+            pool = multiprocessing.Pool(
+                processes, _map_worker_init, (self.connection_string, self.record_type))
+            work = [(fn, id_range) for id_range in id_ranges]
+            if ordered:
+                chunks = pool.imap(_map_worker, work)
+            else:
+                chunks = pool.imap_unordered(_map_worker, work)
+        try:
+            for chunk in chunks:
+                if write_back:
+                    # The in-memory indices are snapshots which would miss the changes
+                    self.mass_index = None
+                    self.substructure_index = None
+                    with self.transaction():
+                        for _glycan_id, record in chunk:
+                            if record is not None:
+                                self.bind(record)
+                                record.update(commit=False)
+                for item in chunk:
+                    yield item
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+    def _column_names(self):
+        return [row[1] for row in self.execute("PRAGMA table_info({table_name});")]
+
+    def select(self, columns=None, where=None, params=(), order_by=None, limit=None):
+        '''
+        Query the main table, yielding a :class:`RecordView` for each row.
+
+        Only the requested `columns` are read, and the stored record is not
+        unpickled unless an attribute of the record is accessed through the view.
+
+        Parameters
+        ----------
+        columns: list of str, optional
+            The columns to read. `glycan_id` is always included. If |None|,
+            all columns are read.
+        where: str, optional
+            An SQL condition, which may use ``?`` placeholders and the {table_name}
+            token
+        params: tuple, optional
+            The values to bind to the placeholders in `where`
+        order_by: str, optional
+            An SQL ordering expression
+        limit: int, optional
+            The maximum number of rows to return
+
+        Yields
+        ------
+        :class:`RecordView`
+
+        Raises
+        ------
+        ValueError:
+            If an unknown column is requested
+        '''
+        if columns is None:
+            projection = "*"
+        else:
+            columns = list(columns)
+            known = set(self._column_names())
+            for column in columns:
+                if column not in known:
+                    raise ValueError("Unknown column %r" % (column,))
+            if "glycan_id" not in columns:
+                columns.insert(0, "glycan_id")
+            projection = ", ".join(columns)
+        query = ["SELECT", projection, "FROM {table_name}"]
+        if where:
+            query.append("WHERE " + where)
+        if order_by:
+            query.append("ORDER BY " + order_by)
+        if limit is not None:
+            query.append("LIMIT %d" % (int(limit),))
+        for row in self.execute(" ".join(query) + ";", tuple(params)):
+            yield RecordView(row, self)
 
     def from_sql(self, rows, from_sql_fn=None):
         """Convenience function to convert `rows` into objects through `from_sql_fn`,
@@ -1054,5 +1843,579 @@ class RecordDatabase(object):
             self.bind(record)
             yield record
 
+
+class ShardedRecordDatabase(object):
+    '''
+    A collection of :class:`RecordDatabase` shards, each stored in its own SQLite file,
+    presenting the same interface as a single :class:`RecordDatabase`.
+
+    Records are assigned to shards either by their id (``partition="id"``) or by their
+    mass (``partition="mass"``) given a list of boundary masses. Queries are run against
+    every relevant shard concurrently on a thread pool, and their results are merged.
+    Query methods of :attr:`record_type` are bound onto the instance just as they are for
+    :class:`RecordDatabase`, fanning out across the shards.
+
+    The partitioning scheme is stored in each shard's metadata, so an existing sharded
+    database can be re-opened given just its path and `n_shards`.
+
+    Records read from a shard are bound to it, and writing one back with
+    :meth:`~.GlycanRecordBase.update` goes through :meth:`update`, which moves it to
+    another shard if its mass has crossed a boundary.
+
+    :meth:`~RecordDatabase.execute`, :meth:`~RecordDatabase.map`, :meth:`~RecordDatabase.read_pool`,
+    :meth:`~RecordDatabase.ppm_match_tolerance_search_many` and :meth:`~RecordDatabase.substructure_search`
+    are not available. Use :meth:`fan_out` to run them on each shard.
+
+    Parameters
+    ----------
+    connection_string: str
+        The base path for the shard files. Shard ``i`` is stored at ``"{connection_string}.shard-{i}"``.
+        ":memory:" keeps each shard in its own in-memory database.
+    record_type: type
+        The record type stored in every shard. Defaults to :class:`GlycanRecord`
+    records: list, optional
+        Records to insert immediately
+    flag: str
+        As in :class:`RecordDatabase`
+    n_shards: int
+        The number of shards
+    partition: str
+        Either "id" to assign records by ``id % n_shards`` or "mass" to assign records
+        by mass range
+    mass_boundaries: list of float, optional
+        The ``n_shards - 1`` ascending masses dividing the shards when ``partition="mass"``
+    max_workers: int, optional
+        The number of threads used to query shards. Defaults to `n_shards`
+    **kwargs:
+        Forwarded to each :class:`RecordDatabase`
+    '''
+
+    _sharding_key = "_sharding"
+
+    def __init__(self, connection_string=":memory:", record_type=GlycanRecord, records=None, flag='c',
+                 n_shards=4, partition="id", mass_boundaries=None, max_workers=None, **kwargs):
+        self.connection_string = connection_string
+        kwargs['check_same_thread'] = False
+        self.shards = [
+            RecordDatabase(self._shard_path(i), record_type=record_type, flag=flag, **kwargs)
+            for i in range(n_shards)]
+        self.record_type = self.shards[0].record_type
+        for shard in self.shards:
+            shard.sharded_database = self
+        self._locks = [threading.Lock() for _ in self.shards]
+        self.max_workers = max_workers or n_shards
+        self._executor = None
+
+        stored = None
+        if flag != 'w':
+            try:
+                stored = self.shards[0].get_metadata(self._sharding_key)
+            except (KeyError, sqlite3.OperationalError):
+                stored = None
+        if stored is not None:
+            partition = stored['partition']
+            mass_boundaries = stored['mass_boundaries']
+            if stored['n_shards'] != n_shards:
+                raise ValueError("The database has %d shards, not %d" % (stored['n_shards'], n_shards))
+        if partition not in ("id", "mass"):
+            raise ValueError("Unknown partition scheme %r" % (partition,))
+        if partition == "mass":
+            if mass_boundaries is None or len(mass_boundaries) != n_shards - 1:
+                raise ValueError("Mass partitioning requires %d mass boundaries" % (n_shards - 1,))
+            mass_boundaries = sorted(mass_boundaries)
+        self.partition = partition
+        self.mass_boundaries = mass_boundaries
+        if stored is None:
+            for shard in self.shards:
+                shard.set_metadata(self._sharding_key, {
+                    "partition": partition, "mass_boundaries": mass_boundaries, "n_shards": n_shards})
+
+        self._id = 0
+        for shard in self.shards:
+            for row in shard.execute("SELECT max(glycan_id) FROM {table_name};"):
+                self._id = max(self._id, row[0] or 0)
+        if records is not None:
+            self.load_data(records)
+            self.apply_indices()
+        self._patch_querymethods()
+
+    def _shard_path(self, i):
+        if self.connection_string == ":memory:":
+            return ":memory:"
+        return "{}.shard-{}".format(self.connection_string, i)
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def _call_shard(self, i, fn, args, kwargs):
+        with self._locks[i]:
+            result = fn(self.shards[i], *args, **kwargs)
+            # Rows must be consumed while this thread holds the shard
+            if isinstance(result, (sqlite3.Cursor, Iterator)):
+                result = list(result)
+            return result
+
+    def fan_out(self, fn, *args, **kwargs):
+        '''
+        Call ``fn(shard, *args, **kwargs)`` for every shard concurrently.
+
+        Parameters
+        ----------
+        fn: callable
+        shards: list of int, optional
+            Passed as a keyword argument, the indices of the shards to call. Defaults to all shards.
+
+        Returns
+        -------
+        list:
+            The result for each shard in order. Iterator results are collected into lists.
+        '''
+        shards = kwargs.pop("shards", None)
+        if shards is None:
+            shards = range(len(self.shards))
+        shards = list(shards)
+        if len(shards) == 1:
+            return [self._call_shard(shards[0], fn, args, kwargs)]
+        futures = [self.executor.submit(self._call_shard, i, fn, args, kwargs) for i in shards]
+        return [future.result() for future in futures]
+
+    def _fan_out_groups(self, fn, groups):
+        # Call fn(shard, group) for each shard index and group in `groups`
+        if not groups:
+            return []
+        futures = [self.executor.submit(self._call_shard, i, fn, (group,), {})
+                   for i, group in sorted(groups.items())]
+        return [future.result() for future in futures]
+
+    def shard_for(self, record):
+        '''Get the index of the shard `record` belongs in
+        '''
+        if self.partition == "id":
+            return record.id % len(self.shards)
+        return bisect.bisect_right(self.mass_boundaries, record.mass())
+
+    def _shards_for_mass_range(self, lower, upper):
+        if self.partition == "id":
+            return range(len(self.shards))
+        return range(bisect.bisect_right(self.mass_boundaries, lower),
+                     bisect.bisect_right(self.mass_boundaries, upper) + 1)
+
+    def _patch_querymethods(self):
+        for name, value in _resolve_querymethods_mro(self.record_type).items():
+            if isinstance(value, QueryMethod):
+                setattr(self, name, self._fan_out_querymethod(name))
+
+    def _fan_out_querymethod(self, name):
+        def query(*args, **kwargs):
+            results = self.fan_out(lambda shard: getattr(shard, name)(*args, **kwargs))
+            return self._merge(results)
+        query.__name__ = name
+        return query
+
+    def _merge(self, results):
+        merged = []
+        for result in results:
+            if isinstance(result, list):
+                merged.extend(result)
+            elif result is not None:
+                merged.append(result)
+        merged.sort(key=lambda record: record.id)
+        return merged
+
+    def load_data(self, record_list, commit=True, set_id=True, cast=True, batch_size=None, **kwargs):
+        '''
+        Assign each record an id and insert it into its shard. Records are grouped
+        by shard and inserted in batches, as in :meth:`RecordDatabase.load_data`.
+        '''
+        if not isinstance(record_list, Iterable) or isinstance(record_list, GlycanRecordBase):
+            record_list = [record_list]
+        if batch_size is None:
+            batch_size = RecordDatabase.batch_size
+        pending = [[] for _ in self.shards]
+        last_id = self._id
+
+        def flush():
+            groups = {i: list(group) for i, group in enumerate(pending) if group}
+            self._fan_out_groups(
+                lambda shard, group: shard.load_data(
+                    group, commit=False, set_id=False, cast=cast, batch_size=batch_size, **kwargs),
+                groups)
+            for group in pending:
+                del group[:]
+
+        count = 0
+        try:
+            for record in record_list:
+                if set_id:
+                    self._id += 1
+                    record.id = self._id
+                else:
+                    self._id = max(self._id, record.id)
+                pending[self.shard_for(record)].append(record)
+                count += 1
+                if count % batch_size == 0:
+                    flush()
+            flush()
+        except Exception:
+            if commit:
+                # Batches already written to other shards must not outlive the failure
+                self.rollback()
+                self._id = last_id
+            raise
+        if commit:
+            self.commit()
+
+    def create(self, structure, *args, **kwargs):
+        commit = kwargs.pop("commit", True)
+        record = self.record_type(structure=structure, *args, **kwargs)
+        self.load_data([record], commit=commit)
+        return record
+
+    def __getitem__(self, keys):
+        if isinstance(keys, slice):
+            begin = keys.start or 1
+            end = keys.stop or self._id
+            keys = list(range(begin, end + 1))
+        if isinstance(keys, (tuple, list, set)):
+            keys = list(map(int, keys))
+            if self.partition == "id":
+                groups = {}
+                for key in keys:
+                    groups.setdefault(key % len(self.shards), []).append(key)
+                results = self._fan_out_groups(self._get_many, groups)
+            else:
+                results = self.fan_out(self._get_many, keys)
+            return self._merge(results)
+        key = int(keys)
+        if self.partition == "id":
+            shards = [key % len(self.shards)]
+        else:
+            shards = None
+        results = self.fan_out(lambda shard: self._get_many(shard, [key]), shards=shards)
+        records = self._merge(results)
+        if not records:
+            raise IndexError("No record found for %r" % keys)
+        return records[0]
+
+    def _get_many(self, shard, keys):
+        if not keys:
+            return []
+        return list(shard.from_sql(shard.execute(
+            "SELECT * FROM {table_name} WHERE glycan_id IN (%s);" % ", ".join("?" * len(keys)),
+            tuple(keys))))
+
+    def _stored_shard(self, record):
+        # The index of the shard holding `record`, which is not necessarily the one
+        # its current mass belongs in, or None if it is not stored
+        if self.partition == "id":
+            return record.id % len(self.shards)
+        bound = getattr(record, "_bound_db", None)
+        for i, shard in enumerate(self.shards):
+            if shard is bound:
+                return i
+        found = self.fan_out(lambda shard: list(shard.execute(
+            "SELECT glycan_id FROM {table_name} WHERE glycan_id = ?;", (record.id,))))
+        for i, rows in enumerate(found):
+            if rows:
+                return i
+        return None
+
+    def bind(self, record):
+        '''Bind `record` to the shard it is stored in, or the shard it belongs in
+        if it is not stored yet
+        '''
+        i = self._stored_shard(record)
+        if i is None:
+            i = self.shard_for(record)
+        record._bound_db = self.shards[i]
+
+    def update(self, record, mass_params=None, inherits=None, commit=True):
+        '''
+        Write `record` back to the database. If it no longer belongs in the shard it
+        is stored in, it is deleted from that shard and inserted into :meth:`shard_for`.
+
+        This is called by :meth:`~.GlycanRecordBase.update` for records bound to a shard.
+
+        Parameters
+        ----------
+        record: :class:`~.GlycanRecordBase`
+        mass_params: dict, optional
+            Parameters passed to :meth:`~.GlycanRecordBase.mass`
+        inherits: dict, optional
+            Passed to :meth:`~.GlycanRecordBase.to_update_sql_parameters`
+        commit: bool
+            Whether to commit the changes to each shard involved. If |True|, any error
+            rolls back both shards.
+
+        Raises
+        ------
+        ValueError:
+            If `record` is not stored in this database
+        '''
+        source = self._stored_shard(record)
+        if source is None:
+            raise ValueError("Record %r is not stored in this database" % (record.id,))
+        target = self.shard_for(record)
+        involved = sorted({source, target})
+        for i in involved:
+            self._locks[i].acquire()
+        try:
+            try:
+                if source == target:
+                    cursor = self.shards[target].cursor()
+                    for stmt, params in record.to_update_sql_parameters(mass_params=mass_params, inherits=inherits):
+                        cursor.execute(stmt, params)
+                else:
+                    cursor = self.shards[source].cursor()
+                    for stmt, params in record.to_delete_sql_parameters():
+                        cursor.execute(stmt, params)
+                    self.shards[target]._insert_batch([record], mass_params=mass_params)
+            except Exception:
+                if commit:
+                    for i in involved:
+                        self.shards[i].rollback()
+                raise
+            if commit:
+                # Commit the insertion first, so a failure between the two commits
+                # leaves the record in both shards rather than in neither
+                self.shards[target].commit()
+                if source != target:
+                    self.shards[source].commit()
+        finally:
+            for i in involved:
+                self._locks[i].release()
+        for i in involved:
+            self.shards[i].mass_index = None
+            self.shards[i].substructure_index = None
+        record._bound_db = self.shards[target]
+
+    @contextmanager
+    def transaction(self):
+        '''
+        As :meth:`RecordDatabase.transaction`, committing every shard together, or
+        rolling them all back if an exception is raised.
+        '''
+        try:
+            yield self
+        except Exception:
+            self.rollback()
+            raise
+        else:
+            self.commit()
+
+    def __iter__(self):
+        '''Iterate over every record in order of id, reading from each shard in turn
+        '''
+        keyed = [((record.id, i, record) for record in shard) for i, shard in enumerate(self.shards)]
+        for _id, _i, record in heapq.merge(*keyed):
+            yield record
+
+    def __len__(self):
+        return sum(self.fan_out(len))
+
+    def __contains__(self, key):
+        try:
+            self[int(key)]
+            return True
+        except IndexError:
+            return False
+
+    def ppm_match_tolerance_search(self, mass, tolerance, mass_shift=0, lazy=False):
+        '''
+        Search the shards whose mass range overlaps the tolerance window around
+        `mass` concurrently, as in :meth:`RecordDatabase.ppm_match_tolerance_search`.
+        Results are merged in order of id.
+        '''
+        spread = (mass + mass_shift) * tolerance
+        shards = self._shards_for_mass_range(mass + mass_shift - spread, mass + mass_shift + spread)
+        results = self.fan_out(
+            lambda shard: shard.ppm_match_tolerance_search(mass, tolerance, mass_shift, lazy=lazy),
+            shards=shards)
+        for record in self._merge(results):
+            yield record
+
+    def select(self, *args, **kwargs):
+        '''As :meth:`RecordDatabase.select`, with the :class:`RecordView` results
+        from all shards merged in order of id.
+        '''
+        for view in self._merge(self.fan_out(lambda shard: shard.select(*args, **kwargs))):
+            yield view
+
+    def get_metadata(self, key=None):
+        return self.shards[0].get_metadata(key)
+
+    def set_metadata(self, key, value):
+        for shard in self.shards:
+            shard.set_metadata(key, value)
+
+    def apply_indices(self):
+        self.fan_out(lambda shard: shard.apply_indices())
+
+    def commit(self):
+        self.fan_out(lambda shard: shard.commit())
+
+    def rollback(self):
+        self.fan_out(lambda shard: shard.rollback())
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        for shard in self.shards:
+            shard.close()
+
+    def __repr__(self):  # pragma: no cover
+        return "<ShardedRecordDatabase {} shards>".format(len(self.shards))
+
+
+_map_worker_database = None
+
+
+def _map_worker_init(connection_string, record_type):
+    global _map_worker_database
+    _map_worker_database = RecordDatabase(connection_string, record_type=record_type, flag='r')
+
+
+def _map_chunk(database, fn, id_range):
+    results = []
+    for record in database.from_sql(database.execute(
+            "SELECT * FROM {table_name} WHERE glycan_id BETWEEN ? AND ? ORDER BY glycan_id;", id_range)):
+        results.append((record.id, fn(record)))
+    return results
+
+
+def _map_worker(args):
+    fn, id_range = args
+    return _map_chunk(_map_worker_database, fn, id_range)
+
+
+class RecordDatabaseReadPool(object):
+    '''
+    A pool of read-only connections to a :class:`RecordDatabase` file, one per thread,
+    along with a thread pool for running queries concurrently.
+
+    Each thread which calls :meth:`database` receives its own read-only :class:`RecordDatabase`,
+    so every query method bound by :meth:`RecordDatabase._patch_querymethods` works unchanged.
+
+    .. code-block:: python
+
+        pool = db.read_pool(max_workers=8)
+        future = pool.query("ppm_match_tolerance_search", 1800.5, 1e-5)
+        matches = future.result()
+
+        # Within a coroutine
+        matches = await pool.query_async("query_by_taxon_id", 9606)
+
+    Parameters
+    ----------
+    connection_string: str
+        The path to the database file
+    record_type: type, optional
+        The record type stored in the database. Inferred from the stored records if |None|
+    max_workers: int, optional
+        The number of threads used by :meth:`submit`. Defaults to 4
+    '''
+
+    def __init__(self, connection_string, record_type=None, max_workers=4):
+        if connection_string == ":memory:":
+            raise ValueError("A private in-memory database cannot be shared between connections")
+        self.connection_string = connection_string
+        self.record_type = record_type
+        self.max_workers = max_workers
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._databases = []
+        self._executor = None
+
+    def database(self):
+        '''Get the read-only :class:`RecordDatabase` for the calling thread,
+        opening it if necessary.
+
+        Returns
+        -------
+        :class:`RecordDatabase`
+        '''
+        database = getattr(self._local, "database", None)
+        if database is None:
+            database = RecordDatabase(self.connection_string, record_type=self.record_type, flag='r')
+            self._local.database = database
+            with self._lock:
+                self._databases.append(database)
+        return database
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    from concurrent.futures import ThreadPoolExecutor
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def _call(self, fn, args, kwargs):
+        return fn(self.database(), *args, **kwargs)
+
+    def submit(self, fn, *args, **kwargs):
+        '''Call ``fn(database, *args, **kwargs)`` on a worker thread with that
+        thread's read-only :class:`RecordDatabase`.
+
+        Returns
+        -------
+        :class:`concurrent.futures.Future`
+        '''
+        return self.executor.submit(self._call, fn, args, kwargs)
+
+    def _query(self, database, name, args, kwargs):
+        result = getattr(database, name)(*args, **kwargs)
+        # Rows must be consumed on the thread which owns the connection
+        if isinstance(result, (sqlite3.Cursor, Iterator)):
+            result = list(result)
+        return result
+
+    def query(self, name, *args, **kwargs):
+        '''Call the method `name` of a worker thread's :class:`RecordDatabase`, which may
+        be any method including bound query methods. Iterator results are collected
+        into a :class:`list` on the worker thread.
+
+        Returns
+        -------
+        :class:`concurrent.futures.Future`
+        '''
+        return self.submit(self._query, name, args, kwargs)
+
+    def query_async(self, name, *args, **kwargs):
+        '''As :meth:`query`, but returns an awaitable :class:`asyncio.Future` bound to
+        the event loop given by the `loop` keyword argument, or the current event loop.
+        '''
+        import asyncio
+        loop = kwargs.pop("loop", None)
+        return asyncio.wrap_future(self.query(name, *args, **kwargs), loop=loop)
+
+    def close(self):
+        '''Shut down the thread pool and close every connection opened by the pool
+        '''
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._lock:
+            for database in self._databases:
+                database.close()
+            self._databases = []
+        self._local = threading.local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self.connection_string)
+
+
 #: Open a database
 dbopen = RecordDatabase
@@ -0,0 +1,165 @@
+'''
+An in-memory index over the masses of the records in a :class:`~.RecordDatabase`
+which answers many mass queries at once.
+
+The index is a pair of NumPy arrays holding every record's mass in sorted order
+along with the record's id. Searches locate the bounds of each query's tolerance
+window with :func:`numpy.searchsorted`, so a whole MS1 feature list can be matched
+against every mass shift without issuing any SQL or unpickling any records.
+
+.. note::
+    This module requires :mod:`numpy`.
+
+'''
+import numpy as np
+
+
+class MassSearchResult(object):
+    '''The matches found by :meth:`MassIndex.search`, as parallel arrays
+    with one element per match.
+
+    Attributes
+    ----------
+    query_index: :class:`numpy.ndarray`
+        The index of the query mass each match is for
+    shift_index: :class:`numpy.ndarray`
+        The index of the mass shift each match is for
+    ids: :class:`numpy.ndarray`
+        The id of each matched record
+    masses: :class:`numpy.ndarray`
+        The stored mass of each matched record
+    ppm_error: :class:`numpy.ndarray`
+        The mass error of each match in parts per million, computed as
+        ``(record mass - (query + shift)) / (query + shift) * 1e6``
+    '''
+
+    __slots__ = ("query_index", "shift_index", "ids", "masses", "ppm_error")
+
+    def __init__(self, query_index, shift_index, ids, masses, ppm_error):
+        self.query_index = query_index
+        self.shift_index = shift_index
+        self.ids = ids
+        self.masses = masses
+        self.ppm_error = ppm_error
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return zip(self.query_index, self.shift_index, self.ids, self.ppm_error)
+
+    def for_query(self, i):
+        '''Select the matches for the query mass at index `i`
+
+        Returns
+        -------
+        :class:`MassSearchResult`
+        '''
+        mask = self.query_index == i
+        return self.__class__(
+            self.query_index[mask], self.shift_index[mask], self.ids[mask],
+            self.masses[mask], self.ppm_error[mask])
+
+    def records(self, database, lazy=True):
+        '''Load the matched records from `database`, in match order
+
+        Parameters
+        ----------
+        database: :class:`~.RecordDatabase`
+        lazy: bool
+            Whether to yield :class:`~.RecordView` objects which defer unpickling
+            each record until it is used
+
+        Yields
+        ------
+        :class:`~.RecordView` or :class:`~.GlycanRecordBase`
+        '''
+        for glycan_id in self.ids:
+            glycan_id = int(glycan_id)
+            if lazy:
+                for view in database.select(where="glycan_id = ?", params=(glycan_id,)):
+                    yield view
+            else:
+                yield database[glycan_id]
+
+    def __repr__(self):
+        return "%s(%d matches)" % (self.__class__.__name__, len(self))
+
+
+class MassIndex(object):
+    '''A sorted array of record masses with their record ids.
+
+    Parameters
+    ----------
+    masses: array-like
+        The mass of each record
+    ids: array-like
+        The id of each record, parallel to `masses`
+    '''
+
+    def __init__(self, masses, ids):
+        masses = np.asarray(masses, dtype=np.float64)
+        ids = np.asarray(ids, dtype=np.int64)
+        order = np.argsort(masses, kind='mergesort')
+        self.masses = masses[order]
+        self.ids = ids[order]
+
+    @classmethod
+    def from_database(cls, database):
+        '''Build an index over all of the records in `database`
+
+        Parameters
+        ----------
+        database: :class:`~.RecordDatabase`
+
+        Returns
+        -------
+        :class:`MassIndex`
+        '''
+        rows = database.execute("SELECT mass, glycan_id FROM {table_name};").fetchall()
+        masses = np.fromiter((row[0] for row in rows), dtype=np.float64, count=len(rows))
+        ids = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+        return cls(masses, ids)
+
+    def __len__(self):
+        return len(self.masses)
+
+    def search(self, masses, tolerance, mass_shifts=(0,)):
+        '''Find every record within `tolerance` of each query mass plus each mass shift.
+
+        Parameters
+        ----------
+        masses: float or array-like
+            The query masses
+        tolerance: float
+            The relative mass error tolerance, where ``1e-5`` is 10 parts per million.
+            This matches the convention of :meth:`~.RecordDatabase.ppm_match_tolerance_search`
+        mass_shifts: array-like
+            The mass shifts to add to each query mass
+
+        Returns
+        -------
+        :class:`MassSearchResult`
+        '''
+        masses = np.atleast_1d(np.asarray(masses, dtype=np.float64))
+        mass_shifts = np.atleast_1d(np.asarray(mass_shifts, dtype=np.float64))
+        # Rows are queries, columns are shifts
+        targets = (masses[:, None] + mass_shifts[None, :]).ravel()
+        spread = targets * tolerance
+        lower = np.searchsorted(self.masses, targets - spread, side='left')
+        upper = np.searchsorted(self.masses, targets + spread, side='right')
+        counts = upper - lower
+        total = counts.sum()
+        target_index = np.repeat(np.arange(len(targets)), counts)
+        # Expand each [lower, upper) window into the positions it covers
+        window_starts = np.cumsum(counts) - counts
+        positions = np.repeat(lower, counts) + (np.arange(total) - np.repeat(window_starts, counts))
+        matched_masses = self.masses[positions]
+        matched_targets = targets[target_index]
+        n_shifts = len(mass_shifts)
+        return MassSearchResult(
+            target_index // n_shifts, target_index % n_shifts, self.ids[positions],
+            matched_masses, (matched_masses - matched_targets) / matched_targets * 1e6)
+
+    def __repr__(self):
+        return "%s(%d records)" % (self.__class__.__name__, len(self))
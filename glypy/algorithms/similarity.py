@@ -1,4 +1,5 @@
 import operator
+import threading
 from collections import defaultdict
 import functools
 
@@ -6,6 +7,220 @@ from six import string_types as basestring
 
 from glypy import Substituent, monosaccharides
 from glypy.structure.constants import Modification, Stem, UnknownPosition
+from glypy.utils import CacheStats
+
+
+#: The maximum number of residue pairs whose similarity is remembered
+#: before the cache is cleared
+max_cached_similarities = 2 ** 16
+
+# Maps (comparator options, node signature, target signature) to the similarity
+# of two residues, not including their children
+_similarity_cache = {}
+_similarity_cache_counts = [0, 0]
+
+
+class _SignatureScope(threading.local):
+    # Maps id(residue) to (residue, signature) while a scope is open. Holding the
+    # residue keeps its id from being reused by another object.
+    memo = None
+
+
+_signature_scope = _SignatureScope()
+
+
+def residue_trait_signature(residue):
+    '''Build a hashable key from every trait of `residue` which
+    :class:`NodeSimilarityComparator` compares, not including its children.
+
+    Parameters
+    ----------
+    residue: :class:`~.Monosaccharide`
+
+    Returns
+    -------
+    :class:`tuple`
+
+    Raises
+    ------
+    AttributeError:
+        If `residue` is not a |Monosaccharide|
+    '''
+    # Read the substituent links directly rather than through :meth:`~.Monosaccharide.substituents`,
+    # which is slower. Equal traits which are listed in a different order only cost a cache miss.
+    substituents = []
+    for position, link in residue.substituent_links.items():
+        substituent = link.to(residue)
+        substituents.append((position, substituent.name, tuple(substituent.composition.items())))
+    return (residue.__class__, residue.anomer, residue.superclass, tuple(residue.stem),
+            tuple(residue.configuration), residue.ring_start, residue.ring_end,
+            tuple(residue.modifications.items()), tuple(substituents))
+
+
+class trait_signature_scope(object):
+    '''A context manager within which :class:`NodeSimilarityComparator` compares
+    residues through the shared similarity cache.
+
+    Building a :func:`residue_trait_signature` costs about as much as comparing
+    two residues, so the cache only pays off when each residue's signature is
+    built once and reused for many comparisons. Inside the scope, signatures are
+    remembered per residue object, so the structures being compared must not be
+    modified until it is closed. Scopes may be nested, and the structural
+    comparisons in :mod:`glypy.algorithms.subtree_search`, :func:`commutative_similarity`
+    and its variants, :func:`~.identity.is_a`, :func:`~.identity.identify` and the
+    enzymes in :mod:`glypy.enzyme` open one themselves.
+
+    It may also be used as a function decorator.
+    '''
+    def __init__(self):
+        self._owners = []
+
+    def __enter__(self):
+        owner = _signature_scope.memo is None
+        if owner:
+            _signature_scope.memo = {}
+        self._owners.append(owner)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Only the outermost scope forgets the signatures
+        if self._owners.pop():
+            _signature_scope.memo = None
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _signature_scope.memo is not None:
+                return func(*args, **kwargs)
+            _signature_scope.memo = {}
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _signature_scope.memo = None
+        return wrapper
+
+
+def _scoped_signature(residue, memo):
+    key = id(residue)
+    try:
+        return memo[key][1]
+    except KeyError:
+        signature = residue_trait_signature(residue)
+        memo[key] = (residue, signature)
+        return signature
+
+
+def similarity_cache_stats():
+    '''The number of residue comparisons answered from and added to the cache used
+    by :class:`NodeSimilarityComparator`, and its current and maximum size.
+
+    Returns
+    -------
+    :class:`~.CacheStats`
+    '''
+    hits, misses = _similarity_cache_counts
+    return CacheStats(hits, misses, len(_similarity_cache), max_cached_similarities)
+
+
+def clear_similarity_cache():
+    '''Empty the cache used by :class:`NodeSimilarityComparator` and reset its counts
+    '''
+    _similarity_cache.clear()
+    _similarity_cache_counts[:] = [0, 0]
+
+
+def optimal_bipartite_assignment(weights):
+    '''Assign every row to a distinct column so that the total weight of the
+    assigned pairs is as large as possible.
+
+    This solves the rectangular assignment problem with the Hungarian method
+    using shortest augmenting paths, taking ``O(n ** 2 * m)`` time for ``n`` rows
+    and ``m`` columns.
+
+    Parameters
+    ----------
+    weights: dict
+        Maps ``(row, column)`` pairs to their weight. Pairs which are absent
+        may not be assigned.
+
+    Returns
+    -------
+    tuple or None
+        The assigned ``(row, column)`` pairs, in the order their rows first appear
+        in `weights`, or |None| if there is no way to assign every row.
+    '''
+    rows = []
+    columns = []
+    row_index = {}
+    column_index = {}
+    for row, column in weights:
+        if row not in row_index:
+            row_index[row] = len(rows)
+            rows.append(row)
+        if column not in column_index:
+            column_index[column] = len(columns)
+            columns.append(column)
+    n = len(rows)
+    m = len(columns)
+    if n > m:
+        return None
+    # Absent pairs are given a cost greater than any difference between the costs
+    # of two assignments of present pairs, so they are only used if they must be
+    forbidden = 2 * sum(abs(w) for w in weights.values()) + 1
+    cost = [[forbidden] * m for i in range(n)]
+    for (row, column), w in weights.items():
+        cost[row_index[row]][column_index[column]] = -w
+
+    inf = float('inf')
+    # Row and column potentials, and the row assigned to each column, with index 0
+    # used as a sentinel
+    u = [0] * (n + 1)
+    v = [0] * (m + 1)
+    assigned = [0] * (m + 1)
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        assigned[0] = i
+        j0 = 0
+        min_slack = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = assigned[j0]
+            row_cost = cost[i0 - 1]
+            delta = inf
+            j1 = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    slack = row_cost[j - 1] - u[i0] - v[j]
+                    if slack < min_slack[j]:
+                        min_slack[j] = slack
+                        way[j] = j0
+                    if min_slack[j] < delta:
+                        delta = min_slack[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[assigned[j]] += delta
+                    v[j] -= delta
+                else:
+                    min_slack[j] -= delta
+            j0 = j1
+            if assigned[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            assigned[j0] = assigned[j1]
+            j0 = j1
+
+    column_of = [None] * n
+    for j in range(1, m + 1):
+        if assigned[j]:
+            column_of[assigned[j] - 1] = columns[j - 1]
+    result = tuple((row, column) for row, column in zip(rows, column_of))
+    for pair in result:
+        if pair not in weights:
+            return None
+    return result
 
 
 class NodeSimilarityComparator(object):
@@ -51,7 +266,15 @@ class NodeSimilarityComparator(object):
         cycles. This carries state across multiple calls to :meth:`compare`
         and must be reset by calling :meth:`reset` before reusing an
         instance on new structures.
+    use_cache: bool
+        When children are not included and a :class:`trait_signature_scope` is
+        open, remember the similarity of each pair of residues by their
+        :func:`residue_trait_signature` and the comparison options, and reuse it
+        for later pairs with the same traits. Shared by all instances (Defaults |True|).
+        See :func:`similarity_cache_stats`.
     '''
+    use_cache = True
+
     def __init__(self, include_substituents=True, include_modifications=True,
                  include_children=False, exact=True, ignore_reduction=False,
                  ignore_ring=False, treat_null_as_wild=True,
@@ -434,6 +657,34 @@ class NodeSimilarityComparator(object):
         if key in self.visited:
             return 0, 0
         self.visited.add(key)
+        memo = _signature_scope.memo
+        if memo is None or self.include_children or not self.use_cache:
+            return self._compare(node, target)
+        try:
+            cache_key = (self._options(), _scoped_signature(node, memo), _scoped_signature(target, memo))
+        except AttributeError:
+            # must be handling substituents
+            return self._compare(node, target)
+        try:
+            result = _similarity_cache[cache_key]
+            _similarity_cache_counts[0] += 1
+            return result
+        except KeyError:
+            pass
+        result = self._compare(node, target)
+        _similarity_cache_counts[1] += 1
+        if len(_similarity_cache) >= max_cached_similarities:
+            _similarity_cache.clear()
+        _similarity_cache[cache_key] = result
+        return result
+
+    def _options(self):
+        # Subclasses may compare residues differently, so they do not share results
+        return (self.__class__, self.include_substituents, self.include_modifications, self.exact,
+                self.ignore_reduction, self.ignore_ring, self.treat_null_as_wild,
+                self.match_attachement_positions, self.short_circuit_after)
+
+    def _compare(self, node, target):
         test = 0
         reference = 0
         try:
@@ -473,31 +724,23 @@ class NodeSimilarityComparator(object):
         '''
         Given a set of possibly overlapping matches, find the
         optimal solution.
+
+        The solution pairs every node child with a distinct target child, minimizing
+        the total difference between observed and expected similarity, and then
+        preferring solutions which have a higher maximum value (more points of
+        comparison). It is found with :func:`optimal_bipartite_assignment`, rather
+        than by enumerating :meth:`build_unique_index_pairs`.
         '''
-        diff_map = dict()
-        for ids in assignments:
-            diff_map[ids] = operator.sub(*assignments[ids])
-
-        index_pair_sets = self.build_unique_index_pairs(assignments)
-
-        def ordering_fn(index_pairs):
-            total = 0
-            for ix in index_pairs:
-                total += max(assignments[ix])
-            return total
-
-        ordered_index_pairs_sets = sorted(index_pair_sets, key=ordering_fn, reverse=True)
-
-        best_score = -float('inf')
-        best_mapping = {}
-        # prefer solutions which have a higher maximum value (more points of comparison)
-        for assignment in ordered_index_pairs_sets:
-            current_score = 0
-            for ix in assignment:
-                current_score += diff_map[ix]
-            if current_score > best_score:
-                best_score = current_score
-                best_mapping = assignment
+        # Weight each pair so that any improvement in the difference outweighs every
+        # possible improvement in the maximum value
+        scale = sum(abs(max(score)) for score in assignments.values()) + 1
+        weights = {
+            ids: operator.sub(*score) * scale + max(score)
+            for ids, score in assignments.items()
+        }
+        best_mapping = optimal_bipartite_assignment(weights)
+        if best_mapping is None:
+            return {}
         return best_mapping
 
     def build_unique_index_pairs(self, pairs):
@@ -532,6 +775,7 @@ class NodeSimilarityComparator(object):
 monosaccharide_similarity = NodeSimilarityComparator.similarity
 
 
+@trait_signature_scope()
 def commutative_similarity(node, target, tolerance=0, *args, **kwargs):
     """Apply :func:`monosaccharide_similarity` to ``node`` and ``target`` for both
     ``node --> target`` and ``target --> node``, returning whether either comparison
@@ -562,6 +806,7 @@ def commutative_similarity(node, target, tolerance=0, *args, **kwargs):
         return (expect - obs) <= tolerance
 
 
+@trait_signature_scope()
 def commutative_similarity_score(node, target, *args, **kwargs):
     """Apply :func:`monosaccharide_similarity` to ``node`` and ``target`` for both
     ``node --> target`` and ``target --> node``, returning the maximally normalized
@@ -588,6 +833,7 @@ def commutative_similarity_score(node, target, *args, **kwargs):
     return max(a_b / (1. * b_b), b_a / (1. * a_a))
 
 
+@trait_signature_scope()
 def commutative_similarity_score_with_tolerance(node, target, tolerance, *args, **kwargs):
     """Apply :func:`monosaccharide_similarity` to ``node`` and ``target`` for both
     ``node --> target`` and ``target --> node``, returning the maximally normalized
@@ -696,7 +942,7 @@ def has_monosaccharide(glycan, monosaccharide, tolerance=0, *args, **kwargs):
     :class:`bool`
     """
     if isinstance(monosaccharide, basestring):
-        monosaccharide = monosaccharides[monosaccharide]
+        monosaccharide = monosaccharides.view(monosaccharide)
     visited = set()
     for node in glycan:
         if commutative_similarity(
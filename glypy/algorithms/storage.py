@@ -1,11 +1,25 @@
+import os
 import zlib
+import shutil
+import pickle
+import hashlib
+import atexit
+import weakref
+import tempfile
+
+from collections import OrderedDict
 
 try:
     from collections.abc import MutableSet
 except ImportError:
     from collections import MutableSet
 
-from glypy.io.glycoct import (loads, dumps)
+from glypy.io.binary import get_codec
+
+try:
+    range = xrange
+except NameError:
+    pass
 
 
 class DistinctGlycanSet(MutableSet):
@@ -14,20 +28,26 @@ class DistinctGlycanSet(MutableSet):
 
     Implements the :class:`MutableSet` interface.
 
-    This type stores structures by serializing the :class:`~.Glycan`
+    By default, this type stores structures by serializing the :class:`~.Glycan`
     into :title-reference:`GlycoCT{condensed}` text, and then compresses
-    the text using :func:`zlib.compress`.
+    the text using :func:`zlib.compress`. Passing ``codec="binary"`` uses the
+    canonical form of :mod:`glypy.io.binary` instead, which is faster to
+    produce and to read back.
 
     Attributes
     ----------
     raw_data_buffer: :class:`set`
         The container for managing the unique glycans
+    codec: :class:`~.StructureCodec`
+        The codec used to encode structures. Two sets may only share encoded
+        entries directly if they use the same codec.
     """
 
-    def __init__(self, structures=None):
+    def __init__(self, structures=None, codec=None):
         if structures is None:
             structures = []
         self.raw_data_buffer = set()
+        self.codec = get_codec(codec)
 
         if isinstance(structures, DistinctGlycanSet):
             self.update(structures)
@@ -68,16 +88,28 @@ class DistinctGlycanSet(MutableSet):
         self.raw_data_buffer.discard(key)
 
     def _structure_to_text(self, structure):
-        return dumps(structure).encode('utf-8')
+        return self.codec.canonical_encode(structure)
 
     def _text_to_structure(self, text):
-        return loads(text.decode('utf-8'))
+        return self.codec.decode(text)
 
     def _transform_text(self, text):
-        return zlib.compress(text)
+        if self.codec.compress:
+            return zlib.compress(text)
+        return text
 
     def _untransform_text(self, compressed):
-        return zlib.decompress(compressed)
+        if self.codec.compress:
+            return zlib.decompress(compressed)
+        return compressed
+
+    def _encoded_buffer(self, other):
+        """Get the encoded contents of `other` in this set's encoding,
+        re-encoding them if `other` uses a different codec.
+        """
+        if other.codec is self.codec:
+            return other.raw_data_buffer
+        return {self.encode(structure) for structure in other}
 
     def encode(self, structure):
         """Encode `structure` into compressed bytes
@@ -135,14 +167,14 @@ class DistinctGlycanSet(MutableSet):
         return compressed in self.raw_data_buffer
 
     @classmethod
-    def from_buffer_slice(cls, buffer_slice):
-        inst = cls()
+    def from_buffer_slice(cls, buffer_slice, codec=None):
+        inst = cls(codec=codec)
         inst.raw_data_buffer.update(buffer_slice)
         return inst
 
     def update(self, other):
         if isinstance(other, DistinctGlycanSet):
-            self.raw_data_buffer.update(other.raw_data_buffer)
+            self.raw_data_buffer.update(self._encoded_buffer(other))
         else:
             for x in other:
                 self.add(x)
@@ -156,34 +188,438 @@ class DistinctGlycanSet(MutableSet):
         while i < n:
             chunk = buffer_sequence[i:i + chunk_size]
             i += chunk_size
-            chunks.append(self.from_buffer_slice(chunk))
+            chunks.append(self.from_buffer_slice(chunk, self.codec))
         return chunks
 
     def remove_all(self, other):
         if not isinstance(other, DistinctGlycanSet):
-            other = DistinctGlycanSet(other)
-        self.raw_data_buffer -= other.raw_data_buffer
+            other = DistinctGlycanSet(other, codec=self.codec)
+        self.raw_data_buffer -= self._encoded_buffer(other)
 
     def __sub__(self, other):
         return self.from_buffer_slice(
-            self.raw_data_buffer - other.raw_data_buffer)
+            self.raw_data_buffer - self._encoded_buffer(other), self.codec)
 
     def __isub__(self, other):
-        self.raw_data_buffer -= other.raw_data_buffer
+        self.raw_data_buffer -= self._encoded_buffer(other)
         return self
 
     def __and__(self, other):
         return self.from_buffer_slice(
-            self.raw_data_buffer & other.raw_data_buffer)
+            self.raw_data_buffer & self._encoded_buffer(other), self.codec)
 
     def __iand__(self, other):
-        self.raw_data_buffer &= other.raw_data_buffer
+        self.raw_data_buffer &= self._encoded_buffer(other)
         return self
 
     def __or__(self, other):
         return self.from_buffer_slice(
-            self.raw_data_buffer | other.raw_data_buffer)
+            self.raw_data_buffer | self._encoded_buffer(other), self.codec)
 
     def __ior__(self, other):
-        self.raw_data_buffer.update(other.raw_data_buffer)
+        self.raw_data_buffer.update(self._encoded_buffer(other))
+        return self
+
+
+def _remove_directory(path):
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def _cleanup_on_collect(obj, path):
+    # Remove `path` when `obj` is garbage collected or the interpreter exits,
+    # whichever comes first. Python 2 lacks weakref.finalize, so it can only
+    # clean up at exit.
+    try:
+        return weakref.finalize(obj, _remove_directory, path)
+    except AttributeError:
+        atexit.register(_remove_directory, path)
+        return None
+
+
+class ShardedDistinctGlycanSet(MutableSet):
+    """Store a distinct set of unique :class:`~.Glycan` objects which may be
+    too large to hold in memory.
+
+    Each structure is identified by the :func:`hashlib.sha1` digest of its
+    canonical encoding, and the set is divided into :attr:`n_shards` shards by
+    the leading bytes of that digest. At most :attr:`max_resident_shards`
+    shards are kept in memory at once, and the least recently used shards are
+    written to files in :attr:`directory` until they are needed again.
+
+    Because a structure's shard depends only on its digest, two sets with the
+    same codec and number of shards hold any given structure in the same
+    shard. Set algebra between such sets is carried out one shard at a time,
+    and sets built independently, for instance in separate processes, can be
+    combined with :meth:`merge`. Pickling a set writes its shards to disk and
+    transfers only their location, so the receiving process must be able to
+    read :attr:`directory`.
+
+    Implements the :class:`MutableSet` interface.
+
+    Attributes
+    ----------
+    codec: :class:`~.StructureCodec`
+        The codec used to encode structures
+    n_shards: :class:`int`
+        The number of shards the set is divided into
+    max_resident_shards: :class:`int`
+        The maximum number of shards kept in memory
+    directory: :class:`str`
+        The directory shards are spilled to. If not given, a temporary directory
+        is created and removed by :meth:`close`, or when the set is garbage collected
+        or the interpreter exits if it is never closed. Copies of the set made by
+        unpickling never remove it.
+    """
+
+    digest_size = 20
+
+    def __init__(self, structures=None, codec=None, n_shards=64, max_resident_shards=8, directory=None):
+        self.codec = get_codec(codec)
+        self.n_shards = n_shards
+        self.max_resident_shards = max(max_resident_shards, 1)
+        self._owns_directory = directory is None
+        self._finalizer = None
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix="glypy-set-")
+            self._finalizer = _cleanup_on_collect(self, directory)
+        elif not os.path.exists(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self._resident = OrderedDict()
+        self._dirty = set()
+        self._sizes = [0] * n_shards
+
+        if structures is not None:
+            self.update(structures)
+
+    def digest(self, structure):
+        """Compute the digest identifying `structure`
+
+        Parameters
+        ----------
+        structure: :class:`~.Glycan`
+
+        Returns
+        -------
+        :class:`bytes`
+        """
+        return hashlib.sha1(self.codec.canonical_encode(structure)).digest()
+
+    def shard_of(self, digest):
+        """Get the index of the shard which holds `digest`
+
+        Parameters
+        ----------
+        digest: :class:`bytes`
+
+        Returns
+        -------
+        :class:`int`
+        """
+        prefix = bytearray(digest[:4])
+        return ((prefix[0] << 24) | (prefix[1] << 16) | (prefix[2] << 8) | prefix[3]) % self.n_shards
+
+    def _encode(self, structure):
+        text = self.codec.canonical_encode(structure)
+        if self.codec.compress:
+            payload = zlib.compress(text)
+        else:
+            payload = text
+        return hashlib.sha1(text).digest(), payload
+
+    def _decode(self, payload):
+        if self.codec.compress:
+            payload = zlib.decompress(payload)
+        return self.codec.decode(payload)
+
+    def _shard_path(self, i):
+        return os.path.join(self.directory, "shard-%d.pkl" % i)
+
+    def _shard(self, i):
+        try:
+            shard = self._resident.pop(i)
+        except KeyError:
+            path = self._shard_path(i)
+            if self._sizes[i] and os.path.exists(path):
+                with open(path, 'rb') as handle:
+                    shard = pickle.load(handle)
+            else:
+                shard = {}
+        # Re-inserting marks the shard as the most recently used
+        self._resident[i] = shard
+        while len(self._resident) > self.max_resident_shards:
+            self._spill(next(iter(self._resident)))
+        return shard
+
+    def _spill(self, i):
+        shard = self._resident.pop(i)
+        if i in self._dirty:
+            self._write_shard(i, shard)
+
+    def _write_shard(self, i, shard):
+        with open(self._shard_path(i), 'wb') as handle:
+            pickle.dump(shard, handle, pickle.HIGHEST_PROTOCOL)
+        self._dirty.discard(i)
+
+    def _store(self, i, shard):
+        self._shard(i)
+        self._resident[i] = shard
+        self._sizes[i] = len(shard)
+        self._dirty.add(i)
+
+    def flush(self):
+        """Write every modified shard held in memory to disk
+        """
+        for i, shard in list(self._resident.items()):
+            if i in self._dirty:
+                self._write_shard(i, shard)
+
+    def detach(self):
+        """Stop this set from removing :attr:`directory`, so that copies of it
+        sent to other processes remain readable after it is gone. Whoever uses
+        the copies becomes responsible for removing the directory, for instance
+        with ``close(remove_directory=True)``.
+
+        Returns
+        -------
+        :class:`ShardedDistinctGlycanSet`
+            This set
+        """
+        self.flush()
+        self._owns_directory = False
+        if self._finalizer is not None:
+            self._finalizer.detach()
+            self._finalizer = None
+        return self
+
+    def close(self, remove_directory=None):
+        """Drop all shards from memory, removing :attr:`directory`
+        if it was created by this set.
+
+        Parameters
+        ----------
+        remove_directory: :class:`bool`, optional
+            Whether to remove :attr:`directory`. Defaults to whether
+            it was created by this set.
+        """
+        self._resident.clear()
+        self._dirty.clear()
+        if remove_directory is None:
+            remove_directory = self._owns_directory
+        if self._finalizer is not None:
+            self._finalizer.detach()
+            self._finalizer = None
+        if remove_directory:
+            _remove_directory(self.directory)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getstate__(self):
+        self.flush()
+        return {
+            "codec": self.codec.name,
+            "n_shards": self.n_shards,
+            "max_resident_shards": self.max_resident_shards,
+            "directory": self.directory,
+            "sizes": list(self._sizes),
+        }
+
+    def __setstate__(self, state):
+        self.codec = get_codec(state['codec'])
+        self.n_shards = state['n_shards']
+        self.max_resident_shards = state['max_resident_shards']
+        self.directory = state['directory']
+        # The directory belongs to the set this is a copy of, which may still be using it
+        self._owns_directory = False
+        self._finalizer = None
+        self._sizes = state['sizes']
+        self._resident = OrderedDict()
+        self._dirty = set()
+
+    def add(self, structure):
+        """Add `structure` to the set
+
+        Parameters
+        ----------
+        structure: :class:`~.Glycan`
+            The structure to add to the set
+
+        Returns
+        -------
+        :class:`bytes`
+            The digest of `structure`
+        """
+        digest, payload = self._encode(structure)
+        self.add_encoded(digest, payload)
+        return digest
+
+    def add_encoded(self, digest, payload):
+        """Add a pre-encoded structure to the set
+
+        Parameters
+        ----------
+        digest: :class:`bytes`
+            The digest of the structure's canonical encoding
+        payload: :class:`bytes`
+            The structure's encoding, compressed if the codec requires it
+        """
+        i = self.shard_of(digest)
+        shard = self._shard(i)
+        if digest not in shard:
+            shard[digest] = payload
+            self._sizes[i] += 1
+            self._dirty.add(i)
+
+    def discard(self, structure):
+        """Remove `structure` from the set
+
+        Parameters
+        ----------
+        structure: :class:`~.Glycan`
+            The structure to remove
+        """
+        self.discard_encoded(self.digest(structure))
+
+    def discard_encoded(self, digest):
+        i = self.shard_of(digest)
+        shard = self._shard(i)
+        if shard.pop(digest, None) is not None:
+            self._sizes[i] -= 1
+            self._dirty.add(i)
+
+    def has_encoded(self, digest):
+        return digest in self._shard(self.shard_of(digest))
+
+    def __contains__(self, structure):
+        return self.has_encoded(self.digest(structure))
+
+    def __len__(self):
+        return sum(self._sizes)
+
+    def __iter__(self):
+        for i in range(self.n_shards):
+            if not self._sizes[i]:
+                continue
+            for payload in list(self._shard(i).values()):
+                yield self._decode(payload)
+
+    def pop(self):
+        for i in range(self.n_shards):
+            if self._sizes[i]:
+                shard = self._shard(i)
+                _digest, payload = shard.popitem()
+                self._sizes[i] -= 1
+                self._dirty.add(i)
+                return self._decode(payload)
+        raise KeyError("pop from an empty set")
+
+    def shards(self):
+        """Iterate over the contents of each shard in turn as a :class:`dict`
+        mapping digest to encoded structure. Only one shard needs to be loaded
+        at a time.
+        """
+        for i in range(self.n_shards):
+            yield self._shard(i) if self._sizes[i] else {}
+
+    def _empty_like(self):
+        return self.__class__(
+            codec=self.codec, n_shards=self.n_shards,
+            max_resident_shards=self.max_resident_shards)
+
+    def _compatible(self, other):
+        """Get `other` as a :class:`ShardedDistinctGlycanSet` with the same codec and
+        number of shards as this set, re-encoding it if necessary.
+        """
+        if isinstance(other, ShardedDistinctGlycanSet) and other.codec is self.codec and\
+                other.n_shards == self.n_shards:
+            return other
+        compatible = self._empty_like()
+        if isinstance(other, DistinctGlycanSet) and other.codec is self.codec:
+            for payload in other.raw_data_buffer:
+                compatible.add_encoded(hashlib.sha1(other._untransform_text(payload)).digest(), payload)
+        else:
+            compatible.update(other)
+        return compatible
+
+    def _combine(self, other, operation, in_place=False):
+        compatible = self._compatible(other)
+        target = self if in_place else self._empty_like()
+        for i in range(self.n_shards):
+            if not self._sizes[i] and not compatible._sizes[i]:
+                continue
+            if self._sizes[i]:
+                shard = self._shard(i)
+            else:
+                shard = {}
+            if compatible._sizes[i]:
+                other_shard = compatible._shard(i)
+            else:
+                other_shard = {}
+            target._store(i, operation(shard, other_shard))
+        if compatible is not other:
+            compatible.close()
+        return target
+
+    @staticmethod
+    def _union(shard, other_shard):
+        result = dict(shard)
+        result.update(other_shard)
+        return result
+
+    @staticmethod
+    def _intersection(shard, other_shard):
+        return {key: value for key, value in shard.items() if key in other_shard}
+
+    @staticmethod
+    def _difference(shard, other_shard):
+        return {key: value for key, value in shard.items() if key not in other_shard}
+
+    def update(self, other):
+        if isinstance(other, (ShardedDistinctGlycanSet, DistinctGlycanSet)):
+            self._combine(other, self._union, in_place=True)
+        else:
+            for structure in other:
+                self.add(structure)
+
+    def merge(self, *others):
+        """Add the contents of each set in `others` to this set, one shard at a time.
+
+        This is the means of combining sets built in different processes, which may be
+        returned to the parent process by pickling.
+
+        Returns
+        -------
+        :class:`ShardedDistinctGlycanSet`
+            This set
+        """
+        for other in others:
+            self.update(other)
         return self
+
+    def remove_all(self, other):
+        self._combine(other, self._difference, in_place=True)
+
+    def __or__(self, other):
+        return self._combine(other, self._union)
+
+    def __ior__(self, other):
+        return self._combine(other, self._union, in_place=True)
+
+    def __and__(self, other):
+        return self._combine(other, self._intersection)
+
+    def __iand__(self, other):
+        return self._combine(other, self._intersection, in_place=True)
+
+    def __sub__(self, other):
+        return self._combine(other, self._difference)
+
+    def __isub__(self, other):
+        return self._combine(other, self._difference, in_place=True)
+
+    def __repr__(self):
+        return "%s(%d structures, %d shards)" % (self.__class__.__name__, len(self), self.n_shards)
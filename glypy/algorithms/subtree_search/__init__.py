@@ -12,3 +12,6 @@ from .common_subgraph import (
 from .common_subgraph import (
     Treelet, TreeletIterator, TreeletEnrichmentTest,
     MaximumCommonSubgraphSolver, MaximumCommonSubtreeResults)
+
+from .prefilter import StructureFingerprint, SubstructureIndex
+from .annotation import MotifAnnotator, motif_annotate
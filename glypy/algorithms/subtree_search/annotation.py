@@ -0,0 +1,163 @@
+"""Annotate whole collections of structures with the motifs they contain.
+
+Testing each motif against each structure with :func:`~.subtree_of` repeats the
+same work for every motif: every residue of the structure is compared against the
+motif's root, and every residue pair is compared from scratch. :class:`MotifAnnotator`
+shares that work across all of the motifs searched for in one structure:
+
+1. The :class:`~.StructureFingerprint` of each motif is computed once, and the
+   structure's fingerprint rules out motifs it cannot contain.
+2. The structure's residues are grouped by :func:`~.residue_key` once, and each
+   remaining motif is only rooted at residues whose key is compatible with its root's.
+3. All of the motifs are compared within a single :class:`~.trait_signature_scope`, so
+   residue pairs seen while testing one motif are not compared again for the next.
+
+"""
+import multiprocessing
+
+from glypy.utils import root
+from glypy.algorithms.similarity import trait_signature_scope
+
+from .inclusion import topological_inclusion, exact_ordering_inclusion
+from .prefilter import StructureFingerprint, residue_key, _compatible
+
+
+class MotifAnnotator(object):
+    """Find which of a collection of motifs each structure contains, as
+    tested by :func:`~.subtree_of`.
+
+    Attributes
+    ----------
+    names: list
+        The name of each motif, in the order they are reported
+    motifs: list
+        The :class:`~.Glycan` of each motif
+    exact: bool
+        Whether to use :func:`~.exact_ordering_inclusion`
+    include_substituents: bool
+        Whether to compare substituents
+    tolerance: int
+        The similarity error to tolerate
+    """
+
+    def __init__(self, motifs, exact=False, include_substituents=True, tolerance=0, max_path_length=3):
+        self.names = list(motifs.keys())
+        self.motifs = [motifs[name] for name in self.names]
+        self.exact = exact
+        self.include_substituents = include_substituents
+        self.tolerance = tolerance
+        self.max_path_length = max_path_length
+        self.fingerprints = [
+            StructureFingerprint.from_structure(motif, max_path_length) for motif in self.motifs]
+        self.root_keys = [residue_key(root(motif)) for motif in self.motifs]
+
+    def _candidate_roots(self, key, residue_index):
+        if self.tolerance:
+            return [node for nodes in residue_index.values() for node in nodes]
+        if not self.include_substituents:
+            key = (key[0], key[1], (), key[3])
+        nodes = []
+        for other, group in residue_index.items():
+            if not self.include_substituents:
+                other = (other[0], other[1], (), other[3])
+            if _compatible(key, other):
+                nodes.extend(group)
+        return nodes
+
+    @trait_signature_scope()
+    def annotate(self, structure):
+        """Find the motifs `structure` contains
+
+        Parameters
+        ----------
+        structure: :class:`~.Glycan`
+
+        Returns
+        -------
+        :class:`list` of :class:`str`
+            The names of the motifs found, in the order of :attr:`names`
+        """
+        if self.exact:
+            comparator = exact_ordering_inclusion
+        else:
+            comparator = topological_inclusion
+        fingerprint = StructureFingerprint.from_structure(structure, self.max_path_length)
+        residue_index = {}
+        for node in structure:
+            residue_index.setdefault(residue_key(node), []).append(node)
+        found = []
+        for name, motif, motif_fingerprint, key in zip(
+                self.names, self.motifs, self.fingerprints, self.root_keys):
+            if not fingerprint.may_contain(
+                    motif_fingerprint, exact=self.exact, include_substituents=self.include_substituents,
+                    tolerance=self.tolerance):
+                continue
+            motif_root = root(motif)
+            for node in self._candidate_roots(key, residue_index):
+                if comparator(motif_root, node, substituents=self.include_substituents,
+                              tolerance=self.tolerance):
+                    found.append(name)
+                    break
+        return found
+
+    __call__ = annotate
+
+    def __repr__(self):
+        return "MotifAnnotator(%d motifs)" % (len(self.names),)
+
+
+_worker_annotator = None
+
+
+def _annotator_init(annotator):
+    global _worker_annotator
+    _worker_annotator = annotator
+
+
+def _annotate_worker(structure):
+    return _worker_annotator.annotate(structure)
+
+
+def motif_annotate(structures, motifs=None, processes=None, exact=False, include_substituents=True,
+                   tolerance=0, chunksize=50):
+    """Find the motifs each structure in `structures` contains, as tested by
+    :func:`~.subtree_of`, sharing work between motifs with a :class:`MotifAnnotator`.
+
+    Parameters
+    ----------
+    structures: iterable of :class:`~.Glycan`
+        The structures to annotate
+    motifs: dict or :class:`MotifAnnotator`, optional
+        Maps motif names to motif structures. Defaults to :data:`glypy.motifs`
+    processes: int, optional
+        The number of worker processes to spread the structures across. If |None|
+        or 1, the structures are annotated in this process.
+    exact: bool
+        Whether to use :func:`~.exact_ordering_inclusion`
+    include_substituents: bool
+        Whether to compare substituents
+    tolerance: int
+        The similarity error to tolerate
+    chunksize: int
+        The number of structures sent to a worker process at a time
+
+    Returns
+    -------
+    :class:`list` of :class:`list` of :class:`str`
+        The names of the motifs found in each structure, in order
+    """
+    if isinstance(motifs, MotifAnnotator):
+        annotator = motifs
+    else:
+        if motifs is None:
+            from glypy.structure.named_structures import motifs
+        annotator = MotifAnnotator(
+            motifs, exact=exact, include_substituents=include_substituents, tolerance=tolerance)
+    if processes is None or processes <= 1:
+        return [annotator.annotate(structure) for structure in structures]
+    pool = multiprocessing.Pool(processes, _annotator_init, (annotator,))
+    try:
+        return pool.map(_annotate_worker, structures, chunksize)
+    finally:
+        pool.terminate()
+        pool.join()
@@ -4,7 +4,7 @@ import itertools
 
 from collections import deque, defaultdict
 
-from glypy.algorithms.similarity import monosaccharide_similarity
+from glypy.algorithms.similarity import monosaccharide_similarity, trait_signature_scope
 from glypy.utils import make_struct, root, groupby, tree as treep
 from glypy.structure import Glycan
 from glypy.structure.monosaccharide import depth
@@ -86,6 +86,7 @@ class MaximumCommonSubgraphSolver(object):
             score += self.compare_nodes(child_a, child_b, visited=visited)
         return score
 
+    @trait_signature_scope()
     def fit(self):
         for i, a_node in enumerate(self.seq_a):
             for j, b_node in enumerate(self.seq_b):
@@ -7,7 +7,9 @@ mapped onto equivalent nodes in graph B that are connected in the same way.
 from collections import deque, defaultdict
 
 from glypy.structure import UnknownPosition
-from glypy.algorithms.similarity import commutative_similarity, commutative_similarity_score_with_tolerance
+from glypy.algorithms.similarity import (
+    commutative_similarity, commutative_similarity_score_with_tolerance,
+    optimal_bipartite_assignment, trait_signature_scope)
 from glypy.utils import root
 
 
@@ -36,6 +38,7 @@ class TopologicalInclusionMatcher(object):
         self.visited = visited or set()
 
     @classmethod
+    @trait_signature_scope()
     def compare(cls, target, reference, substituents=True, tolerance=0, visited=None):
         '''
         A generalization of :meth:`~Monosaccharide.topological_equality` which allows for ``target``
@@ -162,24 +165,36 @@ class TopologicalInclusionMatcher(object):
         return list(next_current)
 
     def optimal_assignment(self, assignments, required_nodes=None):
-        index_pair_sets = self.build_unique_index_pairs(assignments)
-        best_score = -float('inf')
-        best_mapping = None
-        for assignment in index_pair_sets:
-            current_score = 0
-            has_nodes = set()
-            for ix in assignment:
-                current_score += assignments[ix]
-                has_nodes.add(ix[0])
-            if current_score > best_score and has_nodes == required_nodes:
-                best_score = current_score
-                best_mapping = assignment
-        return best_mapping, best_score
+        """Pair each target child with a distinct reference child, maximizing the
+        total inclusion score, using :func:`~.optimal_bipartite_assignment`.
+
+        Parameters
+        ----------
+        assignments: dict
+            Maps pairs of target and reference child ids to their inclusion score
+        required_nodes: set
+            The ids of the target children which must all be paired
+
+        Returns
+        -------
+        tuple:
+            The pairs of the assignment, or |None| if `required_nodes` cannot all
+            be paired
+        float:
+            The total score of the assignment
+        """
+        if {a for a, b in assignments} != required_nodes:
+            return None, -float('inf')
+        best_mapping = optimal_bipartite_assignment(assignments)
+        if best_mapping is None:
+            return None, -float('inf')
+        return best_mapping, sum(assignments[ix] for ix in best_mapping)
 
 
 topological_inclusion = TopologicalInclusionMatcher.compare
 
 
+@trait_signature_scope()
 def exact_ordering_inclusion(target, reference, substituents=True, tolerance=0, visited=None):
     '''
     A generalization of :meth:`~Monosaccharide.exact_ordering_equality` which allows for ``target``
@@ -249,6 +264,7 @@ def exact_ordering_inclusion(target, reference, substituents=True, tolerance=0,
         return node_score
 
 
+@trait_signature_scope()
 def subtree_of(subtree, tree, exact=False, include_substituents=True, tolerance=0):
     '''
     Test to see if `subtree` is included in `tree` anywhere. Returns the
@@ -281,6 +297,7 @@ def subtree_of(subtree, tree, exact=False, include_substituents=True, tolerance=
     return None
 
 
+@trait_signature_scope()
 def find_matching_subtree_roots(subtree, tree, exact=False, include_substituents=True, tolerance=0):
     '''
     Find the list of nodes where occurences of `subtree` included in `tree` are rooted.
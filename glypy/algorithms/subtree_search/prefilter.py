@@ -0,0 +1,401 @@
+"""A screening index for substructure search over collections of structures.
+
+Testing whether a query is included in a target with :func:`~.subtree_of` compares
+the query against the subtree rooted at every residue of the target. When searching
+many targets, most of them cannot contain the query at all, and this can be shown
+from a few summary features without any inclusion test:
+
+1. The counts of each kind of residue, described by its superclass, stem,
+   substituents and modifications.
+2. The counts of each kind of parent-child residue pair.
+3. A bit fingerprint of every downward path of up to :attr:`~.StructureFingerprint.max_path_length`
+   residues, described by their substituents and modifications.
+
+Each query residue must be paired with a distinct target residue which it is similar to,
+its children with children of that residue and so on, so every feature of the query must
+be available in any target that contains it. Unknown superclasses and stems are treated
+as matching anything, as they are by :func:`~.commutative_similarity`, so the screen
+never rules out a target which :func:`~.subtree_of` would match.
+
+"""
+import zlib
+
+from collections import Counter
+from functools import partial
+
+from glypy.algorithms.similarity import trait_signature_scope
+
+from .inclusion import subtree_of
+
+
+#: The number of bits in each path fingerprint
+fingerprint_size = 1024
+
+_feature_bits = {}
+
+
+def _feature_bit(feature):
+    try:
+        return _feature_bits[feature]
+    except KeyError:
+        # Python's string hashing is randomized per process, so use a stable checksum
+        # to let fingerprints be pickled and compared between processes
+        bit = 1 << (zlib.crc32(repr(feature).encode('utf8')) % fingerprint_size)
+        _feature_bits[feature] = bit
+        return bit
+
+
+def residue_key(residue):
+    """Describe the traits of `residue` which any residue it matches with
+    :func:`~.commutative_similarity` at a tolerance of ``0`` must share.
+
+    The superclass and stem are |None| when they are not known, in which case
+    they match any value.
+
+    Parameters
+    ----------
+    residue: :class:`~.Monosaccharide`
+
+    Returns
+    -------
+    tuple:
+        The superclass, stem, substituent names and modifications of `residue`
+    """
+    superclass = residue.superclass
+    superclass = None if superclass.value is None else superclass.name
+    stem = residue.stem
+    stem = None if stem[0].value is None else tuple(s.name for s in stem)
+    substituents = tuple(sorted(sub.name for _pos, sub in residue.substituents()))
+    modifications = tuple(sorted(str(mod) for mod in residue.modifications.values()))
+    return (superclass, stem, substituents, modifications)
+
+
+def _without_substituents(key):
+    return (key[0], key[1], (), key[3])
+
+
+def _is_wild(key):
+    return key[0] is None or key[1] is None
+
+
+def _compatible(a, b):
+    return ((a[0] == b[0] or a[0] is None or b[0] is None) and
+            (a[1] == b[1] or a[1] is None or b[1] is None) and
+            a[2] == b[2] and a[3] == b[3])
+
+
+def _pair_compatible(a, b):
+    return _compatible(a[0], b[0]) and _compatible(a[1], b[1])
+
+
+def _available(key, counts, exact_lookup, compatible):
+    if exact_lookup:
+        return counts.get(key, 0)
+    return sum(count for other, count in counts.items() if compatible(key, other))
+
+
+class StructureFingerprint(object):
+    """The screening features of a single structure.
+
+    Attributes
+    ----------
+    size: int
+        The number of residues in the structure
+    residue_counts: :class:`dict`
+        Maps each :func:`residue_key` to the number of residues with that key
+    linkage_counts: :class:`dict`
+        Maps each pair of parent and child :func:`residue_key` to the number
+        of links between residues with those keys
+    path_bits: int
+        The bit fingerprint of every downward path, described by the substituents
+        and modifications of each residue
+    bare_path_bits: int
+        The bit fingerprint of every downward path, described only by the modifications
+        of each residue, used when substituents are not compared
+    wild: bool
+        Whether any residue has an unknown superclass or stem
+    max_path_length: int
+        The number of residues in the longest paths included in the fingerprints
+    """
+
+    def __init__(self, size, residue_counts, linkage_counts, path_bits, bare_path_bits,
+                 wild=False, max_path_length=3):
+        self.size = size
+        self.residue_counts = residue_counts
+        self.linkage_counts = linkage_counts
+        self.path_bits = path_bits
+        self.bare_path_bits = bare_path_bits
+        self.wild = wild
+        self.max_path_length = max_path_length
+        self._projections = None
+
+    @classmethod
+    def from_structure(cls, structure, max_path_length=3):
+        """Compute the fingerprint of `structure`
+
+        Parameters
+        ----------
+        structure: :class:`~.Glycan`
+        max_path_length: int
+            The number of residues in the longest paths to include
+
+        Returns
+        -------
+        :class:`StructureFingerprint`
+        """
+        keys = {}
+        for node in structure:
+            keys[node.id] = residue_key(node)
+        residue_counts = Counter(keys.values())
+        linkage_counts = Counter()
+        path_bits = 0
+        bare_path_bits = 0
+        for node in structure:
+            parent_key = keys[node.id]
+            for _pos, child in node.children():
+                linkage_counts[parent_key, keys[child.id]] += 1
+            stack = [(node, (), ())]
+            while stack:
+                current, path, bare_path = stack.pop()
+                key = keys[current.id]
+                path = path + ((key[2], key[3]),)
+                bare_path = bare_path + (key[3],)
+                path_bits |= _feature_bit(path)
+                bare_path_bits |= _feature_bit(bare_path)
+                if len(path) < max_path_length:
+                    for _pos, child in current.children():
+                        stack.append((child, path, bare_path))
+        return cls(len(keys), dict(residue_counts), dict(linkage_counts), path_bits, bare_path_bits,
+                   any(_is_wild(key) for key in residue_counts), max_path_length)
+
+    def __getstate__(self):
+        return (self.size, self.residue_counts, self.linkage_counts, self.path_bits,
+                self.bare_path_bits, self.wild, self.max_path_length)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def _counts(self, include_substituents):
+        if include_substituents:
+            return self.residue_counts, self.linkage_counts
+        if self._projections is None:
+            residue_counts = Counter()
+            for key, count in self.residue_counts.items():
+                residue_counts[_without_substituents(key)] += count
+            linkage_counts = Counter()
+            for (parent, child), count in self.linkage_counts.items():
+                linkage_counts[_without_substituents(parent), _without_substituents(child)] += count
+            self._projections = (dict(residue_counts), dict(linkage_counts))
+        return self._projections
+
+    def may_contain(self, query, exact=False, include_substituents=True, tolerance=0):
+        """Test whether the structure this fingerprint describes may contain the
+        structure described by `query`, as tested by :func:`~.subtree_of` with
+        the same arguments.
+
+        A |False| result is definitive, while a |True| result must still be confirmed
+        with :func:`~.subtree_of`.
+
+        Parameters
+        ----------
+        query: :class:`StructureFingerprint`
+            The fingerprint of the structure to search for
+        exact: bool
+            Whether the search uses :func:`~.exact_ordering_inclusion`, which may
+            pair several query residues with the same target residue
+        include_substituents: bool
+            Whether the search compares substituents
+        tolerance: int
+            The similarity error the search tolerates. Residue traits can only be
+            screened without any error.
+
+        Returns
+        -------
+        bool
+        """
+        if not exact and query.size > self.size:
+            return False
+        if tolerance:
+            return True
+        if include_substituents:
+            if query.path_bits & ~self.path_bits:
+                return False
+        elif query.bare_path_bits & ~self.bare_path_bits:
+            return False
+        exact_lookup = not (query.wild or self.wild)
+        query_residues, query_linkages = query._counts(include_substituents)
+        residue_counts, linkage_counts = self._counts(include_substituents)
+        for key, count in query_residues.items():
+            minimum = 1 if exact else count
+            if _available(key, residue_counts, exact_lookup, _compatible) < minimum:
+                return False
+        for key, count in query_linkages.items():
+            minimum = 1 if exact else count
+            if _available(key, linkage_counts, exact_lookup, _pair_compatible) < minimum:
+                return False
+        return True
+
+    def __repr__(self):
+        return "StructureFingerprint(size=%d, %d residue types, %d linkage types)" % (
+            self.size, len(self.residue_counts), len(self.linkage_counts))
+
+
+def _record_fingerprint(record, max_path_length=3):
+    return StructureFingerprint.from_structure(record.structure, max_path_length)
+
+
+class SubstructureIndex(object):
+    """An index of the :class:`StructureFingerprint` of each structure in a
+    collection, used to screen out structures which cannot contain a query before
+    testing the rest with :func:`~.subtree_of`.
+
+    Attributes
+    ----------
+    keys: list
+        The key of each indexed structure, its position in a sequence or its
+        record id in a :class:`~.RecordDatabase`
+    fingerprints: list
+        The :class:`StructureFingerprint` of each indexed structure
+    max_path_length: int
+        The number of residues in the longest paths included in the fingerprints
+    """
+
+    def __init__(self, keys=None, fingerprints=None, max_path_length=3):
+        self.keys = list(keys or ())
+        self.fingerprints = list(fingerprints or ())
+        self.max_path_length = max_path_length
+
+    @classmethod
+    def from_structures(cls, structures, keys=None, max_path_length=3):
+        """Index each structure in `structures`
+
+        Parameters
+        ----------
+        structures: iterable of :class:`~.Glycan`
+        keys: iterable, optional
+            The key of each structure. Defaults to its position in `structures`
+        max_path_length: int
+            The number of residues in the longest paths to include
+
+        Returns
+        -------
+        :class:`SubstructureIndex`
+        """
+        inst = cls(max_path_length=max_path_length)
+        structures = list(structures)
+        if keys is None:
+            keys = range(len(structures))
+        for key, structure in zip(keys, structures):
+            inst.add(key, structure)
+        return inst
+
+    @classmethod
+    def from_database(cls, database, processes=None, max_path_length=3):
+        """Index each record in `database`, keyed by record id
+
+        Parameters
+        ----------
+        database: :class:`~.RecordDatabase`
+        processes: int, optional
+            The number of worker processes to use, passed to :meth:`~.RecordDatabase.map`
+        max_path_length: int
+            The number of residues in the longest paths to include
+
+        Returns
+        -------
+        :class:`SubstructureIndex`
+        """
+        inst = cls(max_path_length=max_path_length)
+        fn = partial(_record_fingerprint, max_path_length=max_path_length)
+        for key, fingerprint in database.map(fn, processes=processes):
+            inst.keys.append(key)
+            inst.fingerprints.append(fingerprint)
+        return inst
+
+    def add(self, key, structure):
+        """Add `structure` to the index under `key`
+
+        Parameters
+        ----------
+        key: object
+        structure: :class:`~.Glycan`
+        """
+        self.keys.append(key)
+        self.fingerprints.append(self.fingerprint(structure))
+
+    def fingerprint(self, structure):
+        """Compute the :class:`StructureFingerprint` of `structure` with the
+        settings of this index
+
+        Returns
+        -------
+        :class:`StructureFingerprint`
+        """
+        return StructureFingerprint.from_structure(structure, self.max_path_length)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        return zip(self.keys, self.fingerprints)
+
+    def candidates(self, query, exact=False, include_substituents=True, tolerance=0):
+        """Find the keys of the structures which may contain `query`.
+
+        Parameters
+        ----------
+        query: :class:`~.Glycan` or :class:`StructureFingerprint`
+            The structure to search for
+        exact: bool
+            Whether the search will use :func:`~.exact_ordering_inclusion`
+        include_substituents: bool
+            Whether the search will compare substituents
+        tolerance: int
+            The similarity error the search will tolerate
+
+        Returns
+        -------
+        list
+        """
+        if not isinstance(query, StructureFingerprint):
+            query = self.fingerprint(query)
+        return [
+            key for key, fingerprint in zip(self.keys, self.fingerprints)
+            if fingerprint.may_contain(
+                query, exact=exact, include_substituents=include_substituents,
+                tolerance=tolerance)]
+
+    @trait_signature_scope()
+    def search(self, query, structures, exact=False, include_substituents=True, tolerance=0):
+        """Find the keys of the structures which contain `query`, screening with
+        :meth:`candidates` and confirming with :func:`~.subtree_of`.
+
+        Parameters
+        ----------
+        query: :class:`~.Glycan`
+            The structure to search for
+        structures: sequence or :class:`~.RecordDatabase`
+            The indexed structures, looked up by key. Objects with a ``structure``
+            attribute, like :class:`~.GlycanRecord`, are searched by that structure.
+        exact: bool
+            Whether to use :func:`~.exact_ordering_inclusion`
+        include_substituents: bool
+            Whether to compare substituents
+        tolerance: int
+            The similarity error to tolerate
+
+        Returns
+        -------
+        list
+        """
+        matches = []
+        for key in self.candidates(query, exact, include_substituents, tolerance):
+            target = structures[key]
+            target = getattr(target, "structure", target)
+            if subtree_of(query, target, exact=exact, include_substituents=include_substituents,
+                          tolerance=tolerance) is not None:
+                matches.append(key)
+        return matches
+
+    def __repr__(self):
+        return "SubstructureIndex(%d structures)" % (len(self),)
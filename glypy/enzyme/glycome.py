@@ -10,20 +10,24 @@ from .graph import _enzyme_graph_inner
 class Glycome(object):
 
     def __init__(self, glycosylases, glycosyltransferases, seeds, track_generations=False,
-                 limits=None):
+                 limits=None, codec=None):
         if limits is None:
             limits = []
         self.glycosylases = glycosylases
         self.glycosyltransferases = glycosyltransferases
         self.seeds = seeds
+        self.codec = codec
 
-        self.seen = DistinctGlycanSet()
+        self.seen = self._make_set()
         self.track_generations = track_generations
         self.enzyme_graph = defaultdict(_enzyme_graph_inner)
         self.history = []
-        self.current_generation = DistinctGlycanSet(seeds)
+        self.current_generation = self._make_set(seeds)
         self.limits = limits
 
+    def _make_set(self, structures=None):
+        return DistinctGlycanSet(structures, codec=self.codec)
+
     def save_generation(self, generation):
         if self.track_generations:
             self.history.append(generation)
@@ -46,7 +50,7 @@ class Glycome(object):
         return True
 
     def step(self):
-        next_generation = DistinctGlycanSet()
+        next_generation = self._make_set()
         for species in self.current_generation:
             parentkey = None
             for enzkey, enz in self.glycosylases.items():
@@ -78,10 +82,10 @@ def _MultiprocessingGlycome_worker(seeds_params):
     seeds, params, seen = seeds_params
     import dill
     (glycosylases, glycosyltransferases, _,
-     track_generations, limits) = dill.loads(params)
+     track_generations, limits, codec) = dill.loads(params)
     # limits.append(lambda x: x not in seen)
     glycome = Glycome(glycosylases, glycosyltransferases, seeds,
-                      track_generations, limits)
+                      track_generations, limits, codec=codec)
     glycome.step()
     return glycome.current_generation, glycome.enzyme_graph
 
@@ -89,18 +93,18 @@ def _MultiprocessingGlycome_worker(seeds_params):
 class MultiprocessingGlycome(Glycome):
 
     def __init__(self, glycosylases, glycosyltransferases, seeds, track_generations=False,
-                 limits=None, processes=None):
+                 limits=None, processes=None, codec=None):
         if processes is None:
             processes = min(multiprocessing.cpu_count(), 4)
         super(MultiprocessingGlycome, self).__init__(
             glycosylases, glycosyltransferases, seeds,
-            track_generations, limits)
+            track_generations, limits, codec=codec)
         self.processes = processes
         self.pool = None
-        self.seen = DistinctGlycanSet()
+        self.seen = self._make_set()
         self._worker_params = (
             self.glycosylases, self.glycosyltransferases, tuple(),
-            self.track_generations, self.limits)
+            self.track_generations, self.limits, self.codec)
 
     def _create_pool(self):
         self.pool = multiprocessing.Pool(self.processes)
@@ -128,7 +132,7 @@ class MultiprocessingGlycome(Glycome):
             return generation.partition(n_chunks)
 
     def step(self):
-        next_generation = DistinctGlycanSet()
+        next_generation = self._make_set()
         self._log(".... Starting Step")
         chunks = self._partition_generation(self.current_generation)
         self._log(".... Produced %d chunks" % (len(chunks) + 1,))
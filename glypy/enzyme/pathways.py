@@ -8,7 +8,7 @@ from glypy.io import iupac
 
 from glypy.structure.base import MoleculeBase
 from glypy.algorithms import subtree_search
-from glypy.algorithms.similarity import commutative_similarity
+from glypy.algorithms.similarity import commutative_similarity, trait_signature_scope
 
 from glypy.utils import root as proot
 
@@ -140,6 +140,7 @@ class Glycoenzyme(object):
     def _traverse(self, structure):
         raise NotImplementedError()
 
+    @trait_signature_scope()
     def traverse(self, structure):
         if self.validate_structure(structure):
             return list(self._traverse(structure))
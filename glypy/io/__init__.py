@@ -7,6 +7,15 @@ communicating with glycan structure databases, and interpreting glycan nomenclat
 __all__ = [
     "glycoct", "glycoct_xml", "linear_code", "iupac",
     "glyspace", "wurcs", "monosaccharidedb",
-    "format_constants_map",
+    "format_constants_map", "binary", "library", "cache",
     "nomenclature"
 ]
+
+
+def __getattr__(name):
+    # The format modules are only imported the first time they are accessed as
+    # attributes of this package
+    if name in __all__:
+        import importlib
+        return importlib.import_module("glypy.io." + name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
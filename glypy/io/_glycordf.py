@@ -1,17 +1,31 @@
-import pkg_resources
 import logging
 from rdflib import Graph, Namespace
 
+from glypy.utils import resource_stream
+from glypy.utils.lazy import ProxyObject
+
 logging.getLogger("rdflib.term").addHandler(logging.NullHandler())
 logging.getLogger("rdflib.term").propagate = False
 
 
 NSGlycan = ("http://purl.jp/bio/12/glyco/glycan#")
-glycordf = Graph().parse(pkg_resources.resource_stream(__name__, "data/glycordf.ttl"), format='turtle')
-_entities = set(glycordf.subjects()) | set(glycordf.objects())
-_entities = [
-    entity.replace(NSGlycan, "") for entity in _entities if (NSGlycan in entity)
-]
+
+
+def _load_glycordf():
+    with resource_stream(__name__, "data/glycordf.ttl") as stream:
+        return Graph().parse(stream, format='turtle')
+
+
+# Parsing the ontology takes longer than the rest of the module's import, so it
+# is deferred until the graph is first used
+glycordf = ProxyObject(_load_glycordf)
+
+
+def _entities():
+    entities = set(glycordf.subjects()) | set(glycordf.objects())
+    return [
+        entity.replace(NSGlycan, "") for entity in entities if (NSGlycan in entity)
+    ]
 
 
 class PopulatedNamespace(Namespace):
@@ -21,6 +35,8 @@ class PopulatedNamespace(Namespace):
         return inst
 
     def __dir__(self):
+        if callable(self._members):
+            self._members = self._members()
         members = dir(super(PopulatedNamespace, self))
         members = sorted(set(list(members) + self._members))
         return members
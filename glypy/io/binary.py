@@ -0,0 +1,762 @@
+'''
+A compact, versioned binary encoding for |Glycan| objects.
+
+The encoding is intended for storing, hashing and moving structures between
+processes, where :title-reference:`GlycoCT{condensed}` text or pickled object
+graphs are slow to produce and large. It is not meant to be read by people.
+
+Each message begins with a three byte header, the magic bytes ``GB`` followed by
+the format version. The header is followed by a table of the distinct strings used
+in the message (substituent names and composition formulae) and then a stream of
+unsigned varints describing every residue and every bond in the graph. Enumerated
+residue traits like :class:`~.Anomer` and :class:`~.Stem` are written as small integer
+codes, link positions are zig-zag encoded so that :const:`~.UnknownPosition` fits
+in a single byte, and substituents refer to their name by string table index.
+
+Like :mod:`glypy.io.glycoct`, node and link :attr:`id` values are not stored. A
+decoded structure is re-indexed by depth first traversal, so a structure which was
+itself parsed or re-indexed round-trips to an equal structure.
+
+When ``canonical=True`` is passed to :func:`encode`, residues and links are written
+in the same order that :class:`~.OrderRespectingGlycoCTWriter` would write them, so
+two structures with the same :title-reference:`GlycoCT{condensed}` representation
+produce the same bytes. This is more expensive than the default mode which writes
+nodes in the order they are stored in the graph.
+
+This module also provides :class:`StructureCodec`, a named pair of encoding
+and decoding functions which the storage and transport layers of :mod:`glypy`
+accept in place of their :title-reference:`GlycoCT{condensed}` defaults.
+'''
+import zlib
+
+from collections import deque
+
+from glypy.utils import basestring
+from glypy.utils.multimap import OrderedMultiMap
+from glypy.composition import Composition, formula
+from glypy.structure import constants
+from glypy.structure.glycan import Glycan
+from glypy.structure.monosaccharide import Monosaccharide, ReducedEnd
+from glypy.structure.substituent import Substituent
+from glypy.structure.link import Link, AmbiguousLink
+
+from .file_utils import ParserError
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+
+#: The magic bytes every encoded message starts with
+MAGIC = b'GB'
+
+#: The current format version. Bump this whenever the layout changes.
+FORMAT_VERSION = 1
+
+_HEADER = bytearray(MAGIC) + bytearray([FORMAT_VERSION])
+
+MONOSACCHARIDE_TAG = 0
+SUBSTITUENT_TAG = 1
+
+# Link flags
+_AMBIGUOUS_LINK = 1
+
+# Substituent flags
+_DERIVATIZED = 1
+
+
+class BinaryCodecError(ParserError):
+    pass
+
+
+def _build_enum_tables(enum):
+    '''Build the encoding and decoding tables for an :class:`~.Enum`.
+
+    Code 0 is reserved for a bare :const:`None`, code 1 is the member whose
+    value is :const:`None`, and every other member is written as its value
+    offset by two. Members are singletons, so the encoding table is keyed by
+    :func:`id` to avoid the cost of :meth:`EnumValue.__hash__`.
+    '''
+    encode_table = {id(None): 0}
+    decode_table = {0: None}
+    for _name, member in enum:
+        if member.value is None:
+            code = 1
+        else:
+            code = member.value + 2
+        encode_table[id(member)] = code
+        decode_table[code] = member
+    return encode_table, decode_table
+
+
+_anomer_codes, _anomer_values = _build_enum_tables(constants.Anomer)
+_superclass_codes, _superclass_values = _build_enum_tables(constants.SuperClass)
+_stem_codes, _stem_values = _build_enum_tables(constants.Stem)
+_configuration_codes, _configuration_values = _build_enum_tables(constants.Configuration)
+_modification_codes, _modification_values = _build_enum_tables(constants.Modification)
+_linkage_type_codes, _linkage_type_values = _build_enum_tables(constants.LinkageType)
+
+#: The maximum number of entries held by each of the composition caches
+#: before it is cleared
+max_cache_size = 1024
+
+# Maps formula strings and (superclass, modifications) codes to Composition
+# instances. Entries are never handed out directly, only clones of them, so
+# that decoded structures never share a mutable Composition.
+_composition_cache = {}
+_standard_composition_cache = {}
+
+
+def _cache_put(cache, key, value):
+    if len(cache) >= max_cache_size:
+        cache.clear()
+    cache[key] = value
+
+
+def _parse_formula(text):
+    try:
+        composition = _composition_cache[text]
+    except KeyError:
+        composition = Composition(text)
+        _cache_put(_composition_cache, text, composition)
+    return composition.clone()
+
+
+def _encode_position(position):
+    if position is None:
+        return 0
+    elif position < 0:
+        return -2 * position
+    return 2 * position + 1
+
+
+def _decode_position(code):
+    if code == 0:
+        return None
+    elif code & 1:
+        return (code - 1) >> 1
+    return -(code >> 1)
+
+
+def _pack_varints(values):
+    for value in values:
+        if value > 0x7f:
+            break
+    else:
+        return bytearray(values)
+    buffer = bytearray()
+    append = buffer.append
+    for value in values:
+        while value > 0x7f:
+            append((value & 0x7f) | 0x80)
+            value >>= 7
+        append(value)
+    return buffer
+
+
+def _unpack_varints(data, offset):
+    n = len(data)
+    i = offset
+    while i < n:
+        if data[i] > 0x7f:
+            break
+        i += 1
+    else:
+        return list(data[offset:])
+    values = list(data[offset:i])
+    append = values.append
+    while i < n:
+        byte = data[i]
+        i += 1
+        value = byte & 0x7f
+        shift = 7
+        while byte > 0x7f:
+            byte = data[i]
+            i += 1
+            value |= (byte & 0x7f) << shift
+            shift += 7
+        append(value)
+    return values
+
+
+class _StringTable(object):
+    def __init__(self):
+        self.index = {}
+        self.strings = []
+        # Link losses are usually shared instances, so remember them by
+        # identity for the lifetime of this table
+        self.composition_index = {}
+
+    def __call__(self, value):
+        '''Get the reference code for `value`, adding it to the table
+        if it is not yet present. :const:`None` is always code 0.
+        '''
+        if value is None:
+            return 0
+        try:
+            return self.index[value]
+        except KeyError:
+            self.strings.append(value)
+            code = self.index[value] = len(self.strings)
+            return code
+
+    def composition(self, value):
+        try:
+            return self.composition_index[id(value)][0]
+        except KeyError:
+            code = 0 if value is None else self(formula(value))
+            # Hold a reference to `value` so its id is not reused
+            self.composition_index[id(value)] = (code, value)
+            return code
+
+    def pack(self):
+        buffer = _pack_varints([len(self.strings)])
+        for string in self.strings:
+            encoded = string.encode('utf-8')
+            buffer += _pack_varints([len(encoded)])
+            buffer += encoded
+        return buffer
+
+
+def _node_link_lists(node):
+    if node.node_type is Monosaccharide.node_type:
+        return (node.links, node.substituent_links)
+    return (node.links,)
+
+
+def _collect_graph(structure):
+    '''Discover every node and link reachable from :attr:`structure.root`,
+    including those only reachable through ambiguous link choices.
+    '''
+    root = structure.root
+    nodes = [root]
+    node_index = {id(root): 0}
+    links = []
+    link_index = {}
+    queue = deque([root])
+    while queue:
+        node = queue.popleft()
+        for link_map in _node_link_lists(node):
+            for link in link_map.values():
+                if id(link) in link_index:
+                    continue
+                link_index[id(link)] = len(links)
+                links.append(link)
+                terminals = [link.parent, link.child]
+                if isinstance(link, AmbiguousLink):
+                    terminals.extend(link.parent_choices)
+                    terminals.extend(link.child_choices)
+                for terminal in terminals:
+                    if id(terminal) not in node_index:
+                        node_index[id(terminal)] = len(nodes)
+                        nodes.append(terminal)
+                        queue.append(terminal)
+    # Discovery order almost always already agrees with the order of every
+    # node's link maps, so only fall back to the more expensive ordering
+    # when it does not.
+    for node in nodes:
+        for link_map in _node_link_lists(node):
+            last = -1
+            for link in link_map.values():
+                current = link_index[id(link)]
+                if current < last:
+                    return nodes, node_index, _order_links(nodes, links)
+                last = current
+    return nodes, node_index, links
+
+
+def _order_links(nodes, links):
+    '''Order `links` so that applying them sequentially reproduces the order
+    of every node's link maps.
+
+    A link is emitted once it is at the head of both its parent-side and
+    child-side link list. If the lists are inconsistent with any global
+    order, the first pending link is forced out.
+    '''
+    queues = {}
+    keys = {}
+    for node in nodes:
+        for i, link_map in enumerate(_node_link_lists(node)):
+            key = (id(node), i)
+            queues[key] = deque(link_map.values())
+    for link in links:
+        parent_key = (id(link.parent), 1 if link.is_substituent_link() else 0)
+        keys[id(link)] = (parent_key, (id(link.child), 0))
+
+    emitted = set()
+    ordered = []
+
+    def head(key):
+        queue = queues.get(key)
+        if not queue:
+            return None
+        while queue and id(queue[0]) in emitted:
+            queue.popleft()
+        if queue:
+            return queue[0]
+        return None
+
+    pending = list(queues)
+    pending.reverse()
+    remaining = deque(links)
+    while len(ordered) < len(links):
+        while pending:
+            key = pending.pop()
+            link = head(key)
+            if link is None:
+                continue
+            parent_key, child_key = keys[id(link)]
+            if head(parent_key) is link and head(child_key) is link:
+                emitted.add(id(link))
+                ordered.append(link)
+                pending.append(child_key)
+                pending.append(parent_key)
+        if len(ordered) < len(links):
+            while id(remaining[0]) in emitted:
+                remaining.popleft()
+            link = remaining.popleft()
+            emitted.add(id(link))
+            ordered.append(link)
+            pending.extend(keys[id(link)])
+    return ordered
+
+
+class _StructureHolder(object):
+    # OrderingComparisonContext reads the structure from its parent writer
+    def __init__(self, structure):
+        self.structure = structure
+
+
+def _canonical_graph(structure):
+    '''Discover nodes and links in the order :class:`~.OrderRespectingGlycoCTWriter`
+    writes them.
+    '''
+    from .glycoct import OrderingComparisonContext
+
+    context = OrderingComparisonContext(_StructureHolder(structure))
+
+    def outgoing(node):
+        if node.node_type is Monosaccharide.node_type:
+            link_collection = list(node.substituent_links.values())
+            link_collection.extend(cl for p, cl in node.children(links=True))
+        else:
+            link_collection = [cl for p, cl in node.children(links=True)]
+        # A single link needs no ordering, and comparing links is expensive
+        if len(link_collection) < 2:
+            return link_collection
+        return context.sort_links(link_collection)
+
+    root = structure.root
+    nodes = [root]
+    node_index = {id(root): 0}
+    links = []
+    link_queue = deque(outgoing(root))
+    while link_queue:
+        link = link_queue.popleft()
+        links.append(link)
+        child = link.child
+        if id(child) in node_index:
+            continue
+        node_index[id(child)] = len(nodes)
+        nodes.append(child)
+        link_queue.extendleft(outgoing(child)[::-1])
+    for link in links:
+        if isinstance(link, AmbiguousLink):
+            for terminal in link.parent_choices + link.child_choices:
+                if id(terminal) not in node_index:
+                    node_index[id(terminal)] = len(nodes)
+                    nodes.append(terminal)
+    return nodes, node_index, links
+
+
+def _encode_link(link, node_index, strings, out):
+    flags = 0
+    ambiguous = isinstance(link, AmbiguousLink)
+    if ambiguous:
+        flags |= _AMBIGUOUS_LINK
+    out.extend((
+        flags,
+        node_index[id(link.parent)],
+        node_index[id(link.child)],
+        _encode_position(link.parent_position),
+        _encode_position(link.child_position),
+        strings.composition(link.parent_loss),
+        strings.composition(link.child_loss),
+        _linkage_type_codes[id(link.parent_linkage_type)],
+        _linkage_type_codes[id(link.child_linkage_type)]))
+    if ambiguous:
+        out.append(len(link.parent_choices))
+        out.extend(node_index[id(node)] for node in link.parent_choices)
+        out.append(len(link.child_choices))
+        out.extend(node_index[id(node)] for node in link.child_choices)
+        out.append(len(link.parent_position_choices))
+        out.extend(_encode_position(p) for p in link.parent_position_choices)
+        out.append(len(link.child_position_choices))
+        out.extend(_encode_position(p) for p in link.child_position_choices)
+
+
+def _encode_monosaccharide(node, strings, out):
+    configuration = node._configuration
+    stem = node._stem
+    out.append(MONOSACCHARIDE_TAG)
+    out.append(_anomer_codes[id(node._anomer)])
+    out.append(_superclass_codes[id(node._superclass)])
+    out.append(len(stem))
+    for i in range(len(stem)):
+        out.append(_configuration_codes[id(configuration[i])])
+        out.append(_stem_codes[id(stem[i])])
+    out.append(_encode_position(node.ring_start))
+    out.append(_encode_position(node.ring_end))
+    modifications = [
+        (position, modification) for position, modification in node.modifications.items()
+        if not isinstance(modification, ReducedEnd)]
+    out.append(len(modifications))
+    for position, modification in modifications:
+        out.append(_encode_position(position))
+        out.append(_modification_codes[id(modification)])
+    reducing_end = node.reducing_end
+    if reducing_end is None:
+        out.append(0)
+    else:
+        substituent_links = list(reducing_end.links.values())
+        out.append(1 + len(substituent_links))
+        out.append(strings.composition(reducing_end.base_composition))
+        out.append(reducing_end.valence)
+        for link in substituent_links:
+            child = link.child
+            out.extend((
+                strings(child.name),
+                _DERIVATIZED if child._derivatize else 0,
+                _encode_position(link.parent_position),
+                _encode_position(link.child_position),
+                strings.composition(link.parent_loss),
+                strings.composition(link.child_loss)))
+
+
+def _encode_substituent(node, strings, out):
+    out.append(SUBSTITUENT_TAG)
+    out.append(strings(node.name))
+    out.append(_DERIVATIZED if node._derivatize else 0)
+
+
+def encode(structure, canonical=False):
+    '''Encode `structure` into compact binary form.
+
+    Parameters
+    ----------
+    structure: :class:`~.Glycan`
+        The structure to encode
+    canonical: :class:`bool`
+        Whether to write residues in the same order as :func:`glypy.io.glycoct.dumps`,
+        making the encoding identical for all structures with the same
+        :title-reference:`GlycoCT{condensed}`. Defaults to |False|
+
+    Returns
+    -------
+    :class:`bytes`
+    '''
+    if not isinstance(structure, Glycan):
+        raise TypeError("Cannot encode %r, only Glycan instances are supported" % (type(structure),))
+    if canonical:
+        nodes, node_index, links = _canonical_graph(structure)
+    else:
+        nodes, node_index, links = _collect_graph(structure)
+    strings = _StringTable()
+    out = [len(nodes)]
+    for node in nodes:
+        if node.node_type is Monosaccharide.node_type:
+            _encode_monosaccharide(node, strings, out)
+        elif node.node_type is Substituent.node_type:
+            _encode_substituent(node, strings, out)
+        else:
+            raise TypeError("Cannot encode node %r" % (node,))
+    out.append(len(links))
+    for link in links:
+        _encode_link(link, node_index, strings, out)
+    buffer = bytearray(_HEADER)
+    buffer += strings.pack()
+    buffer += _pack_varints(out)
+    return bytes(buffer)
+
+
+def _read_strings(data, offset):
+    n = len(data)
+    strings = [None]
+    count = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        count |= (byte & 0x7f) << shift
+        shift += 7
+        if byte < 0x80:
+            break
+    for _i in range(count):
+        length = 0
+        shift = 0
+        while True:
+            byte = data[offset]
+            offset += 1
+            length |= (byte & 0x7f) << shift
+            shift += 7
+            if byte < 0x80:
+                break
+        end = offset + length
+        if end > n:
+            raise BinaryCodecError("String table extends beyond the end of the message")
+        strings.append(bytes(data[offset:end]).decode('utf-8'))
+        offset = end
+    return strings, offset
+
+
+def decode(data, structure_class=Glycan):
+    '''Decode a structure produced by :func:`encode`.
+
+    Parameters
+    ----------
+    data: :class:`bytes`
+        The encoded structure
+    structure_class: type, optional
+        The :class:`~.Glycan` subclass to produce
+
+    Returns
+    -------
+    :class:`~.Glycan`
+
+    Raises
+    ------
+    BinaryCodecError:
+        If `data` is not a supported encoded structure
+    '''
+    data = bytearray(data)
+    if len(data) < 3:
+        raise BinaryCodecError("Truncated encoded structure of %d bytes" % (len(data),))
+    if data[:2] != MAGIC:
+        raise BinaryCodecError("Not an encoded glycan structure")
+    if data[2] != FORMAT_VERSION:
+        raise BinaryCodecError("Unsupported format version %d" % (data[2],))
+    try:
+        strings, offset = _read_strings(data, 3)
+        values = _unpack_varints(data, offset)
+        nodes = _decode_nodes(values, strings)
+    except (IndexError, KeyError, StopIteration) as err:
+        raise BinaryCodecError("Malformed encoded structure: %r" % (err,))
+    return structure_class(root=nodes[0], index_method='dfs')
+
+
+def _decode_nodes(values, strings):
+    stream = iter(values)
+    read = next
+    parse_formula = _parse_formula
+    nodes = []
+    n_nodes = read(stream)
+    for i in range(n_nodes):
+        tag = read(stream)
+        if tag == MONOSACCHARIDE_TAG:
+            anomer = _anomer_values[read(stream)]
+            superclass_code = read(stream)
+            superclass = _superclass_values[superclass_code]
+            n_stem = read(stream)
+            configuration = []
+            stem = []
+            for _j in range(n_stem):
+                configuration.append(_configuration_values[read(stream)])
+                stem.append(_stem_values[read(stream)])
+            ring_start = _decode_position(read(stream))
+            ring_end = _decode_position(read(stream))
+            modifications = OrderedMultiMap()
+            composition_key = [superclass_code]
+            for _j in range(read(stream)):
+                position = read(stream)
+                modification = read(stream)
+                composition_key.append(position)
+                composition_key.append(modification)
+                modifications[_decode_position(position)] = _modification_values[modification]
+            reduction = read(stream)
+            reduced = None
+            if reduction:
+                reduced = ReducedEnd(
+                    parse_formula(strings[read(stream)]), valence=read(stream), id=-(i + 1))
+                for _j in range(reduction - 1):
+                    substituent = Substituent(strings[read(stream)], derivatize=bool(read(stream) & _DERIVATIZED))
+                    Link(reduced, substituent,
+                         parent_position=_decode_position(read(stream)),
+                         child_position=_decode_position(read(stream)),
+                         parent_loss=parse_formula(strings[read(stream)]),
+                         child_loss=parse_formula(strings[read(stream)]))
+            # The base composition depends only on the superclass and modifications,
+            # so it is computed once per distinct combination
+            composition_key = tuple(composition_key)
+            composition = _standard_composition_cache.get(composition_key)
+            node = Monosaccharide(
+                fast=True, anomer=anomer, superclass=superclass, configuration=configuration,
+                stem=stem, ring_start=ring_start, ring_end=ring_end, modifications=modifications,
+                reduced=reduced, id=i + 1,
+                composition=composition.clone() if composition is not None else None)
+            if composition is None:
+                _cache_put(_standard_composition_cache, composition_key, node.composition.clone())
+        elif tag == SUBSTITUENT_TAG:
+            node = Substituent(strings[read(stream)], id=i + 1, derivatize=bool(read(stream) & _DERIVATIZED))
+        else:
+            raise BinaryCodecError("Unknown node tag %d" % (tag,))
+        nodes.append(node)
+    n_links = read(stream)
+    for i in range(n_links):
+        flags = read(stream)
+        parent = nodes[read(stream)]
+        child = nodes[read(stream)]
+        parent_position = _decode_position(read(stream))
+        child_position = _decode_position(read(stream))
+        parent_loss = parse_formula(strings[read(stream)])
+        child_loss = parse_formula(strings[read(stream)])
+        parent_linkage_type = _linkage_type_values[read(stream)]
+        child_linkage_type = _linkage_type_values[read(stream)]
+        if flags & _AMBIGUOUS_LINK:
+            parent_choices = [nodes[read(stream)] for _j in range(read(stream))]
+            child_choices = [nodes[read(stream)] for _j in range(read(stream))]
+            parent_position_choices = [_decode_position(read(stream)) for _j in range(read(stream))]
+            child_position_choices = [_decode_position(read(stream)) for _j in range(read(stream))]
+            link = AmbiguousLink(
+                parent_choices, child_choices, parent_position_choices, child_position_choices,
+                parent_loss, child_loss, id=i + 1, attach=False,
+                parent_linkage_type=parent_linkage_type, child_linkage_type=child_linkage_type)
+            link.parent = parent
+            link.child = child
+            link.parent_position = parent_position
+            link.child_position = child_position
+            link.apply()
+        else:
+            Link(parent, child, parent_position=parent_position, child_position=child_position,
+                 parent_loss=parent_loss, child_loss=child_loss, id=i + 1,
+                 parent_linkage_type=parent_linkage_type, child_linkage_type=child_linkage_type)
+    return nodes
+
+
+#: Alias of :func:`encode`
+dumps = encode
+
+#: Alias of :func:`decode`
+loads = decode
+
+
+def detect_binary(data):
+    '''Test whether `data` looks like the output of :func:`encode`
+    '''
+    if isinstance(data, basestring) and not isinstance(data, bytes):
+        return False
+    return bytes(data[:2]) == MAGIC
+
+
+class StructureCodec(object):
+    '''A named pair of functions for converting a |Glycan| to and from :class:`bytes`.
+
+    Codecs are looked up by name with :func:`get_codec`, and are pickled by name so
+    that they can be sent to worker processes.
+
+    Attributes
+    ----------
+    name: :class:`str`
+        The name the codec is registered under
+    compress: :class:`bool`
+        Whether consumers should :func:`zlib.compress` the encoded bytes
+        before storing them.
+    '''
+
+    def __init__(self, name, encoder, decoder, canonical_encoder=None, compress=False):
+        self.name = name
+        self.encoder = encoder
+        self.decoder = decoder
+        self.canonical_encoder = canonical_encoder or encoder
+        self.compress = compress
+
+    def encode(self, structure):
+        return self.encoder(structure)
+
+    def canonical_encode(self, structure):
+        '''Encode `structure` such that all structures which are equal under
+        :title-reference:`GlycoCT{condensed}` canonicalization produce the
+        same bytes.
+        '''
+        return self.canonical_encoder(structure)
+
+    def decode(self, data):
+        return self.decoder(data)
+
+    def pack(self, structure, canonical=False):
+        '''Encode `structure` and compress it if :attr:`compress` is set
+        '''
+        data = self.canonical_encoder(structure) if canonical else self.encoder(structure)
+        if self.compress:
+            data = zlib.compress(data)
+        return data
+
+    def unpack(self, data):
+        '''The inverse of :meth:`pack`
+        '''
+        if self.compress:
+            data = zlib.decompress(data)
+        return self.decoder(data)
+
+    def __reduce__(self):
+        return get_codec, (self.name,)
+
+    def __repr__(self):
+        return "{self.__class__.__name__}({self.name!r})".format(self=self)
+
+
+def _glycoct_encode(structure):
+    from glypy.io import glycoct
+    return glycoct.dumps(structure).encode('utf-8')
+
+
+def _glycoct_decode(data):
+    from glypy.io import glycoct
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode('utf-8')
+    return glycoct.loads(data)
+
+
+def _canonical_encode(structure):
+    return encode(structure, canonical=True)
+
+
+#: The registry of named :class:`StructureCodec` instances
+structure_codecs = {}
+
+
+def register_codec(codec):
+    '''Add `codec` to :data:`structure_codecs` under :attr:`StructureCodec.name`
+    '''
+    structure_codecs[codec.name] = codec
+    return codec
+
+
+def get_codec(codec):
+    '''Resolve `codec` to a :class:`StructureCodec`.
+
+    Parameters
+    ----------
+    codec: :class:`str` or :class:`StructureCodec` or |None|
+        The codec or the name of a registered codec. |None| selects
+        the ``"glycoct"`` codec.
+
+    Returns
+    -------
+    :class:`StructureCodec`
+    '''
+    if codec is None:
+        codec = "glycoct"
+    if isinstance(codec, StructureCodec):
+        return codec
+    try:
+        return structure_codecs[codec]
+    except KeyError:
+        raise KeyError("No structure codec named %r. Available codecs are %r" % (
+            codec, sorted(structure_codecs)))
+
+
+glycoct_codec = register_codec(StructureCodec(
+    "glycoct", _glycoct_encode, _glycoct_decode, compress=True))
+binary_codec = register_codec(StructureCodec(
+    "binary", encode, decode, _canonical_encode, compress=False))
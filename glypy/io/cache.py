@@ -0,0 +1,170 @@
+'''
+An opt-in cache of parsed structures, shared by the text format readers in
+:mod:`glypy.io`.
+
+When enabled, the results of :func:`glypy.io.glycoct.loads`, :func:`glypy.io.wurcs.loads`,
+:func:`glypy.io.iupac.from_iupac`, :func:`glypy.io.linear_code.loads` and
+:func:`glypy.io.glycoct_xml.loads` are stored keyed by the format, the text, and any
+other arguments, so parsing the same text again returns a clone of the stored structure
+instead of running the parser. The cache holds at most :attr:`ParseCache.max_size`
+entries, discarding the least recently used entry when it is full.
+
+The cache is disabled by default, since cloning is only cheaper than parsing when the
+same text is seen many times.
+
+.. code-block:: python
+
+    from glypy.io import cache, glycoct
+
+    cache.enable(max_size=10000)
+    for text in texts:
+        structure = glycoct.loads(text)
+    print(cache.stats())
+    cache.clear()
+
+'''
+import threading
+
+from collections import OrderedDict
+from functools import wraps
+
+from glypy.utils import basestring, CacheStats
+
+
+def _clone(value):
+    if isinstance(value, list):
+        return [_clone(v) for v in value]
+    return value.clone()
+
+
+class ParseCache(object):
+    '''A size-bounded least-recently-used mapping from parser inputs to parsed structures.
+
+    Attributes
+    ----------
+    enabled: :class:`bool`
+        Whether parsers consult the cache
+    max_size: :class:`int`
+        The maximum number of entries to store
+    hits: :class:`int`
+        The number of lookups answered from the cache
+    misses: :class:`int`
+        The number of lookups which ran the parser
+    '''
+
+    def __init__(self, max_size=1024, enabled=False):
+        self.max_size = max_size
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._store = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._store)
+
+    def __contains__(self, key):
+        return key in self._store
+
+    def lookup(self, key, parser, *args, **kwargs):
+        '''Get a clone of the structure stored under `key`, or call
+        ``parser(*args, **kwargs)``, store its result under `key`, and
+        return a clone of it.
+        '''
+        with self._lock:
+            try:
+                value = self._store.pop(key)
+            except KeyError:
+                value = None
+            if value is not None:
+                # Re-inserting marks the entry as the most recently used
+                self._store[key] = value
+                self.hits += 1
+                return _clone(value)
+            self.misses += 1
+        value = parser(*args, **kwargs)
+        with self._lock:
+            self._store[key] = value
+            while len(self._store) > self.max_size:
+                self._store.popitem(last=False)
+        return _clone(value)
+
+    def clear(self):
+        '''Remove all entries and reset the hit and miss counts
+        '''
+        with self._lock:
+            self._store.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        '''
+        Returns
+        -------
+        :class:`CacheStats`
+        '''
+        return CacheStats(self.hits, self.misses, len(self._store), self.max_size)
+
+    def __repr__(self):
+        return "%s(%r, enabled=%r)" % (self.__class__.__name__, self.stats(), self.enabled)
+
+
+#: The cache used by the parsers in :mod:`glypy.io`
+parse_cache = ParseCache()
+
+
+def enable(max_size=None):
+    '''Start caching parsed structures, optionally changing the cache's size
+    '''
+    if max_size is not None:
+        parse_cache.max_size = max_size
+    parse_cache.enabled = True
+
+
+def disable():
+    '''Stop caching parsed structures and discard any stored structures
+    '''
+    parse_cache.enabled = False
+    parse_cache.clear()
+
+
+def is_enabled():
+    return parse_cache.enabled
+
+
+def clear():
+    '''Discard all cached structures and reset the cache's statistics
+    '''
+    parse_cache.clear()
+
+
+def stats():
+    '''Get the hit and miss counts and size of the cache
+
+    Returns
+    -------
+    :class:`CacheStats`
+    '''
+    return parse_cache.stats()
+
+
+def cached_parser(format_name):
+    '''Decorate a function which parses text as its first argument so that its results
+    are stored in :data:`parse_cache` under ``(format_name, text, arguments)`` when the
+    cache is enabled.
+
+    Calls whose arguments cannot be hashed bypass the cache.
+    '''
+    def decorator(parser):
+        @wraps(parser)
+        def wrapper(text, *args, **kwargs):
+            if not parse_cache.enabled or not isinstance(text, basestring):
+                return parser(text, *args, **kwargs)
+            key = (format_name, text, args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                return parser(text, *args, **kwargs)
+            return parse_cache.lookup(key, parser, text, *args, **kwargs)
+        return wrapper
+    return decorator
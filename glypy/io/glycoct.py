@@ -24,6 +24,8 @@ References
 
 import re
 import warnings
+import threading
+import multiprocessing
 from collections import defaultdict, Counter, deque, namedtuple, OrderedDict
 from functools import cmp_to_key
 
@@ -43,6 +45,7 @@ from .format_constants_map import (anomer_map, superclass_map,
                                    link_replacement_composition_map,
                                    modification_map, linkage_type_map)
 from .file_utils import ParserError
+from .cache import cached_parser
 from .tree_builder_utils import (
     decorate_tree,
     undecorate_tree,
@@ -1583,6 +1586,7 @@ def load(stream, structure_class=Glycan, allow_repeats=True, allow_multiple=True
         return first
 
 
+@cached_parser("glycoct")
 def loads(text, structure_class=Glycan, allow_repeats=True, allow_multiple=True):
     """Read all structures from the provided text string.
 
@@ -1604,6 +1608,233 @@ def loads(text, structure_class=Glycan, allow_repeats=True, allow_multiple=True)
     return load(text_buffer, structure_class, allow_repeats, allow_multiple)
 
 
+_subgraph_header_prefixes = (REP, UND, "ParentIDs", "SubtreeLinkageID")
+
+
+def _split_records(handle, chunk_size):
+    # Group the lines of `handle` into chunks of `chunk_size` records, where each
+    # record begins with a RES section header which does not open the sub-graph
+    # of a REP or UND section.
+    chunk = []
+    n_records = 0
+    previous = ''
+    for line in handle:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        stripped = line.strip()
+        if stripped == RES and not previous.startswith(_subgraph_header_prefixes):
+            if n_records == chunk_size:
+                yield ''.join(chunk)
+                chunk = []
+                n_records = 0
+            n_records += 1
+        if stripped:
+            previous = stripped
+        chunk.append(line)
+    if chunk:
+        yield ''.join(chunk)
+
+
+def _parse_chunk(args):
+    text, structure_class, allow_repeats, codec = args
+    structures = GlycoCTReader(StringIO(text), structure_class=structure_class, allow_repeats=allow_repeats)
+    if codec is None:
+        return list(structures)
+    from .binary import get_codec
+    codec = get_codec(codec)
+    return [codec.pack(structure) for structure in structures]
+
+
+def iterparse(stream, processes=None, chunk_size=1000, structure_class=Glycan, allow_repeats=True, codec=None):
+    """Parse all structures from the provided text stream using a pool of
+    worker processes, yielding them in the order they appear in the stream.
+
+    The stream is split into chunks of `chunk_size` records at ``RES`` section
+    boundaries and each chunk is parsed in a worker process. At most two chunks
+    per process are read ahead of the structure being yielded, so memory use does
+    not grow with the size of the stream.
+
+    Parameters
+    ----------
+    stream : str or file-like
+        The path to the file to read, or a text stream
+    processes : int, optional
+        The number of worker processes to use. Defaults to :func:`multiprocessing.cpu_count`.
+        If ``1``, structures are parsed in the calling process.
+    chunk_size : int, optional
+        The number of records to send to a worker at a time
+    structure_class : type, optional
+        :class:`~.Glycan` subclass to use
+    allow_repeats : bool, optional
+        Whether or not to allow ``REP`` sections
+    codec : str or :class:`~.StructureCodec`, optional
+        If given, yield the encoding of each structure produced by
+        :meth:`~.StructureCodec.pack` instead of the structure itself. Encoding
+        is done in the worker processes, and the encoded bytes are much cheaper
+        to send between processes than whole structures.
+
+    Yields
+    ------
+    :class:`~.Glycan` or :class:`bytes`
+    """
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    handle = opener(stream, "r")
+    try:
+        for item in _iterparse(handle, processes, chunk_size, structure_class, allow_repeats, codec):
+            yield item
+    finally:
+        if handle is not stream:
+            handle.close()
+
+
+def _iterparse(handle, processes, chunk_size, structure_class, allow_repeats, codec):
+    chunks = _split_records(handle, chunk_size)
+    if processes <= 1:
+        for text in chunks:
+            for item in _parse_chunk((text, structure_class, allow_repeats, codec)):
+                yield item
+        return
+    pool = multiprocessing.Pool(processes)
+    try:
+        pending = deque()
+        for text in chunks:
+            pending.append(pool.apply_async(_parse_chunk, ((text, structure_class, allow_repeats, codec),)))
+            if len(pending) >= processes * 2:
+                for item in pending.popleft().get():
+                    yield item
+        while pending:
+            for item in pending.popleft().get():
+                yield item
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+_composition_residue_pattern = re.compile(r"^(\d+)([bs])(:.*)$")
+_composition_link_pattern = re.compile(r"^\d+:(\d+)([a-z])\(([^)]*)\)(\d+)([a-z])$")
+
+# Maps a residue code, the residue line body and its substituents' link text, to the
+# MonosaccharideResidue it describes and whether that residue carries a derivatizing group
+_residue_code_cache = {}
+
+#: The maximum number of distinct residue codes to cache before clearing the cache
+max_cached_residue_codes = 4096
+
+
+def _residue_from_code(code):
+    try:
+        return _residue_code_cache[code]
+    except KeyError:
+        pass
+    from glypy.structure.glycan_composition import MonosaccharideResidue
+    from glypy.composition.composition_transform import has_derivatization
+    body, substituent_links = code
+    res = ["RES", "1b" + body]
+    lin = ["LIN"]
+    for i, (parent_loss, positions, name, child_loss) in enumerate(substituent_links, 2):
+        res.append("%ds:%s" % (i, name))
+        lin.append("%d:1%s(%s)%d%s" % (i - 1, parent_loss, positions, i, child_loss))
+    residue = next(GlycoCTReader(StringIO('\n'.join(res + lin)))).root
+    value = (MonosaccharideResidue.from_monosaccharide(residue), has_derivatization(residue))
+    if len(_residue_code_cache) >= max_cached_residue_codes:
+        _residue_code_cache.clear()
+    _residue_code_cache[code] = value
+    return value
+
+
+def _scan_residue_codes(text):
+    # Returns the code of each monosaccharide in the RES section in order, or
+    # None if the text uses any feature which requires the full parser.
+    residues = OrderedDict()
+    substituents = {}
+    substituent_links = defaultdict(list)
+    state = None
+    for segment in re.split(r"\s|;", text):
+        if not segment:
+            continue
+        if segment == RES:
+            if state is not None:
+                # A second structure
+                return None
+            state = RES
+        elif segment == LIN:
+            state = LIN
+        elif state == RES:
+            match = _composition_residue_pattern.match(segment)
+            if match is None:
+                return None
+            ix, kind, body = match.groups()
+            if kind == 'b':
+                residues[ix] = body
+            else:
+                substituents[ix] = body[1:]
+        elif state == LIN:
+            match = _composition_link_pattern.match(segment)
+            if match is None:
+                return None
+            parent_ix, parent_loss, positions, child_ix, child_loss = match.groups()
+            if parent_ix in substituents or child_ix == '1':
+                # Bridging substituents and cyclic structures
+                return None
+            if child_ix in substituents:
+                name = substituents.pop(child_ix)
+                if parent_ix not in residues:
+                    return None
+                substituent_links[parent_ix].append((parent_loss, positions, name, child_loss))
+        else:
+            return None
+    if substituents or not residues or next(iter(residues)) != '1':
+        # A substituent which is unattached, shared, or the root
+        return None
+    # Substituents are kept in the order they are linked, which is the order the parser
+    # attaches them in, as the residue's name depends on it
+    return [(body, tuple(substituent_links[ix])) for ix, body in residues.items()]
+
+
+def composition_of(text, structure_class=Glycan):
+    """Compute the :class:`~.GlycanComposition` of the structure written in `text`
+    without building its graph.
+
+    The ``RES`` section is scanned for residue lines, and the ``LIN`` section only
+    for the links which attach substituents to their monosaccharides. Each distinct
+    monosaccharide and substituent combination is converted to a
+    :class:`~.MonosaccharideResidue` once and cached. Structures which use ``REP``
+    or ``UND`` sections, or substituents which bridge residues, are parsed in full.
+
+    The result is the same as ``GlycanComposition.from_glycan(loads(text))``, so its
+    :meth:`~.GlycanComposition.mass` is that of the structure. If `text` describes a
+    composition, it is returned as parsed.
+
+    Parameters
+    ----------
+    text : str
+        The text of a single structure
+    structure_class : type, optional
+        :class:`~.Glycan` subclass to use if the structure must be fully parsed
+
+    Returns
+    -------
+    :class:`~.GlycanComposition`
+    """
+    from glypy.structure.glycan_composition import GlycanComposition
+    codes = _scan_residue_codes(text)
+    if codes is None:
+        structure = loads(text, structure_class=structure_class, allow_multiple=False)
+        if isinstance(structure, GlycanComposition):
+            return structure
+        return GlycanComposition.from_glycan(structure)
+    composition = GlycanComposition()
+    for code, count in Counter(codes).items():
+        residue, _derivatization = _residue_from_code(code)
+        composition[residue] += count
+    root_derivatization = _residue_from_code(codes[0])[1]
+    if root_derivatization:
+        composition._composition_offset += (
+            root_derivatization.total_composition() - root_derivatization.attachment_composition_loss()) * 2
+    return composition
+
+
 def detect_glycoct(string):
     return string.lstrip()[:3] == "RES"
 
@@ -1788,11 +2019,9 @@ class GlycoCTWriterBase(object):
     def handle_substituent(self, substituent):  # pylint: disable=redefined-outer-name
         return "s:{0}".format(substituent.name.replace("_", "-"))
 
-    def _format_monosaccharide(self, monosaccharide):  # pylint: disable=redefined-outer-name
-        residue_template = "{ix}b:{anomer}{conf_stem}{superclass}-{ring_start}:{ring_end}{modifications}"
-
-        # This index is reused many times
-        monosaccharide_index = self.res_counter()
+    def _format_residue_body(self, monosaccharide):  # pylint: disable=redefined-outer-name
+        # The residue line following its index
+        residue_template = "b:{anomer}{conf_stem}{superclass}-{ring_start}:{ring_end}{modifications}"
 
         # Format individual fields
         anomer = invert_anomer_map[monosaccharide.anomer]
@@ -1809,10 +2038,16 @@ class GlycoCTWriterBase(object):
         ring_start = monosaccharide.ring_start if monosaccharide.ring_start not in null_positions else 'x'
         ring_end = monosaccharide.ring_end if monosaccharide.ring_end not in null_positions else 'x'
 
+        return residue_template.format(anomer=anomer, conf_stem=conf_stem,
+                                       superclass=superclass, modifications=modifications,
+                                       ring_start=ring_start, ring_end=ring_end)
+
+    def _format_monosaccharide(self, monosaccharide):  # pylint: disable=redefined-outer-name
+        # This index is reused many times
+        monosaccharide_index = self.res_counter()
+
         # The complete monosaccharide residue line
-        residue_str = residue_template.format(ix=monosaccharide_index, anomer=anomer, conf_stem=conf_stem,
-                                              superclass=superclass, modifications=modifications,
-                                              ring_start=ring_start, ring_end=ring_end)
+        residue_str = str(monosaccharide_index) + self._format_residue_body(monosaccharide)
         return residue_str, monosaccharide_index
 
     def handle_monosaccharide(self, monosaccharide):  # pylint: disable=redefined-outer-name
@@ -1976,7 +2211,7 @@ class GlycanCompositionGlycoCTWriter(GlycoCTWriterBase):
             from glypy.structure.named_structures import monosaccharides
             try:
                 if link.child.name == 'n_acetyl':
-                    if identity.is_a(link.parent, monosaccharides.HexNAc):
+                    if identity.is_a(link.parent, monosaccharides.view("HexNAc")):
                         if link.parent_position == -1:
                             link.parent_position = 2
             except AttributeError:
@@ -2443,6 +2678,125 @@ class OrderRespectingGlycoCTWriter(GlycoCTWriterBase):
 GlycoCTWriter = OrderRespectingGlycoCTWriter
 
 
+class LeanGlycoCTWriter(OrderRespectingGlycoCTWriter):
+    """A fast path for serializing |Glycan| objects, producing the same text
+    as :class:`OrderRespectingGlycoCTWriter`.
+
+    The writer is meant to be reused for many structures through :meth:`write`.
+    Lines are accumulated in a :class:`list` instead of a :class:`StringIO`, residues
+    are indexed in plain :class:`dict` objects instead of :class:`DictTree`, and the
+    text of each distinct residue line, less its index, is computed once and cached.
+
+    This writer does not write ``UND`` sections, so it does not accept
+    :class:`~.GlycanComposition` objects.
+    """
+
+    #: The maximum number of distinct residue lines to cache before clearing the cache
+    max_cached_residues = 4096
+
+    def __init__(self, structure=None, full=True):
+        self._residue_cache = {}
+        self.lines = []
+        super(LeanGlycoCTWriter, self).__init__(structure, None, full)
+
+    def _initialize_index_tree(self):
+        self.index_to_residue = {}
+        self.residue_to_index = {}
+
+    def _reset(self):
+        self.state = START
+        self._initialize_counters()
+        self._initialize_index_tree()
+        self.link_queue = deque()
+        self.lines = []
+
+    def _residue_text(self, monosaccharide):  # pylint: disable=redefined-outer-name
+        key = (monosaccharide.anomer, tuple(monosaccharide.configuration), tuple(monosaccharide.stem),
+               monosaccharide.superclass, monosaccharide.ring_start, monosaccharide.ring_end,
+               tuple(monosaccharide.modifications.items()))
+        try:
+            return self._residue_cache[key]
+        except KeyError:
+            pass
+        text = self._format_residue_body(monosaccharide)
+        if len(self._residue_cache) >= self.max_cached_residues:
+            self._residue_cache.clear()
+        self._residue_cache[key] = text
+        return text
+
+    def _format_monosaccharide(self, monosaccharide):  # pylint: disable=redefined-outer-name
+        monosaccharide_index = self.res_counter()
+        return "%d%s" % (monosaccharide_index, self._residue_text(monosaccharide)), monosaccharide_index
+
+    def handle_glycan(self, structure):
+        if structure is None:
+            raise GlycoCTError("No structure is ready to be written.")
+        lines = self.lines
+        lines.append("RES")
+
+        visited = set()
+        if structure.root.node_type is Monosaccharide.node_type:
+            lines.append(self.handle_monosaccharide(structure.root))
+        else:
+            lines.append(self.handle_substituent(structure.root))
+        links_in_order = []
+        link_queue = self.link_queue
+        while link_queue:
+            link = link_queue.popleft()
+            links_in_order.append(link)
+            child = link.child
+            if child.id in visited:
+                continue
+            visited.add(child.id)
+            if child.node_type is Monosaccharide.node_type:
+                lines.append(self.handle_monosaccharide(child))
+            else:
+                lines.append(self.handle_substituent(child))
+
+        lines.append("LIN")
+        residue_to_index = self.residue_to_index
+        full = self.full
+        for link in links_in_order:
+            if not full and not link.is_substituent_link():
+                continue
+            lines.append(self.handle_link(
+                link, self.lin_counter(), residue_to_index[link.parent.id],
+                residue_to_index[link.child.id]))
+        lines.append('')
+        return '\n'.join(lines)
+
+    def write(self, structure):
+        """Serialize `structure`, returning the text.
+
+        Parameters
+        ----------
+        structure: |Glycan|
+
+        Returns
+        -------
+        str
+        """
+        self.structure = structure
+        self._reset()
+        self.ordering_context = OrderingComparisonContext(self)
+        text = self.handle_glycan(self.structure)
+        self.lines = []
+        return text
+
+    def dump(self):
+        return self.write(self.structure)
+
+
+_lean_writers = threading.local()
+
+
+def _get_lean_writer():
+    writer = getattr(_lean_writers, "writer", None)
+    if writer is None:
+        writer = _lean_writers.writer = LeanGlycoCTWriter()
+    return writer
+
+
 def dump(structure, buffer=None):
     '''
     Serialize the |Glycan| into :title-reference:`GlycoCT{condensed}`, using
@@ -2484,7 +2838,28 @@ def dumps(structure):
     from glypy import GlycanComposition
     if isinstance(structure, GlycanComposition):
         return GlycanCompositionGlycoCTWriter(structure, None).dump()
-    return GlycoCTWriter(structure, None).dump()
+    return _get_lean_writer().write(structure)
+
+
+def dumps_many(structures):
+    '''
+    Serialize each |Glycan| in `structures` into :title-reference:`GlycoCT{condensed}`,
+    reusing a single writer for all of them.
+
+    Parameters
+    ----------
+    structures: iterable of |Glycan|
+        The structures to serialize
+
+    Returns
+    -------
+    list of str
+    '''
+    from glypy import GlycanComposition
+    writer = LeanGlycoCTWriter()
+    return [GlycanCompositionGlycoCTWriter(structure, None).dump()
+            if isinstance(structure, GlycanComposition) else writer.write(structure)
+            for structure in structures]
 
 
 def _postprocessed_single_monosaccharide(monosaccharide, convert=True):
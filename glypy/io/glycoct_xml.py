@@ -18,6 +18,7 @@ from .format_constants_map import (anomer_map, superclass_map,
                                    link_replacement_composition_map, modification_map)
 from .tree_builder_utils import try_int
 from .file_utils import ParserError
+from .cache import cached_parser
 
 basetype_unpacker = itemgetter("id", "anomer", "superclass", "ringStart", "ringEnd")
 
@@ -208,6 +209,7 @@ def load(stream, structure_class=Glycan, allow_multiple=True):
         return first
 
 
+@cached_parser("glycoct_xml")
 def loads(text, allow_multiple=True):
     """Read all structures from the provided text string.
 
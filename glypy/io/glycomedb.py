@@ -1,9 +1,13 @@
 # pragma: no cover
 import gzip
 import logging
+import multiprocessing
+import threading
 import requests
 from lxml import etree
 
+from collections import OrderedDict
+
 from glypy.utils import StringIO
 from glypy.io import glycoct
 from glypy.algorithms.database import (Taxon, Aglyca, Motif,
@@ -72,9 +76,9 @@ def set_cache(path):
 def add_cache(record):
     if cache is None:
         return
-    for stmt in record.to_sql():
+    for stmt, params in record.to_sql_parameters():
         try:
-            cache.connection.execute(stmt)
+            cache.connection.execute(stmt, params)
         except Exception as e:
             logger.error("An error occurred while adding %r", record, exc_info=e)
 
@@ -355,6 +359,12 @@ def glycan_record_from_xml(xml_tree, id):
     GlycanRecord:
         Constructed record
     '''
+    record = _glycan_record_from_xml(xml_tree, id)
+    add_cache(record)
+    return record
+
+
+def _glycan_record_from_xml(xml_tree, id):
     structure = glycoct.loads(xml_tree.find(xpath).text)
     taxa = [Taxon(t.attrib['ncbi'], t.attrib['name'], make_entries(t)) for t in xml_tree.findall(".//taxon")]
     aglycon = [Aglyca(t.attrib['name'].replace(
@@ -364,9 +374,173 @@ def glycan_record_from_xml(xml_tree, id):
     dbxref.append(DatabaseEntry("GlycomeDB", id))
     record = GlycanRecord(structure, motifs=motifs, dbxref=dbxref, aglycones=aglycon, taxa=taxa, id=id)
     record.id = id
-    add_cache(record)
     return record
 
+
+def _parse_record(item):
+    # Runs in worker processes, so errors are returned as text rather than raised
+    id, content = item
+    try:
+        return id, _glycan_record_from_xml(etree.fromstring(content), id), None
+    except Exception as e:
+        return id, None, "%s: %s" % (type(e).__name__, e)
+
+
+class BulkDownloader(object):
+    '''Download many records from :title-reference:`GlycomeDB` into a :class:`RecordDatabase`.
+
+    Records are fetched over HTTP by a bounded pool of threads, their XML is
+    parsed in a pool of worker processes, and they are written to the database
+    `batch_size` records per transaction. Records already in the database are
+    not fetched again, so an interrupted download can be resumed by running it
+    again with the same identifiers.
+
+    Attributes
+    ----------
+    database: :class:`RecordDatabase`
+        The database to write records to
+    url_template: str
+        The URL to fetch each record from, formatted with its ``id``
+    max_workers: int
+        The number of HTTP requests to run concurrently
+    processes: int
+        The number of worker processes to parse records in. If less than 2,
+        records are parsed in the calling process.
+    batch_size: int
+        The number of records to fetch, parse and write at a time
+    misses: dict
+        Maps the identifier of each record which could not be downloaded or parsed
+        to a description of the error. Stored in the database's metadata under "misses".
+    '''
+
+    def __init__(self, database, url_template=None, max_workers=8, processes=None, batch_size=500,
+                 record_type=GlycanRecord):
+        if not isinstance(database, RecordDatabase):
+            database = RecordDatabase(database, record_type=record_type)
+        if url_template is None:
+            url_template = get_url_template
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        self.database = database
+        self.url_template = url_template
+        self.max_workers = max_workers
+        self.processes = processes
+        self.batch_size = batch_size
+        self._local = threading.local()
+        try:
+            self.misses = dict(database.get_metadata("misses") or {})
+        except (KeyError, TypeError, ValueError):
+            self.misses = {}
+
+    def completed_ids(self):
+        '''The identifiers of all the records already in :attr:`database`
+
+        Returns
+        -------
+        set
+        '''
+        return {row[0] for row in self.database.execute("SELECT glycan_id FROM {table_name};")}
+
+    def _session(self):
+        # requests.Session is not safe to share between threads
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def fetch(self, id):
+        '''Fetch the XML document for `id`
+
+        Returns
+        -------
+        tuple
+            ``(id, content, error)``, where either `content` or `error` is |None|
+        '''
+        try:
+            response = self._session().get(self.url_template.format(id=id))
+            response.raise_for_status()
+            return id, response.content, None
+        except requests.RequestException as e:
+            return id, None, "%s: %s" % (type(e).__name__, e)
+
+    def _write(self, results):
+        records = []
+        for id, record, error in results:
+            if record is None:
+                logger.error("Could not download record %r: %s", id, error)
+                self.misses[id] = error
+            else:
+                self.misses.pop(id, None)
+                records.append(record)
+        with self.database.transaction():
+            self.database.load_data(records, commit=False, set_id=False)
+            self.database.set_metadata("misses", self.misses)
+        return len(records)
+
+    def download(self, ids):
+        '''Download every record in `ids` which is not already in :attr:`database`.
+
+        Parameters
+        ----------
+        ids: iterable of int
+
+        Returns
+        -------
+        int
+            The number of records written
+        '''
+        from concurrent.futures import ThreadPoolExecutor
+
+        completed = self.completed_ids()
+        pending = [id for id in OrderedDict.fromkeys(map(int, ids)) if id not in completed]
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+        pool = None
+        if self.processes > 1 and pending:
+            pool = multiprocessing.Pool(self.processes)
+        written = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as fetcher:
+                # Keep the next batch downloading while the current one is parsed and written
+                futures = [fetcher.submit(self.fetch, id) for id in batches[0]] if batches else []
+                for i in range(len(batches)):
+                    fetched = [future.result() for future in futures]
+                    if i + 1 < len(batches):
+                        futures = [fetcher.submit(self.fetch, id) for id in batches[i + 1]]
+                    results = [item for item in fetched if item[2] is not None]
+                    to_parse = [(id, content) for id, content, error in fetched if error is None]
+                    if pool is not None:
+                        results.extend(pool.map(_parse_record, to_parse))
+                    else:
+                        results.extend(map(_parse_record, to_parse))
+                    written += self._write(results)
+                    logger.info("%d of %d records written", written, len(pending))
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        return written
+
+
+def download_records(ids, db_path, record_type=GlycanRecord, **kwargs):
+    '''Download the records for `ids` into the :class:`RecordDatabase` at `db_path`
+    using a :class:`BulkDownloader`, resuming any earlier download into it.
+
+    Parameters
+    ----------
+    ids: iterable of int
+    db_path: str
+    record_type: type
+    **kwargs:
+        Forwarded to :class:`BulkDownloader`
+
+    Returns
+    -------
+    RecordDatabase
+    '''
+    downloader = BulkDownloader(db_path, record_type=record_type, **kwargs)
+    downloader.download(ids)
+    return downloader.database
+
 if __name__ == "__main__":
     import sys
     download_all_structures(sys.argv[1])
@@ -8,6 +8,9 @@ or using :term:`RDF`-object mapping via :meth:`GlySpaceRDFClient.get` and relate
 
 import logging
 import re
+import sqlite3
+import threading
+import time
 import warnings
 
 from numbers import Number
@@ -21,10 +24,12 @@ except ImportError:
 
 import requests
 with warnings.catch_warnings():
-    from rdflib import ConjunctiveGraph, Namespace, URIRef, Literal, Graph
+    from rdflib import ConjunctiveGraph, Namespace, URIRef, Literal, BNode, Graph
     from rdflib.namespace import split_uri
     from glypy.io import glycoct, iupac, wurcs, _glycordf
 
+from glypy.utils import pickle
+
 # http://glytoucan.org/glyspace/documentation/apidoc.html
 # http://code.glytoucan.org/system/glyspace
 
@@ -156,6 +161,149 @@ class LRUDict(object):  # pragma: no cover
         self.store[key] = value
 
 
+class TripleCache(object):
+    '''A persistent store of the triples fetched for each term, backed by
+    an SQLite database so that it can be shared between sessions.
+
+    Triples are stored per term and role, where the role is the position of the
+    term in the fetched triples: "subject", "predicate" or "object". Entries older
+    than :attr:`ttl` seconds are treated as missing.
+
+    Attributes
+    ----------
+    path: str
+        The path to the SQLite database. Defaults to ":memory:"
+    ttl: float
+        The number of seconds an entry remains valid for. If |None|, entries
+        never expire.
+    '''
+
+    _create_table = '''CREATE TABLE IF NOT EXISTS triple_cache (
+        term TEXT NOT NULL,
+        role TEXT NOT NULL,
+        fetched REAL NOT NULL,
+        triples BLOB NOT NULL,
+        PRIMARY KEY (term, role)
+    );'''
+
+    def __init__(self, path=":memory:", ttl=7 * 24 * 60 * 60):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(self._create_table)
+        self.connection.commit()
+
+    def _oldest_valid(self):
+        if self.ttl is None:
+            return float('-inf')
+        return time.time() - self.ttl
+
+    def _load(self, blob):
+        try:
+            return pickle.loads(bytes(blob))
+        except Exception:
+            # Written by an incompatible version of rdflib, so fetch again
+            return None
+
+    def get(self, term, role="subject"):
+        '''Get the triples stored for `term` in `role`, or |None| if they are missing
+        or have expired.
+
+        Returns
+        -------
+        list or None
+        '''
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT triples FROM triple_cache WHERE term = ? AND role = ? AND fetched >= ?;",
+                (text_type(term), role, self._oldest_valid())).fetchone()
+        if row is None:
+            return None
+        return self._load(row[0])
+
+    def get_many(self, terms, role="subject"):
+        '''Get the triples stored for each of `terms` in `role` which have not expired.
+
+        Returns
+        -------
+        dict
+            Maps each term found to its triples
+        '''
+        terms = list(terms)
+        keys = {text_type(term): term for term in terms}
+        result = {}
+        oldest = self._oldest_valid()
+        # Stay below SQLite's limit on the number of bound parameters
+        for i in range(0, len(terms), 500):
+            chunk = list(map(text_type, terms[i:i + 500]))
+            with self._lock:
+                rows = self.connection.execute(
+                    "SELECT term, triples FROM triple_cache WHERE role = ? AND fetched >= ? AND term IN (%s);" % (
+                        ', '.join('?' * len(chunk))), [role, oldest] + chunk).fetchall()
+            for term, blob in rows:
+                triples = self._load(blob)
+                if triples is not None:
+                    result[keys[term]] = triples
+        return result
+
+    def put(self, term, triples, role="subject"):
+        '''Store `triples` for `term` in `role`, replacing any existing entry
+        '''
+        self.put_many({term: triples}, role)
+
+    def put_many(self, mapping, role="subject"):
+        '''Store the triples for each term in `mapping` in `role` in a single transaction
+        '''
+        now = time.time()
+        rows = [(text_type(term), role, now, sqlite3.Binary(pickle.dumps(list(triples), 2)))
+                for term, triples in mapping.items()]
+        with self._lock:
+            with self.connection:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO triple_cache (term, role, fetched, triples) VALUES (?, ?, ?, ?);", rows)
+
+    def discard(self, term, role="subject"):
+        with self._lock:
+            with self.connection:
+                self.connection.execute(
+                    "DELETE FROM triple_cache WHERE term = ? AND role = ?;", (text_type(term), role))
+
+    def expire(self):
+        '''Delete all entries which are older than :attr:`ttl`
+        '''
+        with self._lock:
+            with self.connection:
+                self.connection.execute("DELETE FROM triple_cache WHERE fetched < ?;", (self._oldest_valid(),))
+
+    def clear(self):
+        with self._lock:
+            with self.connection:
+                self.connection.execute("DELETE FROM triple_cache;")
+
+    def close(self):
+        self.connection.close()
+
+    def __len__(self):
+        with self._lock:
+            return self.connection.execute("SELECT count(*) FROM triple_cache;").fetchone()[0]
+
+    def __repr__(self):
+        return "TripleCache(%r, ttl=%r)" % (self.path, self.ttl)
+
+
+def _term_from_sparql_json(binding):
+    kind = binding['type']
+    if kind == 'uri':
+        return URIRef(binding['value'])
+    elif kind == 'bnode':
+        return BNode(binding['value'])
+    datatype = binding.get('datatype')
+    return Literal(
+        binding['value'], lang=binding.get('xml:lang'),
+        datatype=URIRef(datatype) if datatype else None)
+
+
 class PredicateDescriptor(text_type):
 
     """A specialization of the unicode text type for representing a string which
@@ -545,11 +693,32 @@ class RDFClientBase(ConjunctiveGraph):
             return f
         return wrapper
 
-    def __init__(self, sparql_endpoint, accession_ns, cache_size=100):
+    sparql_endpoint = None
+    triple_cache = None
+    _prefetch_state = threading.local()
+
+    def __init__(self, sparql_endpoint, accession_ns, cache_size=100, triple_cache=None):
         super(RDFClientBase, self).__init__(store="SPARQLStore")
         self.open(sparql_endpoint)
+        self.sparql_endpoint = sparql_endpoint
         self.accession_ns = accession_ns
         self.cache = LRUDict(maxsize=cache_size)
+        self._prefetch_state = threading.local()
+        self.set_triple_cache(triple_cache)
+
+    def set_triple_cache(self, triple_cache):
+        """Store the triples fetched by :meth:`get` and :meth:`get_many` in `triple_cache`,
+        so that they are not requested from the remote data source again until they expire.
+
+        Parameters
+        ----------
+        triple_cache : :class:`TripleCache` or str
+            The cache to use, or the path to an SQLite database to open a :class:`TripleCache`
+            on. If |None|, triples are not cached.
+        """
+        if triple_cache is not None and not isinstance(triple_cache, TripleCache):
+            triple_cache = TripleCache(triple_cache)
+        self.triple_cache = triple_cache
 
     def accession_to_uriref(self, accession):
         """Utility method to translate free strings into full URIs
@@ -603,7 +772,7 @@ class RDFClientBase(ConjunctiveGraph):
             return self.cache[uriref, query_type]
         results = defaultdict(list)
         if query_type == 'auto' or query_type == 'subject':
-            for subject, predicate, obj in set(self.triples((uriref, None, None))):
+            for subject, predicate, obj in self._fetch_triples(uriref, 'subject'):
                 predicate_name = PredicateDescriptor.bind(predicate)
                 self._predicates_seen.add(predicate)
                 if isinstance(obj, Literal):
@@ -625,7 +794,7 @@ class RDFClientBase(ConjunctiveGraph):
             except Exception:
                 predicate_name = None
             if predicate_name is not None:
-                for subject, predicate, obj in set(self.triples((None, uriref, None))):
+                for subject, predicate, obj in self._fetch_triples(uriref, 'predicate'):
                     if isinstance(obj, Literal):
                         obj = obj.toPython()
                     elif isinstance(obj, URIRef):
@@ -641,7 +810,7 @@ class RDFClientBase(ConjunctiveGraph):
                 query_type = 'predicate'
 
         if query_type == 'object':
-            for subject, predicate, obj in set(self.triples((None, None, uriref))):
+            for subject, predicate, obj in self._fetch_triples(uriref, 'object'):
                 predicate_name = PredicateDescriptor.bind(predicate)
                 self._predicates_seen.add(predicate)
                 if isinstance(subject, Literal):
@@ -667,6 +836,113 @@ class RDFClientBase(ConjunctiveGraph):
         self.cache[uriref, query_type] = results
         return results
 
+    _role_patterns = {
+        "subject": lambda term: (term, None, None),
+        "predicate": lambda term: (None, term, None),
+        "object": lambda term: (None, None, term),
+    }
+
+    def _fetch_triples(self, term, role):
+        prefetched = getattr(self._prefetch_state, "triples", None)
+        if prefetched is not None and role == 'subject' and term in prefetched:
+            return prefetched[term]
+        if self.triple_cache is not None:
+            triples = self.triple_cache.get(term, role)
+            if triples is not None:
+                return triples
+        triples = list(set(self.triples(self._role_patterns[role](term))))
+        if self.triple_cache is not None:
+            self.triple_cache.put(term, triples, role)
+        return triples
+
+    _batch_subject_sparql = '''
+    SELECT ?s ?p ?o WHERE {
+        VALUES ?s { %s }
+        ?s ?p ?o .
+    }
+    '''
+
+    def _query_subject_triples(self, subjects):
+        query_string = self._batch_subject_sparql % ' '.join(subject.n3() for subject in subjects)
+        response = requests.post(
+            self.sparql_endpoint, data={"query": query_string},
+            headers={"Accept": "application/sparql-results+json"},
+            verify=ssl_verification)
+        response.raise_for_status()
+        found = {subject: set() for subject in subjects}
+        for binding in response.json()['results']['bindings']:
+            subject = _term_from_sparql_json(binding['s'])
+            found.setdefault(subject, set()).add(
+                (subject, _term_from_sparql_json(binding['p']), _term_from_sparql_json(binding['o'])))
+        return {subject: list(triples) for subject, triples in found.items()}
+
+    def _prefetch_subject_triples(self, subjects, batch_size=100, max_workers=4):
+        subjects = list(OrderedDict.fromkeys(subjects))
+        if self.triple_cache is not None:
+            fetched = self.triple_cache.get_many(subjects, 'subject')
+        else:
+            fetched = {}
+        missing = [subject for subject in subjects if subject not in fetched]
+        batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+        if len(batches) > 1 and max_workers > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+                batch_results = list(executor.map(self._query_subject_triples, batches))
+        else:
+            batch_results = [self._query_subject_triples(batch) for batch in batches]
+        for batch_result in batch_results:
+            if self.triple_cache is not None:
+                self.triple_cache.put_many(batch_result, 'subject')
+            fetched.update(batch_result)
+        return fetched
+
+    def get_many(self, accessions, simplify=True, query_type='auto', batch_size=100, max_workers=4):
+        """Download all related information for each of `accessions` as in :meth:`get`,
+        grouping the requests to the remote data source.
+
+        The triples for the requested subjects are fetched `batch_size` subjects per
+        :term:`SPARQL` query, running up to `max_workers` queries at once. Entities
+        referenced by predicates with registered processors, such as
+        :data:`NSGlycan.has_glycosequence`, are fetched in a second grouped round.
+        Any subjects already in :attr:`triple_cache` are not requested again.
+
+        Parameters
+        ----------
+        accessions: iterable
+            Subjects or database accession numbers, as accepted by :meth:`get`
+        simplify: bool, optional
+            As in :meth:`get`
+        query_type: str, optional
+            As in :meth:`get`. Only "auto" and "subject" queries are grouped.
+        batch_size: int, optional
+            The number of subjects to request in each query
+        max_workers: int, optional
+            The maximum number of queries to run concurrently
+
+        Returns
+        -------
+        list
+            The :class:`ReferenceEntity` for each accession, in the same order
+        """
+        urirefs = [uriref if isinstance(uriref, URIRef) else self.accession_to_uriref(uriref)
+                   for uriref in accessions]
+        if query_type not in ('auto', 'subject'):
+            return [self.get(uriref, simplify=simplify, query_type=query_type) for uriref in urirefs]
+        pending = [uriref for uriref in urirefs if (uriref, query_type) not in self.cache]
+        prefetched = self._prefetch_subject_triples(pending, batch_size, max_workers)
+        # The processors registered for some predicates fetch the objects they are given,
+        # so fetch those objects together as well
+        processed = set(self.predicate_processor_map)
+        referenced = [obj for triples in prefetched.values() for _, predicate, obj in triples
+                      if predicate in processed and isinstance(obj, URIRef)]
+        if referenced:
+            prefetched.update(self._prefetch_subject_triples(referenced, batch_size, max_workers))
+        self._prefetch_state.triples = prefetched
+        try:
+            return [self.get(uriref, simplify=simplify, query_type=query_type) for uriref in urirefs]
+        finally:
+            self._prefetch_state.triples = None
+
 
 class UniprotRDFClient(RDFClientBase):
     predicate_processor_map = ChainFunctionDict()
@@ -867,6 +1143,7 @@ unikarbkb_client = UnicarbKBRDFClient()
 
 
 get = client.get
+get_many = client.get_many
 query = client.query
 structure = client.structure
 from_taxon = client.from_taxon
@@ -15,6 +15,7 @@ from glypy.io.nomenclature import identity
 from glypy.utils import invert_dict
 
 from glypy.io.file_utils import ParserInterface, ParserError
+from glypy.io.cache import cached_parser
 
 
 # A static copy of monosaccharide names to structures for copy-free comparison
@@ -381,8 +382,13 @@ class MonosaccharideSerializer(object):
         Map base type to :class:`~.Monosaccharide`
     substituent_resolver : :class:`SubstituentSerializer`
         Convert substituents to a text list
+    max_cached_residues : :class:`int`
+        The maximum number of distinct residues whose text is remembered by
+        :meth:`__call__` before the cache is cleared
     """
 
+    max_cached_residues = 4096
+
     def __init__(self, monosaccharides=None, substituent_resolver=None, modification_extractor=None):
         if monosaccharides is None:
             monosaccharides = monosaccharide_reference
@@ -393,6 +399,31 @@ class MonosaccharideSerializer(object):
         if modification_extractor is None:
             modification_extractor = ModificationSerializer()
         self.modification_extractor = modification_extractor
+        self._residue_cache = {}
+
+    def residue_signature(self, residue):
+        """Build a hashable key from every trait of `residue` which
+        contributes to its text.
+
+        Parameters
+        ----------
+        residue: :class:`~.Monosaccharide`
+
+        Returns
+        -------
+        :class:`tuple`
+        """
+        return (residue.__class__, residue.anomer, tuple(residue.configuration), tuple(residue.stem),
+                residue.superclass, residue.ring_start, residue.ring_end,
+                tuple(residue.modifications.items()),
+                tuple((position, substituent.name, substituent._derivatize)
+                      for position, substituent in residue.substituents()))
+
+    def clear_cache(self):
+        """Forget the text of all residues encoded so far, such as after changing
+        :data:`substituents_map_to`
+        """
+        self._residue_cache.clear()
 
     def resolve_special_base_type(self, residue):
         if residue.superclass == SuperClass.non:
@@ -458,7 +489,23 @@ class MonosaccharideSerializer(object):
         )
 
     def __call__(self, residue):
-        return self.monosaccharide_to_iupac(residue)
+        """Encode `residue` as in :meth:`monosaccharide_to_iupac`, reusing the text
+        of any residue with the same traits encoded before.
+        """
+        try:
+            key = self.residue_signature(residue)
+        except (AttributeError, TypeError):
+            # Not a monosaccharide, so leave it to :meth:`monosaccharide_to_iupac`
+            return self.monosaccharide_to_iupac(residue)
+        try:
+            return self._residue_cache[key]
+        except KeyError:
+            pass
+        text = self.monosaccharide_to_iupac(residue)
+        if len(self._residue_cache) >= self.max_cached_residues:
+            self._residue_cache.clear()
+        self._residue_cache[key] = text
+        return text
 
 
 class DerivatizationAwareMonosaccharideSerializer(MonosaccharideSerializer):
@@ -684,6 +731,26 @@ def to_iupac(structure, dialect=None):
         return glycan_to_iupac(structure)
 
 
+def to_iupac_many(structures, dialect=None):
+    """Translate each structure in `structures` as in :func:`to_iupac`.
+
+    The text of each distinct residue is computed once and shared by every
+    structure in which it appears, as well as with later calls to :func:`to_iupac`.
+
+    Parameters
+    ----------
+    structures : iterable of |Glycan| or |Monosaccharide|
+        The structures to be translated
+    dialect: :class:`str`
+        One of "extended" or "simple". Defaults to "extended".
+
+    Returns
+    -------
+    :class:`list` of |str|
+    """
+    return [to_iupac(structure, dialect=dialect) for structure in structures]
+
+
 def aminate_substituent(substituent):
     if substituent.name.startswith("n_"):
         # already aminated
@@ -930,12 +997,30 @@ class MonosaccharideDeserializer(object):
     def parse_linkage_structure(self, linkage):
         return self.linkage_parser(linkage)
 
-    def monosaccharide_from_iupac(self, monosaccharide_str, parent=None):
+    def residue_from_iupac(self, monosaccharide_str):
+        """Parse `monosaccharide_str` without connecting it to any other residue.
+
+        The returned values are passed to :meth:`attach_residue` to complete
+        the residue and connect it to its parent.
+
+        Returns
+        -------
+        residue: |Monosaccharide|
+        linkage: :class:`LinkageSpecification`
+        match_dict: :class:`dict`
+            The groups matched by :attr:`pattern`
+        """
         match_dict = self.extract_pattern(monosaccharide_str)
         residue, linkage = self.build_residue(match_dict)
         linkage = self.parse_linkage_structure(linkage)
+        return residue, linkage, match_dict
 
+    def attach_residue(self, residue, parent, linkage, match_dict):
         self.add_monosaccharide_bond(residue, parent, linkage)
+
+    def monosaccharide_from_iupac(self, monosaccharide_str, parent=None):
+        residue, linkage, match_dict = self.residue_from_iupac(monosaccharide_str)
+        self.attach_residue(residue, parent, linkage, match_dict)
         return residue, linkage
 
     def add_monosaccharide_bond(self, residue, parent, linkage):
@@ -1008,19 +1093,13 @@ class DerivatizationAwareMonosaccharideDeserializer(MonosaccharideDeserializer):
         else:
             raise IUPACError("Derivatization Extension Must Start with '^'")
 
-    def monosaccharide_from_iupac(self, monosaccharide_str, parent=None):
-        match_dict = self.extract_pattern(monosaccharide_str)
-        residue, linkage = self.build_residue(match_dict)
-        linkage = self.parse_linkage_structure(linkage)
-
+    def attach_residue(self, residue, parent, linkage, match_dict):
         self.add_monosaccharide_bond(residue, parent, linkage)
 
         deriv = match_dict.get("derivatization", '')
         if deriv is not None and deriv != "":
             self.apply_derivatization(residue, deriv)
 
-        return residue, linkage
-
     def finalize(self, glycan):
         for node in glycan:
             neg_capacity = -node._remaining_capacity()
@@ -1077,6 +1156,11 @@ monosaccharide_from_iupac = MonosaccharideDeserializer()
 
 
 class GlycanDeserializer(object):
+    # Token kinds produced by :meth:`tokenize`
+    RESIDUE = 0
+    BRANCH_START = 1
+    BRANCH_END = 2
+
     def __init__(self, monosaccharide_deserializer=None, set_default_positions=True):
         if monosaccharide_deserializer is None:
             monosaccharide_deserializer = MonosaccharideDeserializer()
@@ -1085,13 +1169,69 @@ class GlycanDeserializer(object):
 
     new_branch_open = re.compile(r"(\]-?)$")
 
+    branch_pattern = re.compile(r"\[|\]-?")
+    # The end of a residue's outgoing linkage, in either the extended
+    # "-(1-4)-" or the simple "(b1-4)" notation
+    linkage_end_pattern = re.compile(r"\([abo?]?[0-9?/]+->?[0-9?/]+\)-?")
+
+    def tokenize(self, text):
+        """Split `text` into a list of ``(kind, start, end)`` tokens in a single pass.
+
+        Each token is either a residue with its outgoing linkage (:attr:`RESIDUE`), or
+        the opening (:attr:`BRANCH_START`) or closing (:attr:`BRANCH_END`) bracket of
+        a branch, spanning ``text[start:end]``.
+
+        Parameters
+        ----------
+        text: :class:`str`
+
+        Returns
+        -------
+        :class:`list`
+        """
+        tokens = []
+        position = 0
+        for match in self.branch_pattern.finditer(text):
+            self._tokenize_residues(text, position, match.start(), tokens)
+            kind = self.BRANCH_START if match.group() == '[' else self.BRANCH_END
+            tokens.append((kind, match.start(), match.end()))
+            position = match.end()
+        self._tokenize_residues(text, position, len(text), tokens)
+        return tokens
+
+    def _tokenize_residues(self, text, start, end, tokens):
+        for match in self.linkage_end_pattern.finditer(text, start, end):
+            tokens.append((self.RESIDUE, start, match.end()))
+            start = match.end()
+        if start < end:
+            tokens.append((self.RESIDUE, start, end))
+
     def add_monosaccharide(self, parent_node, child_node, linkage):
         # parent_node.add_monosaccharide(
         #     child_node, position=parent_position, child_position=child_position)
         self.monosaccharide_deserializer.add_monosaccharide_bond(
             child_node, parent_node, linkage)
 
-    def glycan_from_iupac(self, text, structure_class=Glycan, **kwargs):
+    def residue_from_token(self, token, parent, residue_cache=None):
+        """Parse the residue `token` and connect it to `parent`.
+
+        When `residue_cache` is a :class:`dict`, the parsed residue is stored
+        in it keyed by `token`, and later calls with the same token clone the
+        stored residue instead of parsing it again.
+        """
+        deserializer = self.monosaccharide_deserializer
+        if residue_cache is None:
+            residue, linkage, match_dict = deserializer.residue_from_iupac(token)
+        else:
+            try:
+                prototype, linkage, match_dict = residue_cache[token]
+            except KeyError:
+                prototype, linkage, match_dict = residue_cache[token] = deserializer.residue_from_iupac(token)
+            residue = prototype.clone()
+        deserializer.attach_residue(residue, parent, linkage, match_dict)
+        return residue, linkage
+
+    def glycan_from_iupac(self, text, structure_class=Glycan, residue_cache=None, **kwargs):
         last_outedge = None
         root = None
         last_residue = None
@@ -1100,18 +1240,17 @@ class GlycanDeserializer(object):
         # Remove the base
         text = re.sub(r"\((\d*|\?)->?$", "", text)
 
-        while len(text) > 0:
+        # The tree is built from the reducing end outwards, so the tokens are
+        # consumed from the end of the sequence
+        for kind, start, end in reversed(self.tokenize(text)):
             # If starting a new branch
-            match = self.new_branch_open.search(text)
-            if match is not None:
-                step = match.end(1) - match.start(1)
-                text = text[:-step]
+            if kind == self.BRANCH_END:
                 branch_stack.append((last_residue, root, last_outedge))
                 root = None
                 last_residue = None
                 last_outedge = None
             # If ending a branch
-            elif text[-1] == '[':
+            elif kind == self.BRANCH_START:
                 try:
                     branch_parent, old_root, old_last_outedge = branch_stack.pop()
                     # child_position, parent_position = last_outedge
@@ -1119,22 +1258,23 @@ class GlycanDeserializer(object):
                     root = old_root
                     last_residue = branch_parent
                     last_outedge = old_last_outedge
-                    text = text[:-1]
                 except IndexError:
-                    raise IUPACError("Bad branching at {}".format(len(text)))
+                    raise IUPACError("Bad branching at {}".format(end))
             # Parsing a residue
             else:
-                match = self.monosaccharide_deserializer.has_pattern(text)
-                if match:
-                    next_residue, outedge = self.monosaccharide_deserializer(
-                        text[match.start(): match.end()], last_residue)
+                token = text[start:end]
+                while token:
+                    match = self.monosaccharide_deserializer.has_pattern(token)
+                    if match is None:
+                        raise IUPACError("Could not identify residue '...{}' at {}".format(
+                            text[:start + len(token)][-30:], start + len(token)))
+                    next_residue, outedge = self.residue_from_token(
+                        token[match.start():], last_residue, residue_cache)
                     if root is None:
                         last_outedge = outedge
                         root = next_residue
                     last_residue = next_residue
-                    text = text[:match.start()]
-                else:
-                    raise IUPACError("Could not identify residue '...{}' at {}".format(text[-30:], len(text)))
+                    token = token[:match.start()]
         res = structure_class(root=root)
         self.monosaccharide_deserializer.finalize(res)
         res.reindex()
@@ -1196,6 +1336,7 @@ glycan_from_iupac = GlycanDeserializer()
 glycan_from_iupac_simple = GlycanDeserializer(SimpleMonosaccharideDeserializer())
 
 
+@cached_parser("iupac")
 def from_iupac(text, structure_class=Glycan, resolve_default_positions=True, dialect=None, **kwargs):
     """Parse the given text into an instance of |Glycan|. If there is only a single monosaccharide
     in the output, just the Monosaccharide instance is returned.
@@ -1219,6 +1360,12 @@ def from_iupac(text, structure_class=Glycan, resolve_default_positions=True, dia
     |Glycan| or |Monosaccharide|
         If the resulting structure is just a single monosaccharide, the returned value is a Monosaccharide.
     """
+    return _from_iupac(
+        text, structure_class=structure_class, resolve_default_positions=resolve_default_positions,
+        dialect=dialect, **kwargs)
+
+
+def _from_iupac(text, structure_class=Glycan, resolve_default_positions=True, dialect=None, **kwargs):
     if dialect is None:
         dialect = 'extended'
     if dialect != 'simple':
@@ -1237,6 +1384,38 @@ def from_iupac(text, structure_class=Glycan, resolve_default_positions=True, dia
         return res.root
 
 
+def from_iupac_many(texts, structure_class=Glycan, resolve_default_positions=True, dialect=None, **kwargs):
+    """Parse each sequence in `texts` as in :func:`from_iupac`.
+
+    Each distinct residue is parsed only once for the whole batch and cloned
+    wherever it appears again, so this is much faster than calling :func:`from_iupac`
+    on each sequence when the sequences share residues.
+
+    Parameters
+    ----------
+    texts : iterable of |str|
+        The sequences to parse
+    resolve_default_positions: :class:`bool`
+        Whether to assume default positions for common monosaccharide modifiers
+        that are omitted for brevity, such as the postion of n-acetyl on HexNAc.
+    dialect: :class:`str`
+        One of "extended" or "simple". Defaults to "extended".
+    **kwargs:
+        Forwarded to :func:`glycan_from_iupac`
+
+    Returns
+    -------
+    :class:`list` of |Glycan| or |Monosaccharide|
+    """
+    residue_cache = {}
+    return [
+        _from_iupac(
+            text, structure_class=structure_class, resolve_default_positions=resolve_default_positions,
+            dialect=dialect, residue_cache=residue_cache, **kwargs)
+        for text in texts
+    ]
+
+
 loads = from_iupac
 dumps = to_iupac
 
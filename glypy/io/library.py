@@ -0,0 +1,427 @@
+'''
+An on-disk glycan library format supporting random access through :mod:`mmap`.
+
+A library is a pair of append-only files. The data file stores each structure
+encoded by a :class:`~.StructureCodec` along with its accession and composition
+text. The index file, stored next to it with the suffix ``.idx``, holds one
+fixed-width row per entry giving the entry's location in the data file and its
+monoisotopic mass.
+
+Because the index rows are fixed-width, :class:`GlycanLibrary` can locate any entry
+in constant time, and metadata can be read to filter entries without decoding any
+structures. Entries are only ever appended, and each entry's data is flushed before
+its index row is written, so any number of processes may read a library, even
+while it is being written to by a single :class:`GlycanLibraryWriter`.
+
+.. code-block:: python
+
+    with GlycanLibraryWriter("n-glycans.glib") as writer:
+        for accession, structure in structures:
+            writer.add(structure, accession=accession)
+
+    library = GlycanLibrary("n-glycans.glib")
+    for entry in library.mass_between(1800.0, 1900.0).entries():
+        print(entry.accession, entry.structure)
+
+'''
+import io
+import os
+import mmap
+import struct
+
+try:
+    from collections.abc import Sequence
+except ImportError:
+    from collections import Sequence
+
+from glypy.utils import basestring
+
+from .binary import get_codec
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+
+#: The magic bytes each library index file starts with
+MAGIC = b'GLIX'
+
+#: The current format version. Bump this whenever the layout changes.
+FORMAT_VERSION = 1
+
+#: The suffix appended to a library's data file path to find its index
+INDEX_SUFFIX = '.idx'
+
+_DATA_MAGIC = b'GLIB'
+
+# Each row of the index holds the entry's offset in the data file, the size of its
+# metadata block, the size of its encoded structure, and its mass.
+_index_row = struct.Struct("<QIId")
+_metadata_header = struct.Struct("<II")
+
+
+class LibraryError(ValueError):
+    pass
+
+
+def index_path(path):
+    '''Get the path to the index file of the library stored at `path`
+    '''
+    return path + INDEX_SUFFIX
+
+
+def _index_header(codec):
+    name = codec.name.encode('utf-8')
+    return MAGIC + struct.pack("<BB", FORMAT_VERSION, len(name)) + name
+
+
+def _read_index_header(handle):
+    header = handle[:6]
+    if header[:4] != MAGIC:
+        raise LibraryError("Not a glycan library index")
+    version, name_size = struct.unpack("<BB", header[4:6])
+    if version != FORMAT_VERSION:
+        raise LibraryError("Unsupported library format version %d" % (version,))
+    name = handle[6:6 + name_size]
+    return get_codec(bytes(name).decode('utf-8')), 6 + name_size
+
+
+def _composition_text(structure, composition):
+    if composition is None:
+        from glypy.structure.glycan_composition import GlycanComposition
+        composition = GlycanComposition.from_glycan(structure)
+    if not isinstance(composition, basestring):
+        composition = composition.serialize()
+    return composition
+
+
+class GlycanLibraryWriter(object):
+    '''Append structures to a glycan library.
+
+    Parameters
+    ----------
+    path: :class:`str`
+        The path to the library's data file
+    codec: :class:`str` or :class:`~.StructureCodec`
+        The codec used to encode structures. Ignored when appending to an
+        existing library, which keeps the codec it was created with.
+        Defaults to ``"binary"``.
+    append: :class:`bool`
+        Whether to add to an existing library at `path` instead of replacing it.
+    '''
+
+    def __init__(self, path, codec="binary", append=False):
+        self.path = path
+        if append and os.path.exists(path):
+            with open(index_path(path), 'rb') as handle:
+                self.codec, self._header_size = _read_index_header(handle.read(262))
+            self.data_handle = open(path, 'ab')
+            self.index_handle = open(index_path(path), 'ab')
+            self._count = (os.path.getsize(index_path(path)) - self._header_size) // _index_row.size
+            # Truncate any partially written row left by an interrupted writer
+            self.index_handle.truncate(self._header_size + self._count * _index_row.size)
+        else:
+            self.codec = get_codec(codec)
+            self.data_handle = open(path, 'wb')
+            self.index_handle = open(index_path(path), 'wb')
+            header = _index_header(self.codec)
+            self._header_size = len(header)
+            self.data_handle.write(_DATA_MAGIC)
+            self.index_handle.write(header)
+            self._count = 0
+        self.data_handle.seek(0, io.SEEK_END)
+        self.index_handle.seek(0, io.SEEK_END)
+
+    def add(self, structure, accession=None, composition=None, mass=None):
+        '''Append `structure` to the library.
+
+        Parameters
+        ----------
+        structure: :class:`~.Glycan`
+            The structure to store
+        accession: :class:`str`, optional
+            An identifier for the structure
+        composition: :class:`~.GlycanComposition` or :class:`str`, optional
+            The structure's composition. Computed from `structure` if not given.
+        mass: :class:`float`, optional
+            The structure's mass. Computed from `structure` if not given.
+
+        Returns
+        -------
+        :class:`int`
+            The index of the new entry
+        '''
+        if mass is None:
+            mass = structure.mass()
+        accession = (accession or '').encode('utf-8')
+        composition = _composition_text(structure, composition).encode('utf-8')
+        payload = self.codec.pack(structure)
+        offset = self.data_handle.tell()
+        self.data_handle.write(_metadata_header.pack(len(accession), len(composition)))
+        self.data_handle.write(accession)
+        self.data_handle.write(composition)
+        self.data_handle.write(payload)
+        # The data must reach the file before the index row which makes it visible
+        self.data_handle.flush()
+        metadata_size = _metadata_header.size + len(accession) + len(composition)
+        self.index_handle.write(_index_row.pack(offset, metadata_size, len(payload), mass))
+        self.index_handle.flush()
+        self._count += 1
+        return self._count - 1
+
+    def add_many(self, structures):
+        '''Append each structure in `structures`, which may be |Glycan| objects
+        or ``(accession, structure)`` pairs.
+        '''
+        for item in structures:
+            if isinstance(item, tuple):
+                accession, structure = item
+                self.add(structure, accession=accession)
+            else:
+                self.add(item)
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        self.data_handle.close()
+        self.index_handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class LibraryEntry(object):
+    '''A single entry in a :class:`GlycanLibrary`, whose structure
+    is decoded the first time it is accessed.
+
+    Attributes
+    ----------
+    index: :class:`int`
+        The entry's position in the library
+    mass: :class:`float`
+        The stored mass of the structure
+    accession: :class:`str`
+        The stored accession of the structure, or the empty string
+    composition: :class:`str`
+        The serialized :class:`~.GlycanComposition` of the structure
+    '''
+
+    __slots__ = ('library', 'index', 'mass', 'accession', 'composition', '_structure')
+
+    def __init__(self, library, index, mass, accession, composition):
+        self.library = library
+        self.index = index
+        self.mass = mass
+        self.accession = accession
+        self.composition = composition
+        self._structure = None
+
+    @property
+    def structure(self):
+        if self._structure is None:
+            self._structure = self.library[self.index]
+        return self._structure
+
+    def __repr__(self):
+        return "LibraryEntry(%d, %r, %0.4f, %r)" % (
+            self.index, self.accession, self.mass, self.composition)
+
+
+class GlycanLibraryView(Sequence):
+    '''A lazily decoded subset of the entries of a :class:`GlycanLibrary`
+
+    Attributes
+    ----------
+    library: :class:`GlycanLibrary`
+    indices: :class:`list` or :class:`range`
+        The indices of the selected entries in :attr:`library`
+    '''
+
+    def __init__(self, library, indices):
+        self.library = library
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.__class__(self.library, self.indices[i])
+        return self.library[self.indices[i]]
+
+    def __iter__(self):
+        library = self.library
+        for i in self.indices:
+            yield library[i]
+
+    def entries(self):
+        '''Iterate over the :class:`LibraryEntry` of each selected entry
+        '''
+        for i in self.indices:
+            yield self.library.entry(i)
+
+    def __repr__(self):
+        return "%s(%r, %d entries)" % (self.__class__.__name__, self.library, len(self))
+
+
+class GlycanLibrary(Sequence):
+    '''Read-only random access to a glycan library written by :class:`GlycanLibraryWriter`.
+
+    Indexing by position decodes and returns a single |Glycan|, while slicing and
+    filtering return a :class:`GlycanLibraryView` which decodes structures only as
+    they are accessed. Metadata is read directly from the memory-mapped files.
+
+    Instances can be pickled, re-opening the same files in the receiving process,
+    so a library can be shared by passing it to worker processes.
+
+    Parameters
+    ----------
+    path: :class:`str`
+        The path to the library's data file
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._data = None
+        self._index = None
+        self.open()
+
+    def open(self):
+        '''Map the library's files into memory. Entries appended since the
+        library was last opened become visible.
+        '''
+        self.close()
+        with open(self.path, 'rb') as handle:
+            self._data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(index_path(self.path), 'rb') as handle:
+            self._index = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if self._data[:4] != _DATA_MAGIC:
+                raise LibraryError("Not a glycan library data file")
+            self.codec, self._header_size = _read_index_header(self._index)
+        except Exception:
+            self.close()
+            raise
+        self._count = (len(self._index) - self._header_size) // _index_row.size
+
+    #: Alias of :meth:`open`
+    refresh = open
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __reduce__(self):
+        return self.__class__, (self.path,)
+
+    def __len__(self):
+        return self._count
+
+    def _row(self, i):
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        return _index_row.unpack_from(self._index, self._header_size + i * _index_row.size)
+
+    def get_raw(self, i):
+        '''Get the encoded bytes of the structure at `i` without decoding them
+
+        Returns
+        -------
+        :class:`bytes`
+        '''
+        offset, metadata_size, size, _mass = self._row(i)
+        start = offset + metadata_size
+        return self._data[start:start + size]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return GlycanLibraryView(self, range(*i.indices(self._count)))
+        return self.codec.unpack(self.get_raw(i))
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+    def mass(self, i):
+        return self._row(i)[3]
+
+    def masses(self):
+        '''Get the stored mass of every entry, in order
+
+        Returns
+        -------
+        :class:`list`
+        '''
+        row_size = _index_row.size
+        unpack_from = _index_row.unpack_from
+        index = self._index
+        start = self._header_size
+        return [unpack_from(index, start + i * row_size)[3] for i in range(self._count)]
+
+    def entry(self, i):
+        '''Read the metadata of the entry at `i` without decoding its structure
+
+        Returns
+        -------
+        :class:`LibraryEntry`
+        '''
+        offset, _metadata_size, _size, mass = self._row(i)
+        if i < 0:
+            i += self._count
+        accession_size, composition_size = _metadata_header.unpack_from(self._data, offset)
+        start = offset + _metadata_header.size
+        accession = self._data[start:start + accession_size].decode('utf-8')
+        start += accession_size
+        composition = self._data[start:start + composition_size].decode('utf-8')
+        return LibraryEntry(self, i, mass, accession, composition)
+
+    def entries(self):
+        for i in range(self._count):
+            yield self.entry(i)
+
+    def accession(self, i):
+        return self.entry(i).accession
+
+    def composition(self, i):
+        return self.entry(i).composition
+
+    def mass_between(self, low, high):
+        '''Select the entries whose mass lies within the closed interval
+        [`low`, `high`]
+
+        Returns
+        -------
+        :class:`GlycanLibraryView`
+        '''
+        return GlycanLibraryView(
+            self, [i for i, mass in enumerate(self.masses()) if low <= mass <= high])
+
+    def filter(self, predicate):
+        '''Select the entries whose :class:`LibraryEntry` satisfies `predicate`,
+        without decoding any structures.
+
+        Returns
+        -------
+        :class:`GlycanLibraryView`
+        '''
+        return GlycanLibraryView(self, [entry.index for entry in self.entries() if predicate(entry)])
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self.path)
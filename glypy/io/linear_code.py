@@ -18,6 +18,7 @@ from glypy.structure import constants, named_structures, Monosaccharide, Glycan,
 from glypy.utils import invert_dict
 
 from glypy.io.file_utils import ParserInterface, ParserError
+from glypy.io.cache import cached_parser
 
 Stem = constants.Stem
 Configuration = constants.Configuration
@@ -302,6 +303,7 @@ def monosaccharide_from_linear_code(residue_str, parent=None):
     return base, outedge
 
 
+@cached_parser("linear_code")
 def parse_linear_code(text, structure_class=Glycan):
     '''
     Parse the character string `text`, extracting GlycoMinds Linear Code-format
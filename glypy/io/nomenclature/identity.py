@@ -10,7 +10,7 @@ from ...structure import (
     SuperClass, Configuration)
 from ...algorithms.similarity import (monosaccharide_similarity, has_substituent,
                                       has_modification, has_monosaccharide,
-                                      is_generic_monosaccharide)
+                                      is_generic_monosaccharide, trait_signature_scope)
 from ...composition.composition_transform import strip_derivatization
 from .synonyms import monosaccharides as monosaccharide_synonyms
 
@@ -22,7 +22,7 @@ def has_ambiguity(node):
 
 
 # A static copy of monosaccharide names to structures for copy-free comparison
-monosaccharides = dict(named_structures.monosaccharides)
+monosaccharides = dict(named_structures.monosaccharides.items())
 monosaccharides_ordered = sorted(list(monosaccharides.items()), key=lambda x: has_ambiguity(x[1]))
 
 
@@ -48,6 +48,7 @@ def get_preferred_name(name, selector=min, key=len):
     return preferred_name
 
 
+@trait_signature_scope()
 def is_a(node, target, tolerance=0, include_modifications=True, include_substituents=True, exact=True,
          short_circuit=False, ignore_ring=True, **kwargs):
     '''
@@ -98,6 +99,7 @@ def is_a(node, target, tolerance=0, include_modifications=True, include_substitu
     return threshold
 
 
+@trait_signature_scope()
 def identify(node, blacklist=None, tolerance=0, include_modifications=True, include_substituents=True,
              ignore_ring=True, **kwargs):
     '''
@@ -212,7 +214,7 @@ def residue_list_to_tree(monosaccharides, axes=('anomer', 'superclass', 'stem',
 class MonosaccharideIdentifier(object):
     def __init__(self, reference_index=None, **kwargs):
         if reference_index is None:
-            reference_index = dict(named_structures.monosaccharides)
+            reference_index = dict(named_structures.monosaccharides.items())
         self.reference_index = dict(reference_index)
         self.trait_tree = residue_list_to_tree(set(self.reference_index.values()))
         self.name_map = self._build_name_map()
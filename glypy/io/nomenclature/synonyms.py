@@ -1,6 +1,7 @@
-import pkg_resources
 import json
 
+from glypy.utils import resource_stream
+
 
 def omit_slice(seq, i):
     if i == 0:
@@ -18,7 +19,8 @@ class SynonymIndex(dict):
 class MonosaccharideSynonymIndex(SynonymIndex):
     def __init__(self, stream=None):
         if stream is None:
-            data_buffer = pkg_resources.resource_string(__name__, "data/monosaccharide_synonyms.json")
+            with resource_stream(__name__, "data/monosaccharide_synonyms.json") as stream:
+                data_buffer = stream.read()
             if isinstance(data_buffer, bytes):
                 data_buffer = data_buffer.decode("utf-8")
         super(MonosaccharideSynonymIndex, self).__init__(json.loads(data_buffer))
@@ -2,9 +2,9 @@
 '''
 
 from glypy.io.file_utils import ParserInterface
-from .parser import loads
-from .node_type import NodeTypeSpec
-from .writer import dumps
+from .parser import loads, loads_many, composition_of
+from .node_type import NodeTypeSpec, clear_node_type_caches
+from .writer import dumps, dumps_many
 from .utils import WURCSError
 from .carbon_descriptors import CarbonDescriptors
 
@@ -16,7 +16,8 @@ class WURCSParser(ParserInterface):
 
 
 __all__ = [
-    "WURCSParser", "loads", "dumps",
+    "WURCSParser", "loads", "dumps", "composition_of",
+    "loads_many", "dumps_many", "clear_node_type_caches",
     "NodeTypeSpec", "CarbonDescriptors",
     "WURCSError",
 ]
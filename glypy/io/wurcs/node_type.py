@@ -116,3 +116,94 @@ class NodeTypeSpec(_NodeTypeSpec):
 
     def __hash__(self):
         return hash(self.carbon_descriptor)
+
+
+#: The maximum number of entries held by each of the node type caches
+max_cache_size = 2048
+
+# Maps (residue code, WURCS version) to (NodeTypeSpec, prototype Monosaccharide)
+_code_to_node_type = {}
+
+# Maps a monosaccharide's trait signature to its NodeTypeSpec
+_signature_to_node_type = {}
+
+
+def cache_put(cache, key, value):
+    """Store `value` under `key` in `cache`, first emptying `cache` if it already
+    holds :data:`max_cache_size` entries.
+
+    Parameters
+    ----------
+    cache : dict
+    key : object
+    value : object
+    """
+    if len(cache) >= max_cache_size:
+        cache.clear()
+    cache[key] = value
+
+
+def node_type_from_code(code, version):
+    """Parse a unique residue code into a :class:`NodeTypeSpec` along with a prototype
+    :class:`~.Monosaccharide`, reusing the result of earlier calls with the same code.
+
+    The prototype is shared and must be cloned before use.
+
+    Parameters
+    ----------
+    code: str
+        The residue code, without its surrounding brackets
+    version: float
+        The WURCS version of the text the code came from
+
+    Returns
+    -------
+    :class:`NodeTypeSpec`
+    :class:`~.Monosaccharide`
+    """
+    key = (code, version)
+    try:
+        return _code_to_node_type[key]
+    except KeyError:
+        pass
+    node_type = NodeTypeSpec.parse(code, version)
+    value = (node_type, node_type.to_monosaccharide())
+    cache_put(_code_to_node_type, key, value)
+    return value
+
+
+def _trait_signature(monosaccharide):
+    return (monosaccharide.superclass, tuple(monosaccharide.stem), tuple(monosaccharide.configuration),
+            monosaccharide.anomer, monosaccharide.ring_start, monosaccharide.ring_end,
+            tuple(monosaccharide.modifications.items()),
+            tuple((position, substituent.name) for position, substituent in monosaccharide.substituents()))
+
+
+def node_type_from_monosaccharide(monosaccharide):
+    """Get the :class:`NodeTypeSpec` describing `monosaccharide`, reusing the
+    result for any monosaccharide with the same traits seen before.
+
+    Parameters
+    ----------
+    monosaccharide: :class:`~.Monosaccharide`
+
+    Returns
+    -------
+    :class:`NodeTypeSpec`
+    """
+    key = _trait_signature(monosaccharide)
+    try:
+        return _signature_to_node_type[key]
+    except KeyError:
+        pass
+    node_type = NodeTypeSpec.from_monosaccharide(monosaccharide)
+    cache_put(_signature_to_node_type, key, node_type)
+    return node_type
+
+
+def clear_node_type_caches():
+    """Empty the caches used by :func:`node_type_from_code` and
+    :func:`node_type_from_monosaccharide`
+    """
+    _code_to_node_type.clear()
+    _signature_to_node_type.clear()
@@ -1,4 +1,6 @@
 import re
+from collections import Counter
+
 try:
     from urllib import unquote
 except ImportError:
@@ -7,8 +9,9 @@ except ImportError:
 from glypy.composition import Composition
 from glypy.structure import glycan, link as _link, glycan_composition
 from glypy.io.tree_builder_utils import try_int
+from glypy.io.cache import cached_parser
 
-from .node_type import NodeTypeSpec
+from .node_type import node_type_from_code, cache_put
 from .utils import base52, WURCSFeatureNotSupported
 
 
@@ -21,6 +24,7 @@ class WURCSParser(object):
         self.node_count = None
         self.edge_count = None
         self.node_type_map = {}
+        self._prototypes = {}
         self.node_index_to_node = {}
         self.glyph_to_node_index = {}
         self.has_uncertain_linkages = False
@@ -59,7 +63,7 @@ class WURCSParser(object):
             section = self.line.split("/", 2)[2].split("]/")[0] + ']'
         node_types = [s[:-1] for s in section.split("[")[1:]]
         for i, node_type in enumerate(node_types, 1):
-            self.node_type_map[i] = NodeTypeSpec.parse(node_type, self.version)
+            self.node_type_map[i], self._prototypes[i] = node_type_from_code(node_type, self.version)
         return self.node_type_map
 
     def parse_node_index_to_type_section(self, section=None):
@@ -67,7 +71,7 @@ class WURCSParser(object):
             section = self.extract_sections()[2]
         for i, index in enumerate(map(int, section.split('-'))):
             alpha = base52(i)
-            mono = self.node_type_map[index].to_monosaccharide()
+            mono = self._prototypes[index].clone()
             mono.id = i
             self.node_index_to_node[i] = mono
             self.glyph_to_node_index[alpha] = i
@@ -153,6 +157,7 @@ class WURCSParser(object):
             return self._to_composition()
 
 
+@cached_parser("wurcs")
 def loads(text, structure_class=glycan.Glycan):
     """Parse a WURCS-encoded glycan structure from `text` into a :class:`~.Glycan`
     or :class:`~.GlycanComposition`.
@@ -172,3 +177,79 @@ def loads(text, structure_class=glycan.Glycan):
     parser = WURCSParser(text, structure_class=structure_class)
     structure = parser.parse()
     return structure
+
+
+def loads_many(texts, structure_class=glycan.Glycan):
+    """Parse each WURCS string in `texts`.
+
+    This is equivalent to calling :func:`loads` on each string. Unique residue
+    codes are parsed once and cached between calls, whether or not they are made
+    through this function.
+
+    Parameters
+    ----------
+    texts : iterable of str
+        The WURCS strings to parse
+    structure_class : :class:`type`, optional
+        The class to use to wrap the :class:`~.Monosaccharide` graph (the default is :class:`~.Glycan`)
+
+    Returns
+    -------
+    :class:`list`
+    """
+    return [loads(text, structure_class=structure_class) for text in texts]
+
+
+# Maps (node type text, version) to the MonosaccharideResidue it describes and
+# whether that residue carries a derivatizing group
+_node_type_residue_cache = {}
+
+
+def _residue_from_node_type(node_type, version):
+    key = (node_type, version)
+    try:
+        return _node_type_residue_cache[key]
+    except KeyError:
+        pass
+    from glypy.composition.composition_transform import has_derivatization
+    _spec, monosaccharide = node_type_from_code(node_type, version)
+    value = (glycan_composition.MonosaccharideResidue.from_monosaccharide(monosaccharide),
+             has_derivatization(monosaccharide))
+    cache_put(_node_type_residue_cache, key, value)
+    return value
+
+
+def composition_of(text):
+    """Compute the :class:`~.GlycanComposition` of the WURCS-encoded structure in `text`
+    without building its graph.
+
+    Only the unique residue section and the residue list are read. Each distinct
+    unique residue is converted to a :class:`~.MonosaccharideResidue` once and cached,
+    and the linkage section is ignored.
+
+    The result is the same as ``GlycanComposition.from_glycan(loads(text))`` for
+    structures, or ``loads(text)`` for compositions, so its
+    :meth:`~.GlycanComposition.mass` is that of the structure.
+
+    Parameters
+    ----------
+    text : str
+        The WURCS string to read
+
+    Returns
+    -------
+    :class:`~.GlycanComposition`
+    """
+    parser = WURCSParser(text)
+    _counts, node_type_section, node_index_to_type_section, _links = parser.extract_sections()
+    node_types = [s[:-1] for s in node_type_section.split("[")[1:]]
+    node_indices = [int(i) for i in node_index_to_type_section.split('-')]
+    composition = glycan_composition.GlycanComposition()
+    for index, count in Counter(node_indices).items():
+        residue, _derivatization = _residue_from_node_type(node_types[index - 1], parser.version)
+        composition[residue] += count
+    root_derivatization = _residue_from_node_type(node_types[node_indices[0] - 1], parser.version)[1]
+    if root_derivatization:
+        composition._composition_offset += (
+            root_derivatization.total_composition() - root_derivatization.attachment_composition_loss()) * 2
+    return composition
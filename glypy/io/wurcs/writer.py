@@ -4,7 +4,7 @@ from glypy.structure import Glycan, Monosaccharide
 from glypy.structure.glycan_composition import GlycanComposition
 from glypy.utils import tree
 
-from .node_type import NodeTypeSpec
+from .node_type import node_type_from_monosaccharide
 from .utils import base52
 
 
@@ -33,7 +33,7 @@ class WURCSWriter(object):
         index_to_glyph = dict()
         id_to_index = dict()
         for i, node in enumerate(self._iter_monosaccharides(), 1):
-            node_type = NodeTypeSpec.from_monosaccharide(node)
+            node_type = node_type_from_monosaccharide(node)
             index_to_glyph[i] = base52(i - 1)
             id_to_index[node.id] = i
             node_index_to_node_type[i] = node_type
@@ -131,12 +131,31 @@ def dumps(glycan):
             glycan = tree(glycan)
         except TypeError:
             if isinstance(glycan, Monosaccharide):
-                nts = NodeTypeSpec.from_monosaccharide(glycan)
+                nts = node_type_from_monosaccharide(glycan)
                 return nts.to_res()
             else:
                 raise
     return WURCSWriter(glycan).write()
 
 
+def dumps_many(glycans):
+    """Encode each saccharide object in `glycans` as a WURCS 2.0 string.
+
+    This is equivalent to calling :func:`dumps` on each structure. Residues with the
+    same traits are described once and cached between calls, whether or not they
+    are made through this function.
+
+    Parameters
+    ----------
+    glycans : iterable
+        The structures to encode
+
+    Returns
+    -------
+    :class:`list` of :class:`str`
+    """
+    return [dumps(glycan) for glycan in glycans]
+
+
 Glycan.register_serializer('wurcs', dumps)
 Monosaccharide.register_serializer('wurcs', dumps)
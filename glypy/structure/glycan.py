@@ -1556,6 +1556,16 @@ class Glycan(SaccharideCollection):
                 yield subtree
 
 
+def _glycoct_serializer(structure):
+    # The GlycoCT writer is only imported the first time a structure is written, and
+    # registers itself in place of this function when it is
+    from glypy.io import glycoct
+    return glycoct.dumps(structure)
+
+
+Glycan.register_serializer("glycoct", _glycoct_serializer)
+
+
 class NamedGlycan(Glycan):
     def __init__(self, name=None, *args, **kwargs):
         self.name = name
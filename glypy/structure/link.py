@@ -14,6 +14,11 @@ from .constants import UnknownPosition, LinkageType
 default_parent_loss = Composition({"O": 1, "H": 1})
 default_child_loss = Composition(H=1)
 
+# Reference losses compared against by Link._glycoct_sigils. These are never
+# attached to a link, so they cannot be mutated through one.
+_water_loss = Composition({"O": 1, "H": 1})
+_hydrogen_loss = Composition(H=1)
+
 
 linkage_configuration = make_struct("linkage_configuration", ("parent", "child", "parent_position", "child_position"))
 
@@ -444,7 +449,7 @@ class Link(object):
         '''
         parent_loss_str = 'x'
         child_loss_str = 'x'
-        water = Composition({"O": 1, "H": 1})
+        water = _water_loss
 
         if self.child_loss == water:
             child_loss_str = "d"
@@ -453,8 +458,7 @@ class Link(object):
             child_loss_str = 'o'
             parent_loss_str = 'd'
 
-        if self.child_loss == Composition(
-                H=1) and (self.child.node_type is SubstituentBase.node_type):
+        if self.child_loss == _hydrogen_loss and (self.child.node_type is SubstituentBase.node_type):
             child_loss_str = "n"
             if self.parent_loss == water:
                 parent_loss_str = "d"
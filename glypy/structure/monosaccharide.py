@@ -1485,6 +1485,16 @@ class Monosaccharide(SaccharideBase):
         return False
 
 
+def _glycoct_serializer(monosaccharide):
+    # The GlycoCT writer is only imported the first time a residue is written, and
+    # registers itself in place of this function when it is
+    from glypy.io import glycoct
+    return glycoct._postprocessed_single_monosaccharide(monosaccharide)
+
+
+Monosaccharide.register_serializer("glycoct", _glycoct_serializer)
+
+
 class ReducedEnd(object):
     """Represents the composition shift and conformation change created
     by reducing a |Monosaccharide|.
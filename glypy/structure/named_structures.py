@@ -1,27 +1,415 @@
-import pkg_resources
-import hjson
+import os
 import re
+import mmap
+import struct
+import hashlib
+import warnings
 
-from glypy.utils import StringIO, identity, uid
-from glypy.utils.lazy import ProxyObject
-from glypy.io import glycoct
+from glypy.utils import StringIO, identity, uid, pickle, resource_stream
+from glypy.utils.lazy import ProxyObject, CopyOnWriteProxy
 from glypy.structure.glycan import NamedGlycan
+from glypy.version import version
+
+
+#: The directory that precompiled indices are read from and written to
+cache_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+#: Incremented whenever the layout of the precompiled indices changes
+cache_format_version = 1
+
+
+def _source_stamp(source):
+    with resource_stream(__name__, "data/" + source) as stream:
+        digest = hashlib.sha1(stream.read()).hexdigest()
+    return (cache_format_version, version, source, digest)
+
+
+def precompiled_path(name):
+    """The path to the precompiled index `name`"""
+    return os.path.join(cache_directory, name + ".pkl")
+
+
+def load_precompiled(name, source):
+    """Read the entries of the precompiled index `name`.
+
+    Each precompiled index begins with a stamp recording the glypy version and
+    a digest of the data file it was built from, `source`. If the stamp does not
+    match the installed version and data file, the index is stale and ignored.
+
+    Parameters
+    ----------
+    name : str
+        The name of the index
+    source : str
+        The name of the data file the index is built from
+
+    Returns
+    -------
+    dict or None
+        The entries of the index, or :const:`None` if it is missing or stale
+    """
+    try:
+        with open(precompiled_path(name), 'rb') as handle:
+            if pickle.load(handle) != _source_stamp(source):
+                return None
+            return pickle.load(handle)
+    except Exception:
+        # A missing, truncated or incompatible file is rebuilt from source
+        return None
+
+
+def save_precompiled(name, source, entries):
+    """Write `entries` to the precompiled index `name`, stamped for `source`.
+
+    The index is written to a temporary file which is then moved into place, so
+    concurrent readers never see a partial file. If :data:`cache_directory` is
+    not writable, nothing is written.
+
+    Parameters
+    ----------
+    name : str
+        The name of the index
+    source : str
+        The name of the data file the index is built from
+    entries : dict
+        The entries of the index
+
+    Returns
+    -------
+    bool
+        Whether the index was written
+    """
+    path = precompiled_path(name)
+    temp_path = "%s.%d.tmp" % (path, os.getpid())
+    try:
+        with open(temp_path, 'wb') as handle:
+            pickle.dump(_source_stamp(source), handle, 2)
+            pickle.dump(entries, handle, 2)
+        if os.name == 'nt' and os.path.exists(path):  # pragma: no cover
+            os.remove(path)
+        os.rename(temp_path, path)
+    except (IOError, OSError):
+        try:
+            os.remove(temp_path)
+        except (IOError, OSError):
+            pass
+        return False
+    return True
+
+
+#: The environment variable naming the snapshot that processes attach to on import
+snapshot_environ_key = "GLYPY_NAMED_STRUCTURE_SNAPSHOT"
+
+
+class SharedSnapshot(object):
+    """A read-only, memory-mapped snapshot of the named structure indices.
+
+    The snapshot is a single file holding every entry of :data:`monosaccharides`,
+    :data:`monosaccharide_residues`, :data:`glycans` and :data:`motifs` in the
+    compact encoding of :mod:`glypy.io.binary`, behind a table of their offsets.
+    The file is mapped rather than read, so every process using the same snapshot
+    shares one copy of it through the operating system's page cache, and each
+    entry is only decoded the first time a process asks for it. Importing
+    :mod:`glypy` reads every monosaccharide, so those are always decoded.
+
+    Worker processes attach to a snapshot with :func:`attach_snapshot`. Forked
+    children inherit the attachment, and spawned children started afterwards
+    attach when they import :mod:`glypy`.
+
+    Attributes
+    ----------
+    path : str
+        The path to the snapshot file
+    directory : dict
+        Maps each index name to a mapping from entry name to its offset, length
+        and any extra attributes to set on it
+    """
+    magic = b"GLYPYSNP"
+
+    #: Incremented whenever the layout of the snapshot changes
+    format_version = 1
+
+    _header_size = struct.Struct("<Q")
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self._decoded = {}
+        with open(self.path, 'rb') as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        offset = len(self.magic) + self._header_size.size
+        if self._map[:len(self.magic)] != self.magic:
+            self.close()
+            raise ValueError("%r is not a named structure snapshot" % (path, ))
+        header_size, = self._header_size.unpack(self._map[len(self.magic):offset])
+        stamp, self.directory = pickle.loads(self._map[offset:offset + header_size])
+        if stamp != self._stamp():
+            self.close()
+            raise ValueError("%r was written by a different version of glypy" % (path, ))
+        self._data_offset = offset + header_size
+
+    @classmethod
+    def _stamp(cls):
+        from glypy.io import binary
+        return (cls.format_version, version, binary.FORMAT_VERSION)
+
+    @classmethod
+    def write(cls, path):
+        """Write a snapshot of the named structure indices of this process to `path`.
+
+        Parameters
+        ----------
+        path : str
+            The path to write the snapshot to
+
+        Returns
+        -------
+        :class:`SharedSnapshot`
+            The written snapshot, opened for reading
+        """
+        from glypy.io import binary
+        from glypy.structure.glycan import Glycan
+
+        blocks = []
+        offset = [0]
+
+        def add(structure):
+            block = binary.encode(structure)
+            blocks.append(block)
+            offset[0] += len(block)
+            return (offset[0] - len(block), len(block))
+
+        directory = {}
+        entries = directory[MonosaccharideIndex.index_name] = {}
+        # dict.items does not copy the stored structures like indexing does
+        for name, root in monosaccharides.items():
+            entries[name] = add(Glycan(root, index_method=None)) + (None, )
+        # Residues are derived from the monosaccharide with the same name
+        directory[MonosaccharideResidueIndex.index_name] = dict(entries)
+        entries = directory[GlycanIndex.index_name] = {}
+        for name, structure in glycans.items():
+            entries[name] = add(structure) + (None, )
+        entries = directory[MotifIndex.index_name] = {}
+        for name, motif in motifs.items():
+            entries[name] = add(motif) + ({
+                "motif_name": motif.motif_name,
+                "motif_class": motif.motif_class,
+                "motif_category": motif.motif_category,
+                "is_core_motif": motif.is_core_motif,
+            }, )
+        header = pickle.dumps((cls._stamp(), directory), 2)
+        temp_path = "%s.%d.tmp" % (path, os.getpid())
+        with open(temp_path, 'wb') as handle:
+            handle.write(cls.magic)
+            handle.write(cls._header_size.pack(len(header)))
+            handle.write(header)
+            for block in blocks:
+                handle.write(block)
+        if os.name == 'nt' and os.path.exists(path):  # pragma: no cover
+            os.remove(path)
+        os.rename(temp_path, path)
+        return cls(path)
+
+    def keys(self, index_name):
+        """The names of the entries of the index `index_name`"""
+        return list(self.directory[index_name])
+
+    def get(self, index_name, name):
+        """Decode the entry `name` of the index `index_name`.
+
+        The decoded structure is kept and returned again by later calls, so it
+        must not be modified.
+
+        Parameters
+        ----------
+        index_name : str
+            The name of the index, like ``"monosaccharides"``
+        name : str
+            The name of the entry
+
+        Returns
+        -------
+        :class:`~.Monosaccharide`, :class:`~.MonosaccharideResidue` or :class:`~.Glycan`
+        """
+        key = (index_name, name)
+        try:
+            return self._decoded[key]
+        except KeyError:
+            pass
+        from glypy.io import binary
+        start, length, attributes = self.directory[index_name][name]
+        start += self._data_offset
+        structure = binary.decode(self._map[start:start + length])
+        if index_name == MonosaccharideIndex.index_name:
+            structure = structure.root
+        elif index_name == MonosaccharideResidueIndex.index_name:
+            from glypy.structure.glycan_composition import MonosaccharideResidue
+            structure = MonosaccharideResidue.from_monosaccharide(structure.root)
+        elif index_name == MotifIndex.index_name:
+            structure = NamedGlycan(name=name, root=structure.root, index_method=None)
+        if attributes:
+            for attribute, value in attributes.items():
+                setattr(structure, attribute, value)
+        self._decoded[key] = structure
+        return structure
+
+    def load(self, index_name):
+        """Decode every entry of the index `index_name`
+
+        Returns
+        -------
+        dict
+        """
+        return {name: self.get(index_name, name) for name in self.directory[index_name]}
+
+    def close(self):
+        self._map.close()
+
+    def __reduce__(self):
+        return self.__class__, (self.path, )
+
+    def __repr__(self):
+        return "{self.__class__.__name__}({self.path!r})".format(self=self)
+
+
+def _snapshot_from_environ():
+    path = os.environ.get(snapshot_environ_key)
+    if not path:
+        return None
+    try:
+        return SharedSnapshot(path)
+    except (IOError, OSError, ValueError) as err:
+        warnings.warn("Could not attach to the named structure snapshot %r: %s" % (path, err))
+        return None
+
+
+def _root(structure):
+    return structure.root
+
+
+def _clone_with_uid(structure):
+    clone = structure.clone()
+    clone.id = uid()
+    return clone
+
+
+_monosaccharide_mutators = (
+    "add_modification", "drop_modification", "add_substituent", "drop_substituent",
+    "add_monosaccharide", "drop_monosaccharide")
+
+_glycan_mutators = (
+    "reindex", "deindex", "reroot", "canonicalize", "set_reducing_end", "label_branches")
 
 
 class StructureIndex(dict):
+    #: The name this index is stored under in precompiled files and snapshots
+    index_name = None
+
+    #: The methods of the stored structures which modify them
+    _mutators = ()
+
+    #: The :class:`SharedSnapshot` entries are decoded from, if any
+    _snapshot = None
+
+    #: The keys whose entries have not been decoded from :attr:`_snapshot` yet
+    _pending = frozenset()
+
     def __init__(self, stream, key_transform=identity, value_transform=identity):
+        import hjson
+        from glypy.io import glycoct
         self.update(hjson.load(stream))
         for k, v in self.items():
             self[key_transform(k)] = value_transform(glycoct.loads(v))
         self.key_transform = key_transform
 
+    def _load_precompiled(self, name, source):
+        entries = load_precompiled(name, source)
+        if entries is None:
+            return False
+        self.update(entries)
+        return True
+
+    def _save_precompiled(self, name, source):
+        return save_precompiled(name, source, {k: dict.__getitem__(self, k) for k in self})
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Build the index from the entries stored in a :class:`SharedSnapshot`.
+
+        Only the names of the entries are read here. Each entry is decoded the first
+        time it is looked up, and all of them are decoded when the values are iterated over.
+
+        Parameters
+        ----------
+        snapshot : :class:`SharedSnapshot`
+            The snapshot to read
+
+        Returns
+        -------
+        :class:`StructureIndex`
+        """
+        inst = cls.__new__(cls)
+        keys = snapshot.keys(cls.index_name)
+        dict.update(inst, dict.fromkeys(keys))
+        inst._snapshot = snapshot
+        inst._pending = set(keys)
+        inst.key_transform = identity
+        return inst
+
+    def _stored(self, key):
+        # The stored structure for `key`, decoding it from the snapshot if needed
+        if key in self._pending:
+            dict.__setitem__(self, key, self._snapshot.get(self.index_name, key))
+            self._pending.discard(key)
+        return dict.__getitem__(self, key)
+
+    def _decode_pending(self):
+        for key in list(self._pending):
+            self._stored(key)
+
+    def __setitem__(self, key, value):
+        if key in self._pending:
+            self._pending.discard(key)
+        dict.__setitem__(self, key, value)
+
+    def get(self, key, default=None):
+        if key in self:
+            return self._stored(key)
+        return default
+
+    def values(self):
+        self._decode_pending()
+        return dict.values(self)
+
+    def items(self):
+        self._decode_pending()
+        return dict.items(self)
+
     def __getitem__(self, key):
-        x = dict.__getitem__(self, key)
+        x = self._stored(key)
         # ret = deepcopy(x)
         ret = x.clone()
         ret.id = uid()
         return ret
 
+    def view(self, key):
+        """Get a copy-on-write view of the structure stored under `key`.
+
+        Indexing the collection copies the stored structure and gives it a new
+        :attr:`id` every time. The view instead reads the stored structure directly,
+        and only copies it when an attribute is assigned or a method which modifies
+        it is called. Use it where the structure is only read or compared against.
+
+        Parameters
+        ----------
+        key : str
+            The name of the structure
+
+        Returns
+        -------
+        :class:`~.CopyOnWriteProxy`
+        """
+        return CopyOnWriteProxy(self._stored(key), _clone_with_uid, self._mutators)
+
     def __getattr__(self, name):
         try:
             res = object.__getattr__(self, name)
@@ -45,17 +433,31 @@ class StructureIndex(dict):
 
 
 class MonosaccharideIndex(StructureIndex):
-    def __init__(self, stream=None, key_transform=identity, value_transform=lambda x: x.root):
+    index_name = "monosaccharides"
+    _mutators = _monosaccharide_mutators
+
+    def __init__(self, stream=None, key_transform=identity, value_transform=_root):
+        precompiled = stream is None and key_transform is identity and value_transform is _root
+        if precompiled and self._load_precompiled(self.index_name, "monosaccharides.hjson"):
+            self.key_transform = key_transform
+            return
         if stream is None:
-            stream = pkg_resources.resource_stream(__name__, "data/monosaccharides.hjson")
+            stream = resource_stream(__name__, "data/monosaccharides.hjson")
         with stream:
             super(MonosaccharideIndex, self).__init__(stream, key_transform, value_transform)
 
 
-monosaccharides = (MonosaccharideIndex)()
+_snapshot = _snapshot_from_environ()
+
+if _snapshot is not None:
+    monosaccharides = MonosaccharideIndex.from_snapshot(_snapshot)
+else:
+    monosaccharides = (MonosaccharideIndex)()
 
 
 class MonosaccharideResidueIndex(MonosaccharideIndex):
+    index_name = "monosaccharide_residues"
+
     def __init__(self, stream=None, **kwargs):
         from glypy.structure.glycan_composition import MonosaccharideResidue
 
@@ -64,48 +466,79 @@ class MonosaccharideResidueIndex(MonosaccharideIndex):
         def value_transform(x):
             return MonosaccharideResidue.from_monosaccharide(x.root)
 
+        precompiled = stream is None
+        if precompiled and self._load_precompiled(self.index_name, "monosaccharides.hjson"):
+            self.key_transform = key_transform
+            return
         if stream is None:
-            stream = pkg_resources.resource_stream(__name__, "data/monosaccharides.hjson")
-        super(MonosaccharideIndex, self).__init__(stream, key_transform, value_transform)
+            stream = resource_stream(__name__, "data/monosaccharides.hjson")
+        with stream:
+            super(MonosaccharideIndex, self).__init__(stream, key_transform, value_transform)
 
 
 monosaccharide_residues = ProxyObject(MonosaccharideResidueIndex)
 
 
 class GlycanIndex(StructureIndex):
+    index_name = "glycans"
+    _mutators = _glycan_mutators
+
     def __init__(self, stream=None, key_transform=identity, value_transform=identity):
+        precompiled = stream is None and key_transform is identity and value_transform is identity
+        if precompiled and self._load_precompiled(self.index_name, "glycans.hjson"):
+            self.key_transform = key_transform
+            return
         if stream is None:
-            stream = pkg_resources.resource_stream(__name__, "data/glycans.hjson")
-        super(GlycanIndex, self).__init__(stream, key_transform, value_transform)
+            stream = resource_stream(__name__, "data/glycans.hjson")
+        with stream:
+            super(GlycanIndex, self).__init__(stream, key_transform, value_transform)
 
 
 glycans = ProxyObject(GlycanIndex)
 
 
 class MotifIndex(StructureIndex):
+    index_name = "motifs"
+    _mutators = _glycan_mutators
+
     def __init__(self, stream=None, key_transform=identity, value_transform=identity):
+        precompiled = stream is None
+        if not (precompiled and self._load_precompiled(self.index_name, "motifs.hjson")):
+            self._load_motifs(stream)
+        self._index_motifs()
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        inst = super(MotifIndex, cls).from_snapshot(snapshot)
+        # The motif attributes are stored beside the entries, so nothing is decoded
+        attributes = [entry[2] for entry in snapshot.directory[cls.index_name].values()]
+        inst._category_map = {}
+        inst._class_map = {}
+        inst.motif_classes = {entry["motif_class"] for entry in attributes}
+        inst.motif_categories = {entry["motif_category"] for entry in attributes}
+        return inst
+
+    def _index_motifs(self):
+        self._category_map = {}
+        self._class_map = {}
+        self.motif_classes = {v.motif_class for v in self.values()}
+        self.motif_categories = {v.motif_category for v in self.values()}
+
+    def _load_motifs(self, stream=None):
+        import hjson
+        from glypy.io import glycoct
         if stream is None:
-            stream = pkg_resources.resource_stream(__name__, "data/motifs.hjson")
+            stream = resource_stream(__name__, "data/motifs.hjson")
         with stream:
             data = hjson.load(stream)
-        motif_classes = set()
-        motif_categories = set()
         for motif in data:
             name = motif['name']
-            motif_class = motif['class']
-            motif_category = motif['category']
             motif_structure = NamedGlycan(name=name, root=glycoct.loads(motif['glycoct']).root, index_method=None)
             motif_structure.motif_name = name
-            motif_structure.motif_class = motif_class
-            motif_structure.motif_category = motif_category
+            motif_structure.motif_class = motif['class']
+            motif_structure.motif_category = motif['category']
             motif_structure.is_core_motif = motif["core_motif"]
             self[name] = motif_structure
-            motif_classes.add(motif_class)
-            motif_categories.add(motif_category)
-        self._category_map = {}
-        self._class_map = {}
-        self.motif_classes = motif_classes
-        self.motif_categories = motif_categories
 
     def motif_category(self, name):
         if name in self._category_map:
@@ -132,3 +565,83 @@ class MotifIndex(StructureIndex):
 
 
 motifs = ProxyObject(MotifIndex)
+
+
+_lazy_indices = (
+    (monosaccharide_residues, MonosaccharideResidueIndex),
+    (glycans, GlycanIndex),
+    (motifs, MotifIndex),
+)
+
+
+def _use_snapshot(snapshot):
+    global _snapshot
+    _snapshot = snapshot
+    for proxy, index_type in _lazy_indices:
+        if proxy._source is None:
+            proxy._initializer = index_type if snapshot is None else (
+                lambda index_type=index_type: index_type.from_snapshot(snapshot))
+
+
+if _snapshot is not None:
+    _use_snapshot(_snapshot)
+
+
+def attach_snapshot(path):
+    """Load the named structure indices of this process from the :class:`SharedSnapshot`
+    at `path`, and make processes started from it afterwards do the same.
+
+    Indices which have already been loaded are kept. This can be passed as the
+    ``initializer`` of a :class:`multiprocessing.Pool` with ``initargs=(path,)``.
+
+    Parameters
+    ----------
+    path : str
+        The path to a snapshot written by :meth:`SharedSnapshot.write`
+
+    Returns
+    -------
+    :class:`SharedSnapshot`
+    """
+    snapshot = SharedSnapshot(path)
+    os.environ[snapshot_environ_key] = snapshot.path
+    _use_snapshot(snapshot)
+    return snapshot
+
+
+def detach_snapshot():
+    """Stop loading the named structure indices from a :class:`SharedSnapshot`, in this
+    process and processes started from it afterwards.
+    """
+    os.environ.pop(snapshot_environ_key, None)
+    _use_snapshot(None)
+
+
+def build_precompiled():
+    """Build the precompiled copy of each named structure index from its data file.
+
+    This is run when the package is built so that importing :mod:`glypy` does not
+    need to parse the data files. Precompiled indices are never written at any other
+    time, so without them each index is parsed from its data file when it is loaded.
+
+    Returns
+    -------
+    list of str
+        The paths of the indices that were written
+    """
+    written = []
+    for index_type, source in ((MonosaccharideIndex, "monosaccharides.hjson"),
+                               (MonosaccharideResidueIndex, "monosaccharides.hjson"),
+                               (GlycanIndex, "glycans.hjson"),
+                               (MotifIndex, "motifs.hjson")):
+        path = precompiled_path(index_type.index_name)
+        if os.path.exists(path):
+            os.remove(path)
+        if index_type()._save_precompiled(index_type.index_name, source):
+            written.append(path)
+    return written
+
+
+if __name__ == '__main__':  # pragma: no cover
+    for path in build_precompiled():
+        print(path)
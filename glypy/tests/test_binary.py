@@ -0,0 +1,87 @@
+import pickle
+import unittest
+
+import glypy
+from glypy.io import binary, glycoct
+from glypy.algorithms import DistinctGlycanSet
+from glypy.algorithms.database import GlycanRecord
+from glypy.tests.common import load, structures
+
+
+class BinaryCodecTests(unittest.TestCase):
+
+    def test_round_trip(self):
+        for name in structures:
+            structure = load(name)
+            for canonical in (False, True):
+                decoded = binary.loads(binary.dumps(structure, canonical=canonical))
+                self.assertEqual(glycoct.dumps(decoded), glycoct.dumps(structure))
+                self.assertAlmostEqual(decoded.mass(), structure.mass())
+            self.assertEqual(binary.loads(binary.dumps(structure)), structure)
+
+    def test_decoded_compositions_are_independent(self):
+        data = binary.dumps(load("broad_n_glycan"))
+        first = binary.loads(data)
+        links = first.link_index
+        self.assertIsNot(links[0].parent_loss, links[1].parent_loss)
+        expected = links[1].parent_loss.clone()
+        links[0].parent_loss["H"] += 1
+        self.assertEqual(links[1].parent_loss, expected)
+        self.assertEqual(binary.loads(data).link_index[0].parent_loss, expected)
+
+    def test_named_structures(self):
+        for name in glypy.motifs.keys():
+            structure = glypy.motifs[name]
+            self.assertEqual(binary.loads(binary.dumps(structure)), structure)
+
+    def test_canonical_encoding(self):
+        structure = load("broad_n_glycan")
+        reparsed = glycoct.loads(glycoct.dumps(structure))
+        self.assertEqual(
+            binary.dumps(structure, canonical=True),
+            binary.dumps(reparsed, canonical=True))
+
+    def test_header(self):
+        data = binary.dumps(load("common_glycan"))
+        self.assertTrue(binary.detect_binary(data))
+        self.assertFalse(binary.detect_binary(glycoct.dumps(load("common_glycan"))))
+        self.assertRaises(binary.BinaryCodecError, binary.loads, b"XX" + data[2:])
+        self.assertRaises(binary.BinaryCodecError, binary.loads, data[:2] + b'\xff' + data[3:])
+        self.assertRaises(binary.BinaryCodecError, binary.loads, data[:len(data) // 2])
+        for truncated in (b"", data[:1], data[:2]):
+            self.assertRaises(binary.BinaryCodecError, binary.loads, truncated)
+
+    def test_codec_registry(self):
+        self.assertIs(binary.get_codec(None), binary.glycoct_codec)
+        self.assertIs(binary.get_codec("binary"), binary.binary_codec)
+        self.assertIs(pickle.loads(pickle.dumps(binary.binary_codec)), binary.binary_codec)
+        self.assertRaises(KeyError, binary.get_codec, "not-a-codec")
+
+
+class CodecSelectionTests(unittest.TestCase):
+
+    def test_distinct_glycan_set(self):
+        glycans = [load("common_glycan"), load("branchy_glycan"), load("broad_n_glycan")]
+        text_set = DistinctGlycanSet(glycans)
+        binary_set = DistinctGlycanSet(glycans + [glycoct.loads(glycoct.dumps(glycans[0]))], codec="binary")
+        self.assertEqual(len(binary_set), 3)
+        self.assertIn(glycans[1], binary_set)
+        self.assertEqual(
+            sorted(map(glycoct.dumps, binary_set)),
+            sorted(map(glycoct.dumps, text_set)))
+        self.assertEqual(len(binary_set - text_set), 0)
+        self.assertEqual(sum(map(len, binary_set.partition(2))), 3)
+        self.assertIs(binary_set.partition(2)[0].codec, binary.binary_codec)
+        restored = pickle.loads(pickle.dumps(binary_set))
+        self.assertEqual(restored.raw_data_buffer, binary_set.raw_data_buffer)
+
+    def test_record_pickling(self):
+        record = GlycanRecord(load("broad_n_glycan"))
+        record.structure_codec = "binary"
+        restored = pickle.loads(pickle.dumps(record))
+        self.assertEqual(restored.structure, record.structure)
+        self.assertEqual(restored.structure_codec, "binary")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,11 @@
+import os
+import shutil
+import sqlite3
+import tempfile
 import unittest
+import glypy
 from glypy.composition import composition_transform
-from glypy.algorithms import database
+from glypy.algorithms import database, subtree_search
 from .common import load
 
 
@@ -74,5 +79,419 @@ from .common import load
 #         self.assertEqual(db.get_metadata("Spam"), {"Ham", "Eggs"})
 #         self.assertEqual(len(db), 0)
 
+
+class BulkLoadTest(unittest.TestCase):
+
+    def _records(self, record_type=database.GlycanRecord):
+        return [record_type(load(name)) for name in (
+            "broad_n_glycan", "complex_glycan", "branchy_glycan", "common_glycan")]
+
+    def test_load_data_batches(self):
+        records = self._records()
+        db = database.RecordDatabase()
+        db.load_data(records, batch_size=3)
+        self.assertEqual(len(db), 4)
+        for i, record in enumerate(records, 1):
+            self.assertEqual(db[i], record)
+        self.assertEqual(db[1].composition, records[0].composition)
+        row = next(db.execute("SELECT composition, is_n_glycan, typeof(structure) FROM {table_name} WHERE glycan_id = 1"))
+        self.assertEqual(tuple(row), ("Hex:7 HexNAc:6 dHex:1", 1, "blob"))
+        self.assertEqual(list(db.ppm_match_tolerance_search(records[1].mass(), 1e-5))[0], records[1])
+
+    def test_taxa(self):
+        records = self._records(database.GlycanRecordWithTaxon)
+        records[0].taxa = [database.Taxon(9606, "human", None)]
+        db = database.RecordDatabase(record_type=database.GlycanRecordWithTaxon)
+        db.load_data(records)
+        self.assertEqual([r.id for r in db.query_by_taxon_id(9606)], [1])
+
+    def test_rollback(self):
+        records = self._records()
+        db = database.RecordDatabase()
+        records[2].id = 1
+        self.assertRaises(Exception, db.load_data, records, set_id=False)
+        self.assertEqual(len(db), 0)
+
+    def test_transaction(self):
+        db = database.RecordDatabase()
+        with db.transaction():
+            db.load_data(self._records(), commit=False)
+            db.set_metadata("source", "test")
+        self.assertEqual(len(db), 4)
+        try:
+            with db.transaction():
+                db.load_data(self._records(), commit=False)
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertEqual(len(db), 4)
+
+    def test_update(self):
+        db = database.RecordDatabase(records=self._records())
+        rec = db[1]
+        composition_transform.derivatize(rec.structure, "methyl")
+        rec.update()
+        self.assertAlmostEqual(db[1].mass(), rec.mass(), 3)
+
+    def test_to_sql(self):
+        record = self._records()[3]
+        statement = list(record.to_sql(id=5))[0]
+        db = database.RecordDatabase()
+        db.execute(statement)
+        self.assertEqual(db[5], record)
+
+    def test_pragmas(self):
+        db = database.RecordDatabase(journal_mode="wal", synchronous="normal")
+        self.assertEqual(next(db.execute("PRAGMA synchronous"))[0], 1)
+        self.assertRaises(ValueError, db.set_pragmas, journal_mode="bogus; DROP TABLE")
+
+
+class RecordViewTest(unittest.TestCase):
+
+    def _database(self):
+        return database.RecordDatabase(records=[
+            database.GlycanRecord(load(name)) for name in (
+                "broad_n_glycan", "complex_glycan", "branchy_glycan")])
+
+    def test_select_projection(self):
+        db = self._database()
+        views = list(db.select(["mass", "composition"], where="mass > ?", params=(0,), order_by="mass"))
+        self.assertEqual(len(views), 3)
+        self.assertEqual(sorted(views[0].keys()), ["composition", "glycan_id", "mass"])
+        self.assertFalse(views[0].is_loaded())
+        self.assertEqual(views[0].mass(), min(view.mass() for view in views))
+        self.assertFalse(views[0].is_loaded())
+        self.assertEqual(views[0].structure, db[views[0].id].structure)
+        self.assertTrue(views[0].is_loaded())
+        self.assertRaises(ValueError, lambda: list(db.select(["not_a_column"])))
+
+    def test_lazy_search(self):
+        db = self._database()
+        record = db[2]
+        views = list(db.ppm_match_tolerance_search(record.mass(), 1e-5, lazy=True))
+        self.assertEqual(len(views), 1)
+        self.assertFalse(views[0].is_loaded())
+        self.assertEqual(views[0], record)
+        self.assertEqual(views[0].monosaccharides, record.monosaccharides)
+
+    def test_uncompressed_payload(self):
+        db = self._database()
+        record = database.GlycanRecord(load("common_glycan"))
+        record.compress_payload = False
+        db.load_data([record])
+        self.assertEqual(db[4], record)
+
+
+class MassIndexTest(unittest.TestCase):
+
+    def test_search_many(self):
+        records = [database.GlycanRecord(load(name)) for name in (
+            "broad_n_glycan", "complex_glycan", "branchy_glycan", "common_glycan")]
+        db = database.RecordDatabase(records=records)
+        masses = [record.mass() for record in records]
+        shift = 17.02655
+        result = db.ppm_match_tolerance_search_many(
+            [masses[1] - shift, masses[3], 10.0], 1e-5, mass_shifts=[0, shift])
+        self.assertEqual(len(result), 2)
+        self.assertEqual(sorted(result.ids.tolist()), [2, 4])
+        first = result.for_query(0)
+        self.assertEqual(first.ids.tolist(), [2])
+        self.assertEqual(first.shift_index.tolist(), [1])
+        self.assertTrue(abs(first.ppm_error[0]) < 1)
+        self.assertEqual(len(result.for_query(2)), 0)
+        for mass in masses:
+            expected = [r.id for r in db.ppm_match_tolerance_search(mass, 1e-5)]
+            self.assertEqual(db.mass_index.search(mass, 1e-5).ids.tolist(), expected)
+        loaded = list(result.records(db))
+        self.assertEqual([view.id for view in loaded], result.ids.tolist())
+        self.assertEqual(loaded[0], db[int(result.ids[0])])
+        # Loading more records discards the index
+        added = database.GlycanRecord(load("sulfated_glycan"))
+        db.load_data([added])
+        self.assertIsNone(db.mass_index)
+        self.assertEqual(db.ppm_match_tolerance_search_many([added.mass()], 1e-5).ids.tolist(), [added.id])
+
+
+class SubstructureIndexTest(unittest.TestCase):
+
+    def test_substructure_search(self):
+        records = [database.GlycanRecord(load(name)) for name in (
+            "broad_n_glycan", "complex_glycan", "branchy_glycan", "common_glycan")]
+        db = database.RecordDatabase(records=records)
+        core = glypy.glycans["N-Linked Core"]
+        self.assertEqual([r.id for r in db.substructure_search(core)], [1, 2])
+        self.assertEqual(len(db.substructure_index), 4)
+        branchy = load("branchy_glycan")
+        expected = [r.id for r in db if subtree_search.subtree_of(branchy, r.structure) is not None]
+        self.assertEqual([r.id for r in db.substructure_search(branchy)], expected)
+        self.assertEqual(db.substructure_search(load("complex_glycan"), exact=True), [records[1]])
+
+    def test_index_discarded_on_load(self):
+        db = database.RecordDatabase(records=[database.GlycanRecord(load("common_glycan"))])
+        query = load("complex_glycan")
+        self.assertEqual(db.substructure_search(query), [])
+        self.assertIsNotNone(db.substructure_index)
+        db.load_data([database.GlycanRecord(load("complex_glycan"))])
+        self.assertIsNone(db.substructure_index)
+        self.assertEqual([r.id for r in db.substructure_search(query)], [2])
+
+
+class SideTableTest(unittest.TestCase):
+
+    def _database(self, **kwargs):
+        return database.RecordDatabase(records=[
+            database.GlycanRecord(load(name)) for name in (
+                "broad_n_glycan", "complex_glycan", "branchy_glycan", "common_glycan")], **kwargs)
+
+    def test_residue_counts(self):
+        db = self._database()
+        records = list(db)
+        expected = [r.id for r in records if r.monosaccharides.get("HexNAc", 0) >= 4 and
+                    r.monosaccharides.get("dHex", 0) == 1]
+        self.assertTrue(expected)
+        found = [r.id for r in db.query_by_residue_counts({"HexNAc": (4, None), "dHex": 1})]
+        self.assertEqual(found, expected)
+        target = records[0].monosaccharides
+        exact = list(db.query_by_residue_counts(dict(target), exact=True))
+        self.assertEqual([r.id for r in exact], [records[0].id])
+        no_fucose = [r.id for r in db.query_by_residue_counts(dHex=0)]
+        self.assertEqual(no_fucose, [r.id for r in records if not r.monosaccharides.get("dHex")])
+
+    def test_motifs(self):
+        db = self._database(motif_index=glypy.motifs)
+        name = "N-Glycan core basic 1"
+        expected = [r.id for r in db if name in r.motifs]
+        self.assertTrue(expected)
+        self.assertEqual([r.id for r in db.query_by_motif(name)], expected)
+        self.assertEqual(list(db.query_by_motif(name, "not a motif")), [])
+
+    def test_upgrade_existing_database(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "records.db")
+            db = self._database(connection_string=path, motif_index=glypy.motifs)
+            self.assertEqual(len(list(db.query_by_motif())), 4)
+            expected = [r.id for r in db.query_by_motif("N-Glycan core basic 1")]
+            fucosylated = [r.id for r in db.query_by_residue_counts(dHex=1)]
+            self.assertTrue(fucosylated)
+            # Simulate a database written before the side tables existed
+            db.executescript("DROP TABLE RecordResidueCount; DROP TABLE RecordMotif;")
+            db.close()
+            db = database.RecordDatabase(path)
+            self.assertEqual([r.id for r in db.query_by_motif("N-Glycan core basic 1")], expected)
+            self.assertEqual([r.id for r in db.query_by_residue_counts(dHex=1)], fucosylated)
+            self.assertFalse(db.record_type.upgrade_schema(db))
+            db.close()
+        finally:
+            shutil.rmtree(directory)
+
+    def test_update_keeps_in_sync(self):
+        db = self._database()
+        record = db[4]
+        record.motifs.append("custom")
+        record.update()
+        self.assertEqual([r.id for r in db.query_by_motif("custom")], [4])
+        record.structure = load("broad_n_glycan")
+        record.update()
+        self.assertEqual(
+            sorted(r.id for r in db.query_by_residue_counts(db[1].monosaccharides, exact=True)), [1, 4])
+
+
+def _count_residues(record):
+    return len(record.structure)
+
+
+def _methylate(record):
+    composition_transform.derivatize(record.structure, "methyl")
+    return record
+
+
+class MapTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "records.db")
+        self.db = database.RecordDatabase(self.path, records=[
+            database.GlycanRecord(load(name)) for name in (
+                "broad_n_glycan", "complex_glycan", "branchy_glycan", "common_glycan", "sulfated_glycan")])
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.directory)
+
+    def test_map(self):
+        expected = [(r.id, len(r.structure)) for r in self.db]
+        self.assertEqual(list(self.db.map(_count_residues, chunk_size=2)), expected)
+        self.assertEqual(list(self.db.map(_count_residues, processes=2, chunk_size=2)), expected)
+        self.assertEqual(
+            sorted(self.db.map(_count_residues, processes=2, chunk_size=2, ordered=False)), expected)
+
+    def test_write_back(self):
+        masses = [r.mass() for r in self.db]
+        self.assertEqual(self.db.ppm_match_tolerance_search_many([masses[0]], 1e-5).ids.tolist(), [1])
+        self.db.build_substructure_index()
+        results = list(self.db.map(_methylate, processes=2, chunk_size=2, write_back=True))
+        self.assertEqual(len(results), 5)
+        for mass, record in zip(masses, self.db):
+            self.assertGreater(record.mass(), mass)
+            self.assertAlmostEqual(next(self.db.execute(
+                "SELECT mass FROM {table_name} WHERE glycan_id = ?", (record.id,)))[0], record.mass(), 3)
+        self.assertIsNone(self.db.mass_index)
+        self.assertIsNone(self.db.substructure_index)
+        self.assertEqual(self.db.ppm_match_tolerance_search_many([masses[0]], 1e-5).ids.tolist(), [])
+        self.assertEqual(
+            self.db.ppm_match_tolerance_search_many([self.db[1].mass()], 1e-5).ids.tolist(), [1])
+
+
+class ReadPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "records.db")
+        records = [database.GlycanRecordWithTaxon(load(name)) for name in (
+            "broad_n_glycan", "complex_glycan", "branchy_glycan")]
+        records[1].taxa = [database.Taxon(9606, "human", None)]
+        self.db = database.RecordDatabase(
+            self.path, record_type=database.GlycanRecordWithTaxon, records=records)
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.directory)
+
+    def test_concurrent_queries(self):
+        with self.db.read_pool(max_workers=3) as pool:
+            futures = [pool.query("__getitem__", i) for i in (1, 2, 3) * 3]
+            self.assertEqual([f.result().id for f in futures], [1, 2, 3] * 3)
+            matches = pool.query("query_by_taxon_id", 9606).result()
+            self.assertEqual([m.id for m in matches], [2])
+            self.assertEqual(pool.submit(len).result(), 3)
+            self.assertRaises(
+                sqlite3.OperationalError,
+                pool.submit(lambda db: db.execute("DELETE FROM {table_name}")).result)
+
+    def test_read_only_without_uri(self):
+        connect = sqlite3.connect
+
+        def connect_without_uri(*args, **kwargs):
+            if "uri" in kwargs:
+                raise TypeError("'uri' is an invalid keyword argument")
+            return connect(*args, **kwargs)
+
+        sqlite3.connect = connect_without_uri
+        try:
+            connection = database._connect_read_only(self.path)
+        finally:
+            sqlite3.connect = connect
+        try:
+            table_name = self.db.record_type.table_name
+            self.assertEqual(connection.execute("SELECT count(*) FROM %s" % table_name).fetchone()[0], 3)
+            self.assertRaises(sqlite3.OperationalError, connection.execute, "DELETE FROM %s" % table_name)
+        finally:
+            connection.close()
+
+    def test_query_async(self):
+        import asyncio
+
+        pool = self.db.read_pool()
+        mass = self.db[3].mass()
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(
+                pool.query_async("ppm_match_tolerance_search", mass, 1e-5, loop=loop))
+        finally:
+            loop.close()
+        self.assertEqual([r.id for r in results], [3])
+        pool.close()
+
+
+class ShardedRecordDatabaseTest(unittest.TestCase):
+
+    names = ("broad_n_glycan", "complex_glycan", "branchy_glycan", "common_glycan", "sulfated_glycan")
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "records.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _records(self):
+        return [database.GlycanRecord(load(name)) for name in self.names]
+
+    def test_id_partition(self):
+        db = database.ShardedRecordDatabase(self.path, records=self._records(), n_shards=3)
+        self.assertEqual(len(db), 5)
+        self.assertEqual([len(shard) for shard in db.shards], [1, 2, 2])
+        self.assertEqual([r.id for r in db], [1, 2, 3, 4, 5])
+        self.assertEqual(db[4].structure, load("common_glycan"))
+        self.assertEqual([r.id for r in db[[5, 1, 3]]], [1, 3, 5])
+        self.assertEqual([r.id for r in db[2:4]], [2, 3, 4])
+        self.assertRaises(IndexError, lambda: db[10])
+        self.assertIn(2, db)
+        mass = db[3].mass()
+        self.assertEqual([r.id for r in db.ppm_match_tolerance_search(mass, 1e-5)], [3])
+        self.assertEqual([r.id for r in db.query_by_residue_counts(HexNAc=(4, None))],
+                         [r.id for r in db if r.monosaccharides.get("HexNAc", 0) >= 4])
+        db.close()
+
+        reopened = database.ShardedRecordDatabase(self.path, n_shards=3, partition="mass")
+        self.assertEqual(reopened.partition, "id")
+        self.assertEqual(reopened.create(load("common_glycan")).id, 6)
+        self.assertEqual(len(reopened.shards[0]), 2)
+        self.assertRaises(ValueError, database.ShardedRecordDatabase, self.path, n_shards=2)
+        reopened.close()
+
+    def test_mass_partition(self):
+        records = self._records()
+        masses = sorted(r.mass() for r in records)
+        boundaries = [(masses[1] + masses[2]) / 2.]
+        self.assertRaises(ValueError, database.ShardedRecordDatabase, n_shards=2, partition="mass")
+        db = database.ShardedRecordDatabase(
+            records=records, n_shards=2, partition="mass", mass_boundaries=boundaries)
+        self.assertEqual([len(shard) for shard in db.shards], [2, 3])
+        for record in db:
+            hits = list(db.ppm_match_tolerance_search(record.mass(), 1e-5, lazy=True))
+            self.assertIn(record.id, [hit.id for hit in hits])
+        self.assertEqual(len(list(db.select(columns=["mass"]))), 5)
+        db.close()
+
+    def test_update_moves_record_between_shards(self):
+        small, large = load("common_glycan"), load("broad_n_glycan")
+        boundaries = [(small.mass() + large.mass()) / 2.]
+        db = database.ShardedRecordDatabase(
+            self.path, records=[database.GlycanRecord(small), database.GlycanRecord(large)],
+            n_shards=2, partition="mass", mass_boundaries=boundaries)
+        self.assertEqual([len(shard) for shard in db.shards], [1, 1])
+        record = db[1]
+        record.structure = large.clone()
+        record.update()
+        self.assertEqual([len(shard) for shard in db.shards], [0, 2])
+        self.assertIs(record._bound_db, db.shards[1])
+        hits = db.ppm_match_tolerance_search(large.mass(), 1e-5)
+        self.assertEqual(sorted(r.id for r in hits), [1, 2])
+        self.assertEqual(db[1].structure, large)
+        self.assertEqual(list(db.shards[0].execute("SELECT * FROM RecordResidueCount;")), [])
+
+        # Updating in place leaves the record where it is
+        record.structure = large.clone()
+        record.update()
+        self.assertEqual([len(shard) for shard in db.shards], [0, 2])
+        db.close()
+
+    def test_load_data_rolls_back_failed_load(self):
+        db = database.ShardedRecordDatabase(self.path, records=self._records()[:2], n_shards=2)
+
+        class BrokenRecord(database.GlycanRecord):
+            def to_sql_parameters(self, *args, **kwargs):
+                raise ValueError("broken")
+
+        records = self._records()[2:] + [BrokenRecord(load("common_glycan"))]
+        self.assertRaises(ValueError, db.load_data, records, batch_size=1)
+        self.assertEqual(len(db), 2)
+        self.assertEqual(db._id, 2)
+        self.assertEqual(db.create(load("common_glycan")).id, 3)
+        db.close()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -8,7 +8,7 @@ from glypy.enzyme import (
 
 class GlycomeTests(unittest.TestCase):
 
-    def _make_glycome(self):
+    def _make_glycome(self, codec=None):
         glycosylases, glycosyltransferases, seeds = make_n_glycan_pathway()
         glycosyltransferases.pop("gntE")
         glycosyltransferases.pop('agal13galt')
@@ -16,7 +16,7 @@ class GlycomeTests(unittest.TestCase):
         glycosyltransferases.pop('siat2_6')
         glycosyltransferases.pop("fuct3")
         glycome = MultiprocessingGlycome(
-            glycosylases, glycosyltransferases, seeds)
+            glycosylases, glycosyltransferases, seeds, codec=codec)
         return glycome
 
     def test_path_between(self):
@@ -47,6 +47,16 @@ class GlycomeTests(unittest.TestCase):
         assert seed == ref
         assert set(eg.children(seed)) == set(graph.children(seed))
 
+    def test_binary_codec(self):
+        reference = self._make_glycome()
+        glycome = self._make_glycome(codec="binary")
+        for _ in range(3):
+            expected = reference.step()
+            generation = glycome.step()
+            self.assertEqual(
+                sorted(map(str, generation)), sorted(map(str, expected)))
+        self.assertEqual(glycome.enzyme_graph, reference.enzyme_graph)
+
     def test_galt(self):
         _, glycosyltransferases, _ = make_n_glycan_pathway()
         galt = glycosyltransferases['galt']
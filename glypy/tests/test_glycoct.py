@@ -2,6 +2,7 @@ import unittest
 
 import glypy
 from glypy.io import glycoct
+from glypy.composition import composition_transform
 from glypy.tests.common import load, glycan, structures as raw_structures
 
 
@@ -299,6 +300,50 @@ class GlycoCTParserTests(unittest.TestCase):
             retext = glycoct.dumps(structure).strip()
             assert text == retext, "Failed to match %s" % acc
 
+    def test_lean_writer(self):
+        structures = [glycoct.loads(raw_structures[acc]) for acc in ['G58143RL', 'G82388RB', 'G28839WC']]
+        structures.append(load("sulfated_glycan"))
+        structures.append(load("cyclical_glycan"))
+        expected = [glycoct.GlycoCTWriter(structure).dump() for structure in structures]
+        self.assertEqual([glycoct.dumps(structure) for structure in structures], expected)
+        gc = glypy.GlycanComposition.parse("{Hex:5; HexNAc:4}")
+        self.assertEqual(glycoct.dumps_many(structures + [gc]), expected + [glycoct.dumps(gc)])
+
+    def test_composition_of(self):
+        texts = list(raw_structures.values()) + [glycoct.dumps(glypy.motifs[name]) for name in glypy.motifs.keys()]
+        derivatized = [glypy.motifs["GPI anchor core"], glypy.motifs["LPS core"], glypy.glycans["N-Linked Core"]]
+        for reference in derivatized:
+            for derivative in ["methyl", "acetyl"]:
+                structure = composition_transform.derivatize(reference.clone(), derivative)
+                texts.append(glycoct.dumps(structure))
+        for text in texts:
+            structure = glycoct.loads(text, allow_multiple=False)
+            if not isinstance(structure, glycan.Glycan):
+                continue
+            expected = glypy.GlycanComposition.from_glycan(structure)
+            composition = glycoct.composition_of(text)
+            self.assertEqual(composition, expected)
+            self.assertAlmostEqual(composition.mass(), expected.mass())
+            self.assertEqual(composition.reducing_end, expected.reducing_end)
+        gc = glypy.GlycanComposition.parse("{Hex:5; Hex2NAc:4; Neu5Ac:2; @sulfate: 1}")
+        self.assertEqual(glycoct.composition_of(glycoct.dumps(gc)), gc)
+
+    def test_iterparse(self):
+        with open(self._file_path) as stream:
+            expected = list(glycoct.read(stream))
+        self.assertEqual(list(glycoct.iterparse(self._file_path, processes=2, chunk_size=1)), expected)
+
+        text = "\n".join(raw_structures[acc] for acc in ['G58143RL', 'G82388RB', 'G28839WC', 'G37369XO',
+                                                        'G36221RT', 'G27293OK', 'G62831KM'])
+        expected = glycoct.loads(text)
+        serial = list(glycoct.iterparse(glycoct.StringIO(text), processes=1, chunk_size=3))
+        self.assertEqual(serial, expected)
+        parallel = list(glycoct.iterparse(glycoct.StringIO(text), processes=2, chunk_size=2))
+        self.assertEqual(parallel, expected)
+        from glypy.io import binary
+        encoded = list(glycoct.iterparse(glycoct.StringIO(text), processes=2, chunk_size=2, codec="binary"))
+        self.assertEqual([binary.loads(e) for e in encoded], expected)
+
 
 if __name__ == '__main__':
     unittest.main()
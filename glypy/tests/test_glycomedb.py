@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import warnings
+
+from six.moves import BaseHTTPServer
+from six.moves.urllib.parse import parse_qs, urlparse
+
+from glypy.io import glycoct
+from glypy.algorithms.database import RecordDatabase
+from glypy.tests.common import load
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    from glypy.io import glycomedb
+
+
+record_template = u'''<?xml version="1.0" encoding="UTF-8"?>
+<structure id="{id}">
+<condenced>{glycoct}</condenced>
+<taxon ncbi="9606" name="Homo sapiens"><entry database="CFG" id="{id}"/></taxon>
+<aglyca name="Asn" reducing="true"><entry database="CFG" id="{id}"/></aglyca>
+</structure>
+'''
+
+
+class LocalGlycomeDBServer(object):
+    """Serves a record for each structure in `structures`, keyed by position, and
+    responds with 404 for any other identifier"""
+
+    def __init__(self, structures):
+        self.structures = structures
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            def do_GET(self):
+                id = int(parse_qs(urlparse(self.path).query)['glycomeId'][0])
+                server.requests.append(id)
+                if id not in server.structures:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = record_template.format(id=id, glycoct=glycoct.dumps(server.structures[id]))
+                self.send_response(200)
+                self.send_header("Content-Type", "text/xml")
+                self.end_headers()
+                self.wfile.write(body.encode("utf8"))
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = BaseHTTPServer.HTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url_template = "http://127.0.0.1:%d/showStructure.action?glycomeId={id}" % self.httpd.server_port
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class BulkDownloaderTest(unittest.TestCase):
+    def setUp(self):
+        names = ["common_glycan", "branchy_glycan", "broad_n_glycan", "sulfated_glycan", "complex_glycan"]
+        self.structures = {i: load(name) for i, name in enumerate(names, 1)}
+        self.server = LocalGlycomeDBServer(self.structures)
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "glycomedb.db")
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.directory)
+
+    def test_download_and_resume(self):
+        downloader = glycomedb.BulkDownloader(
+            self.path, url_template=self.server.url_template, max_workers=2, processes=2, batch_size=2)
+        self.assertEqual(downloader.download([1, 2, 3, 99]), 3)
+        self.assertEqual(set(downloader.misses), {99})
+        self.assertEqual(downloader.completed_ids(), {1, 2, 3})
+        downloader.database.close()
+
+        # Only the records which are missing are requested again
+        self.server.requests = []
+        db = glycomedb.download_records(
+            range(1, 6), self.path, url_template=self.server.url_template, processes=1)
+        self.assertEqual(sorted(self.server.requests), [4, 5])
+        self.assertEqual(len(db), 5)
+        for i, structure in self.structures.items():
+            record = db[i]
+            self.assertEqual(record.structure, structure)
+            self.assertEqual(record.taxa[0].tax_id, '9606')
+        self.assertEqual(db.get_metadata("misses"), {99: downloader.misses[99]})
+        db.close()
+        self.assertEqual(len(RecordDatabase(self.path)), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
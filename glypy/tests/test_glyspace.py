@@ -1,5 +1,15 @@
+import os
+import shutil
+import tempfile
+import threading
 import unittest
-from glypy.io import glyspace
+import warnings
+
+from six.moves import BaseHTTPServer
+from six.moves.urllib.parse import parse_qs, urlparse
+
+from glypy.io import glyspace, glycoct
+from glypy.tests.common import load
 from glypy import tree, root
 
 
@@ -66,6 +76,114 @@ class RDFClientTest(unittest.TestCase):
         self.assertTrue(graph.isomorphic(client))
 
 
+class LocalSPARQLServer(object):
+    """Answers SPARQL queries over HTTP from an in-memory graph, recording each query"""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.queries = []
+        server = self
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            def _answer(self, query):
+                server.queries.append(query)
+                result_format = 'json' if 'json' in self.headers.get("Accept", "") else 'xml'
+                body = server.graph.query(query).serialize(format=result_format)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/sparql-results+" + result_format)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._answer(parse_qs(urlparse(self.path).query)['query'][0])
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length'])).decode('utf8')
+                if 'form' in self.headers.get('Content-Type', ''):
+                    body = parse_qs(body)['query'][0]
+                self._answer(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = BaseHTTPServer.HTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = "http://127.0.0.1:%d/sparql" % self.httpd.server_port
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class TripleCacheTest(unittest.TestCase):
+    def setUp(self):
+        # rdflib deprecates ConjunctiveGraph, which the clients are built on
+        self._warning_context = warnings.catch_warnings()
+        self._warning_context.__enter__()
+        warnings.simplefilter("ignore", DeprecationWarning)
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "triples.db")
+        graph = glyspace.ConjunctiveGraph().parse(data=example_n3, format='n3')
+        sequence = glyspace.NSGlycoinfo["G80903UK/glycoct"]
+        graph.add((sequence, glyspace.NSGlycan.in_carbohydrate_format,
+                   glyspace.NSGlycan.carbohydrate_format_glycoct))
+        graph.add((sequence, glyspace.NSGlycan.has_sequence,
+                   glyspace.Literal(glycoct.dumps(load("common_glycan")))))
+        self.server = LocalSPARQLServer(graph)
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.directory)
+        self._warning_context.__exit__(None, None, None)
+
+    def make_client(self, ttl=3600):
+        cache = glyspace.TripleCache(self.path, ttl=ttl)
+        client = glyspace.RDFClientBase(self.server.url, glyspace.NSGlycoinfo, triple_cache=cache)
+        client.predicate_processor_map = glyspace.GlyTouCanRDFClient.predicate_processor_map
+        return client
+
+    def test_get_many(self):
+        client = self.make_client()
+        record, missing = client.get_many(["G80903UK", "G00000XX"], batch_size=1, max_workers=2)
+        self.assertEqual(record.has_primary_id, "G80903UK")
+        self.assertEqual(len(record.has_motif), 6)
+        self.assertEqual(record.structure_, load("common_glycan"))
+        self.assertEqual(list(missing), [])
+        # One query per subject, one query per referenced sequence, and the predicate fallback
+        # for the missing accession
+        n_queries = len(self.server.queries)
+        self.assertEqual(n_queries, 2 + 4 + 1)
+        client.triple_cache.close()
+
+        client = self.make_client()
+        self.assertEqual(client.get("G80903UK").has_primary_id, "G80903UK")
+        record = client.get_many(["G80903UK"])[0]
+        self.assertEqual(record.structure_, load("common_glycan"))
+        self.assertEqual(len(self.server.queries), n_queries)
+        client.triple_cache.close()
+
+        client = self.make_client(ttl=0)
+        client.get_many(["G80903UK"])
+        self.assertEqual(len(self.server.queries), n_queries + 2)
+        client.triple_cache.expire()
+        self.assertEqual(len(client.triple_cache), 0)
+        client.triple_cache.close()
+
+    def test_cache(self):
+        cache = glyspace.TripleCache(ttl=None)
+        subject = glyspace.NSGlycoinfo["G80903UK"]
+        triples = [(subject, glyspace.NSGlyTouCan.has_primary_id, glyspace.Literal("G80903UK"))]
+        self.assertIsNone(cache.get(subject))
+        cache.put(subject, triples)
+        self.assertEqual(cache.get(subject), triples)
+        self.assertIsNone(cache.get(subject, "object"))
+        self.assertEqual(cache.get_many([subject, glyspace.NSGlycoinfo["G00000XX"]]), {subject: triples})
+        cache.discard(subject)
+        self.assertEqual(len(cache), 0)
+
+
 @skip_not_online
 class GlyTouCanRDFClientTest(unittest.TestCase):
     def test_get(self):
@@ -72,6 +72,52 @@ class IUPACTests(unittest.TestCase):
         equiv = next(iupac.IUPACParser.loads(text, 'line'))
         self.assertEqual(equiv, structure)
 
+    def test_tokenize(self):
+        text = 'a-D-Neup5Ac-(2-3)-b-D-Galp-(1-4)-[a-L-Fucp-(1-3)]b-D-Glcp2NAc'
+        deserializer = iupac.glycan_from_iupac
+        tokens = [(kind, text[start:end]) for kind, start, end in deserializer.tokenize(text)]
+        self.assertEqual(tokens, [
+            (deserializer.RESIDUE, 'a-D-Neup5Ac-(2-3)-'),
+            (deserializer.RESIDUE, 'b-D-Galp-(1-4)-'),
+            (deserializer.BRANCH_START, '['),
+            (deserializer.RESIDUE, 'a-L-Fucp-(1-3)'),
+            (deserializer.BRANCH_END, ']'),
+            (deserializer.RESIDUE, 'b-D-Glcp2NAc'),
+        ])
+        text = 'Neu5Ac(a2-3)Gal(b1-4)[Fuc(a1-3)]GlcNAc'
+        deserializer = iupac.glycan_from_iupac_simple
+        tokens = [text[start:end] for kind, start, end in deserializer.tokenize(text)]
+        self.assertEqual(tokens, ['Neu5Ac(a2-3)', 'Gal(b1-4)', '[', 'Fuc(a1-3)', ']', 'GlcNAc'])
+
+    def test_from_iupac_many(self):
+        structures = [common.load(name) for name in ("complex_glycan", "broad_n_glycan", "sulfated_glycan")]
+        for dialect in ("extended", "simple"):
+            texts = [iupac.to_iupac(structure, dialect=dialect) for structure in structures]
+            texts.append(texts[0])
+            result = iupac.from_iupac_many(texts, dialect=dialect)
+            self.assertEqual(result, [iupac.from_iupac(text, dialect=dialect) for text in texts])
+            # Residues shared between sequences must not share state
+            self.assertIsNot(result[0].root, result[-1].root)
+            result[0].root.add_substituent("sulfate", 3)
+            self.assertNotEqual(result[0], result[-1])
+
+    def test_to_iupac_many(self):
+        structures = [common.load(name) for name in ("complex_glycan", "broad_n_glycan", "sulfated_glycan")]
+        for dialect, serializer in (("extended", iupac.glycan_to_iupac), ("simple", iupac.glycan_to_iupac_simple)):
+            residue_serializer = serializer.monosaccharide_serializer
+            residue_serializer.clear_cache()
+            texts = iupac.to_iupac_many(structures, dialect=dialect)
+            self.assertEqual(texts, [iupac.to_iupac(structure, dialect=dialect) for structure in structures])
+            self.assertEqual(len(residue_serializer._residue_cache), len(set(
+                residue_serializer.residue_signature(node) for structure in structures for node in structure)))
+            for structure in structures:
+                for node in structure:
+                    self.assertEqual(residue_serializer(node), residue_serializer.monosaccharide_to_iupac(node))
+        serializer = iupac.DerivatizationAwareMonosaccharideSerializer()
+        residue = glypy.monosaccharides.HexNAc
+        self.assertEqual(serializer(residue), '?-?-Hexp2NAc')
+        self.assertEqual(serializer(composition_transform.derivatize(residue, 'methyl')), '?-?-Hexp2NAc^Me')
+
 
 class DerivatizationAwareIUPACTests(unittest.TestCase):
     def test_monosaccharide_parse(self):
@@ -1,7 +1,12 @@
+import os
+import shutil
+import tempfile
 import unittest
 
+import glypy
 from glypy.utils import lazy
-from glypy.structure.named_structures import MonosaccharideIndex
+from glypy.structure import named_structures, Monosaccharide
+from glypy.structure.named_structures import MonosaccharideIndex, MotifIndex
 
 
 class ProxyTest(unittest.TestCase):
@@ -15,3 +20,143 @@ class ProxyTest(unittest.TestCase):
         self.assertEqual(index.dHex, index.Fucose)
         index['ldeoxyGal'] = fucose
         self.assertEqual(index['ldeoxyGal'], index.Fucose)
+
+    def test_container_protocol(self):
+        index = lazy.ProxyObject(MonosaccharideIndex)
+        self.assertTrue("Fucose" in index)
+        self.assertEqual(len(index), len(list(index)))
+
+    def test_copy_on_write(self):
+        index = glypy.monosaccharides
+        shared = dict.__getitem__(index, "HexNAc")
+        view = index.view("HexNAc")
+        self.assertTrue(isinstance(view, Monosaccharide))
+        self.assertEqual(view, index.HexNAc)
+        self.assertIs(object.__getattribute__(view, "_shared"), shared)
+        view.add_substituent("sulfate", 3)
+        self.assertIsNot(object.__getattribute__(view, "_shared"), shared)
+        self.assertNotEqual(view, index.HexNAc)
+        self.assertEqual(shared, index.HexNAc)
+        view = index.view("Hex")
+        view.anomer = 'alpha'
+        self.assertNotEqual(index.Hex.anomer, view.anomer)
+
+
+class SerializerTest(unittest.TestCase):
+    def test_lazy_glycoct_serializer(self):
+        from glypy.structure import glycan, monosaccharide
+        self.assertEqual(
+            monosaccharide._glycoct_serializer(glypy.monosaccharides.GlcNAc), str(glypy.monosaccharides.GlcNAc))
+        core = glypy.glycans["N-Linked Core"]
+        self.assertEqual(glycan._glycoct_serializer(core), str(core))
+
+    def test_lazy_submodules(self):
+        import glypy.io
+        self.assertEqual(glypy.io.glycoct.__name__, "glypy.io.glycoct")
+        self.assertEqual(glypy.algorithms.__name__, "glypy.algorithms")
+        self.assertRaises(AttributeError, getattr, glypy.io, "not_a_format")
+
+
+class PrecompiledIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_directory = named_structures.cache_directory
+        named_structures.cache_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(named_structures.cache_directory)
+        named_structures.cache_directory = self.cache_directory
+
+    def test_round_trip(self):
+        path = named_structures.precompiled_path("motifs")
+        built = MotifIndex()
+        # Precompiled indices are only written when the package is built
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(built._save_precompiled("motifs", "motifs.hjson"))
+        loaded = MotifIndex()
+        self.assertEqual(sorted(built), sorted(loaded))
+        for name in built:
+            self.assertEqual(built[name], loaded[name])
+            self.assertEqual(dict.__getitem__(built, name).motif_class, dict.__getitem__(loaded, name).motif_class)
+        self.assertEqual(built.motif_categories, loaded.motif_categories)
+
+    def test_stale(self):
+        path = named_structures.precompiled_path("monosaccharides")
+        reference = MonosaccharideIndex()
+        named_structures.save_precompiled("monosaccharides", "monosaccharides.hjson", {"Fucose": reference.Glc})
+        self.assertEqual(MonosaccharideIndex().Fucose, reference.Glc)
+        version = named_structures.cache_format_version
+        named_structures.cache_format_version = -1
+        try:
+            self.assertIsNone(named_structures.load_precompiled("monosaccharides", "monosaccharides.hjson"))
+            self.assertEqual(MonosaccharideIndex().Fucose, reference.Fucose)
+        finally:
+            named_structures.cache_format_version = version
+        with open(path, 'wb') as handle:
+            handle.write(b"truncated")
+        self.assertEqual(len(MonosaccharideIndex()), len(reference))
+
+    def test_build(self):
+        written = named_structures.build_precompiled()
+        self.assertEqual(len(written), 4)
+        self.assertEqual(sorted(MotifIndex()), sorted(glypy.motifs))
+
+
+class SharedSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "snapshot")
+
+    def tearDown(self):
+        named_structures.detach_snapshot()
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        snapshot = named_structures.SharedSnapshot.write(self.path)
+        for name in ("monosaccharides", "monosaccharide_residues", "glycans", "motifs"):
+            index = getattr(named_structures, name)
+            entries = snapshot.load(name)
+            self.assertEqual(sorted(entries), sorted(index.keys()))
+            for key, value in index.items():
+                self.assertEqual(entries[key], value)
+        self.assertIs(snapshot.get("motifs", "N-Glycan core basic 1"), entries["N-Glycan core basic 1"])
+        self.assertEqual(entries["N-Glycan core basic 1"].motif_class, "N-Glycan")
+        index = MotifIndex.from_snapshot(snapshot)
+        self.assertEqual(index.motif_classes, glypy.motifs.motif_classes)
+        snapshot.close()
+
+    def test_lazy_decoding(self):
+        named_structures.SharedSnapshot.write(self.path).close()
+        snapshot = named_structures.SharedSnapshot(self.path)
+        index = MotifIndex.from_snapshot(snapshot)
+        self.assertEqual(snapshot._decoded, {})
+        self.assertEqual(sorted(index), sorted(glypy.motifs))
+        self.assertEqual(index.motif_categories, glypy.motifs.motif_categories)
+        self.assertEqual(index["N-Glycan core basic 1"], glypy.motifs["N-Glycan core basic 1"])
+        self.assertEqual(index.view("N-Glycan core basic 1").motif_class, "N-Glycan")
+        self.assertEqual(list(snapshot._decoded), [("motifs", "N-Glycan core basic 1")])
+        self.assertEqual(dict(index.items()), snapshot.load("motifs"))
+        self.assertEqual(len(snapshot._decoded), len(index))
+        snapshot.close()
+
+    def test_attach(self):
+        named_structures.SharedSnapshot.write(self.path).close()
+        snapshot = named_structures.attach_snapshot(self.path)
+        self.assertEqual(os.environ[named_structures.snapshot_environ_key], snapshot.path)
+        proxy = lazy.ProxyObject(MotifIndex)
+        named_structures._lazy_indices += ((proxy, MotifIndex), )
+        try:
+            named_structures._use_snapshot(snapshot)
+            self.assertEqual(proxy["N-Glycan core basic 1"], glypy.motifs["N-Glycan core basic 1"])
+            self.assertIs(dict.__getitem__(proxy._source, "N-Glycan core basic 1"),
+                          snapshot.get("motifs", "N-Glycan core basic 1"))
+        finally:
+            named_structures._lazy_indices = named_structures._lazy_indices[:-1]
+        named_structures.detach_snapshot()
+        self.assertNotIn(named_structures.snapshot_environ_key, os.environ)
+        with open(self.path, 'wb') as handle:
+            handle.write(b"not a snapshot")
+        self.assertRaises(ValueError, named_structures.SharedSnapshot, self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
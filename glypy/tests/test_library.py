@@ -0,0 +1,83 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from glypy.io import glycoct
+from glypy.io.library import GlycanLibrary, GlycanLibraryWriter, GlycanLibraryView, LibraryError
+from glypy.tests.common import load
+
+
+names = ["common_glycan", "branchy_glycan", "broad_n_glycan", "sulfated_glycan", "complex_glycan"]
+
+
+class GlycanLibraryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "library.glib")
+        self.structures = [load(name) for name in names]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write(self, codec="binary"):
+        with GlycanLibraryWriter(self.path, codec=codec) as writer:
+            writer.add_many(zip(names, self.structures))
+
+    def test_random_access(self):
+        for codec in ("binary", "glycoct"):
+            self._write(codec)
+            with GlycanLibrary(self.path) as library:
+                self.assertEqual(len(library), len(names))
+                self.assertEqual(library[2], self.structures[2])
+                self.assertEqual(library[-1], self.structures[-1])
+                self.assertEqual(list(library), self.structures)
+                view = library[1:4]
+                self.assertIsInstance(view, GlycanLibraryView)
+                self.assertEqual(list(view), self.structures[1:4])
+                self.assertRaises(IndexError, lambda: library[len(names)])
+
+    def test_metadata(self):
+        self._write()
+        library = GlycanLibrary(self.path)
+        entry = library.entry(1)
+        self.assertEqual(entry.accession, names[1])
+        self.assertAlmostEqual(entry.mass, self.structures[1].mass())
+        self.assertEqual(glycoct.dumps(entry.structure), glycoct.dumps(self.structures[1]))
+        low = min(library.masses())
+        self.assertEqual(len(library.mass_between(low - 1, low + 1)), 1)
+        selected = library.filter(lambda entry: entry.accession.startswith("b"))
+        self.assertEqual([e.accession for e in selected.entries()], ["branchy_glycan", "broad_n_glycan"])
+        library.close()
+
+    def test_append(self):
+        self._write()
+        library = GlycanLibrary(self.path)
+        with GlycanLibraryWriter(self.path, append=True) as writer:
+            self.assertEqual(writer.add(self.structures[0], accession="again"), len(names))
+        self.assertEqual(len(library), len(names))
+        library.refresh()
+        self.assertEqual(len(library), len(names) + 1)
+        self.assertEqual(library.accession(-1), "again")
+        library.close()
+
+    def test_pickle(self):
+        self._write()
+        library = GlycanLibrary(self.path)
+        restored = pickle.loads(pickle.dumps(library))
+        self.assertEqual(restored[0], library[0])
+        restored.close()
+        library.close()
+
+    def test_bad_file(self):
+        with open(self.path, 'wb') as fh:
+            fh.write(b"GLIB")
+        with open(self.path + ".idx", 'wb') as fh:
+            fh.write(b"not an index")
+        self.assertRaises(LibraryError, GlycanLibrary, self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
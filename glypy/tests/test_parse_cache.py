@@ -0,0 +1,60 @@
+import unittest
+
+from glypy.io import cache, glycoct, iupac, linear_code, wurcs
+from glypy.tests.common import load
+
+
+class ParseCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        cache.enable(max_size=4)
+
+    def tearDown(self):
+        cache.disable()
+
+    def test_hits_return_clones(self):
+        text = glycoct.dumps(load("broad_n_glycan"))
+        cache.clear()
+        first = glycoct.loads(text)
+        second = glycoct.loads(text)
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second)
+        self.assertEqual(cache.stats()[:2], (1, 1))
+        second.root.children()[0][1].add_substituent("sulfate")
+        self.assertEqual(glycoct.loads(text), first)
+        self.assertEqual(cache.stats()[:3], (2, 1, 1))
+        # Different arguments are cached separately
+        glycoct.loads(text, allow_multiple=False)
+        self.assertEqual(cache.stats().size, 2)
+
+    def test_formats(self):
+        structure = load("common_glycan")
+        cache.clear()
+        for module in (iupac, linear_code, wurcs):
+            text = module.dumps(structure)
+            self.assertEqual(module.loads(text), module.loads(text))
+        self.assertEqual(cache.stats()[:3], (3, 3, 3))
+
+    def test_size_bound(self):
+        texts = [glycoct.dumps(load(name)) for name in (
+            "common_glycan", "branchy_glycan", "broad_n_glycan", "sulfated_glycan", "complex_glycan")]
+        cache.clear()
+        for text in texts:
+            glycoct.loads(text)
+        self.assertEqual(len(cache.parse_cache), 4)
+        glycoct.loads(texts[0])
+        self.assertEqual(cache.stats().misses, 6)
+        cache.clear()
+        self.assertEqual(cache.stats(), (0, 0, 0, 4))
+
+    def test_disabled(self):
+        cache.disable()
+        text = glycoct.dumps(load("common_glycan"))
+        glycoct.loads(text)
+        glycoct.loads(text)
+        self.assertEqual(cache.stats()[:3], (0, 0, 0))
+        self.assertFalse(cache.is_enabled())
+
+
+if __name__ == '__main__':
+    unittest.main()
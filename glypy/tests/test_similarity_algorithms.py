@@ -42,6 +42,77 @@ class SimilarityTests(unittest.TestCase):
         result = nsc.optimal_assignment(pairs)
         self.assertEqual(set(result), expected)
 
+    def test_optimal_bipartite_assignment(self):
+        weights = {(1, 'a'): 3, (1, 'b'): 2, (2, 'a'): 3, (3, 'c'): 1, (3, 'a'): 5}
+        self.assertEqual(similarity.optimal_bipartite_assignment(weights), ((1, 'b'), (2, 'a'), (3, 'c')))
+        self.assertIsNone(similarity.optimal_bipartite_assignment({(1, 'a'): 1, (2, 'a'): 1}))
+        self.assertIsNone(similarity.optimal_bipartite_assignment({(1, 'a'): 1, (2, 'a'): 1, (1, 'b'): 1, (3, 'b'): 1}))
+        self.assertEqual(similarity.optimal_bipartite_assignment({}), ())
+        # A width that the exhaustive enumeration of build_unique_index_pairs cannot handle
+        n = 40
+        weights = {(i, j): (i * j) % 7 for i in range(n) for j in range(n)}
+        weights.update({(i, (i + 1) % n): 10 for i in range(n)})
+        assignment = similarity.optimal_bipartite_assignment(weights)
+        self.assertEqual(sorted(assignment), [(i, (i + 1) % n) for i in range(n)])
+
+    def test_similarity_cache(self):
+        broad = load("broad_n_glycan")
+        nodes = list(broad)
+        expected = [similarity.monosaccharide_similarity(a, b) for a in nodes for b in nodes]
+        similarity.clear_similarity_cache()
+        self.assertEqual(similarity.similarity_cache_stats()[:3], (0, 0, 0))
+        with similarity.trait_signature_scope():
+            with similarity.trait_signature_scope():
+                result = [similarity.monosaccharide_similarity(a, b) for a in nodes for b in nodes]
+            self.assertIsNotNone(similarity._signature_scope.memo)
+        self.assertIsNone(similarity._signature_scope.memo)
+        self.assertEqual(result, expected)
+        hits, misses, size, max_size = similarity.similarity_cache_stats()
+        self.assertEqual(hits + misses, len(nodes) ** 2)
+        self.assertEqual(size, misses)
+        self.assertGreater(hits, misses)
+        # Options are part of the key
+        reference = similarity.monosaccharide_similarity(nodes[0], nodes[1], include_substituents=False)
+        with similarity.trait_signature_scope():
+            self.assertEqual(
+                similarity.monosaccharide_similarity(nodes[0], nodes[1], include_substituents=False),
+                reference)
+        self.assertEqual(similarity.similarity_cache_stats().misses, misses + 1)
+        similarity.clear_similarity_cache()
+
+    def test_similarity_cache_subclass(self):
+        class IgnoreSubstituents(similarity.NodeSimilarityComparator):
+            def compare_substituents(self, node, target):
+                return 0, 0
+
+        nodes = list(load("broad_n_glycan"))
+        sulfated = nodes[1].clone()
+        sulfated.add_substituent("sulfate", 3)
+        similarity.clear_similarity_cache()
+        with similarity.trait_signature_scope():
+            base = similarity.monosaccharide_similarity(nodes[1], sulfated)
+            derived = IgnoreSubstituents.similarity(nodes[1], sulfated)
+        self.assertNotEqual(base, derived)
+        self.assertEqual(derived, IgnoreSubstituents.similarity(nodes[1], sulfated))
+        self.assertEqual(similarity.similarity_cache_stats().misses, 2)
+        similarity.clear_similarity_cache()
+
+    def test_standalone_comparisons_use_cache(self):
+        from glypy.io.nomenclature import identity
+        nodes = list(load("broad_n_glycan"))
+        expected = [similarity.commutative_similarity(a, b) for a in nodes for b in nodes]
+        similarity.clear_similarity_cache()
+        self.assertEqual(
+            [similarity.commutative_similarity(a, b) for a in nodes for b in nodes], expected)
+        self.assertGreater(similarity.similarity_cache_stats().hits, 0)
+        similarity.clear_similarity_cache()
+        self.assertTrue(identity.is_a(nodes[0], glypy.monosaccharides["GlcNAc"]))
+        self.assertFalse(identity.is_a(nodes[0], glypy.monosaccharides["Man"]))
+        self.assertEqual(similarity.similarity_cache_stats().misses, 2)
+        self.assertIsNone(similarity._signature_scope.memo)
+        self.assertIs(similarity.similarity_cache_stats().__class__, glypy.utils.CacheStats)
+        similarity.clear_similarity_cache()
+
     def test_partial_similarity(self):
         broad = load("broad_n_glycan")
         expected = [
@@ -0,0 +1,94 @@
+import os
+import pickle
+import weakref
+import unittest
+import multiprocessing
+
+from glypy.io import glycoct
+from glypy.algorithms.storage import DistinctGlycanSet, ShardedDistinctGlycanSet
+from glypy.tests.common import load
+
+
+names = ["common_glycan", "branchy_glycan", "broad_n_glycan", "sulfated_glycan", "complex_glycan"]
+
+
+def _build_set(names):
+    distinct = ShardedDistinctGlycanSet(
+        [load(name) for name in names], codec="binary", n_shards=4, max_resident_shards=1)
+    # Keep the shards after this worker's copy of the set is collected
+    return distinct.detach()
+
+
+class ShardedDistinctGlycanSetTests(unittest.TestCase):
+
+    def setUp(self):
+        self.structures = [load(name) for name in names]
+
+    def test_membership(self):
+        with ShardedDistinctGlycanSet(n_shards=4, max_resident_shards=1) as distinct:
+            for structure in self.structures:
+                distinct.add(structure)
+            distinct.add(glycoct.loads(glycoct.dumps(self.structures[0])))
+            self.assertEqual(len(distinct), len(names))
+            # Only one shard is held in memory, so the rest must have been spilled
+            self.assertEqual(len(distinct._resident), 1)
+            self.assertTrue(os.listdir(distinct.directory))
+            for structure in self.structures:
+                self.assertIn(structure, distinct)
+            self.assertEqual(
+                sorted(map(glycoct.dumps, distinct)),
+                sorted(map(glycoct.dumps, self.structures)))
+            distinct.discard(self.structures[1])
+            self.assertNotIn(self.structures[1], distinct)
+            self.assertEqual(len(distinct), len(names) - 1)
+            directory = distinct.directory
+        self.assertFalse(os.path.exists(directory))
+
+    def test_set_algebra(self):
+        a = ShardedDistinctGlycanSet(self.structures[:3], n_shards=4, max_resident_shards=2)
+        b = ShardedDistinctGlycanSet(self.structures[2:], n_shards=4, max_resident_shards=2)
+        self.assertEqual(len(a | b), 5)
+        self.assertEqual(len(a & b), 1)
+        self.assertIn(self.structures[2], a & b)
+        self.assertEqual(len(a - b), 2)
+        self.assertEqual(len(a - DistinctGlycanSet(self.structures[:1])), 2)
+        self.assertEqual(len(a - self.structures[1:2]), 2)
+        a &= b
+        self.assertEqual(len(a), 1)
+        a |= b
+        self.assertEqual(len(a), 3)
+        a.close()
+        b.close()
+
+    def test_merge_across_processes(self):
+        pool = multiprocessing.Pool(2)
+        try:
+            parts = pool.map(_build_set, [names[:3], names[1:]])
+        finally:
+            pool.close()
+            pool.join()
+        merged = ShardedDistinctGlycanSet(codec="binary", n_shards=4).merge(*parts)
+        self.assertEqual(len(merged), len(names))
+        restored = pickle.loads(pickle.dumps(merged))
+        self.assertEqual(len(restored), len(names))
+        self.assertIn(self.structures[4], restored)
+        # Unpickled copies do not own their directory
+        restored.close()
+        self.assertTrue(os.path.exists(merged.directory))
+        for part in parts:
+            part.close(remove_directory=True)
+            self.assertFalse(os.path.exists(part.directory))
+        merged.close()
+        self.assertFalse(os.path.exists(merged.directory))
+
+    @unittest.skipIf(not hasattr(weakref, "finalize"), "Cleanup on collection requires weakref.finalize")
+    def test_cleanup_without_close(self):
+        distinct = ShardedDistinctGlycanSet(self.structures, n_shards=4, max_resident_shards=1)
+        directory = distinct.directory
+        self.assertTrue(os.path.exists(directory))
+        del distinct
+        self.assertFalse(os.path.exists(directory))
+
+
+if __name__ == '__main__':
+    unittest.main()
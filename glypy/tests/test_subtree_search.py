@@ -1,7 +1,7 @@
 import unittest
 
 from glypy.io import glycoct
-from glypy.structure.named_structures import glycans, monosaccharides
+from glypy.structure.named_structures import glycans, monosaccharides, motifs
 from glypy.algorithms import subtree_search
 
 from .common import load
@@ -112,6 +112,43 @@ class SubtreeSearchTests(unittest.TestCase):
         copy.root.add_monosaccharide(monosaccharides.Fucose, 3)
         self.assertEqual(subtree_search.n_saccharide_similarity(core, copy), 0.7)
 
+    def test_substructure_index(self):
+        structures = [load(name) for name in (
+            "broad_n_glycan", "complex_glycan", "branchy_glycan", "common_glycan", "sulfated_glycan")]
+        structures.extend(glycans.values())
+        index = subtree_search.SubstructureIndex.from_structures(structures)
+        self.assertEqual(len(index), len(structures))
+        for query in list(glycans.values()) + structures[:3]:
+            for exact in (False, True):
+                expected = [i for i, structure in enumerate(structures)
+                            if subtree_search.subtree_of(query, structure, exact=exact) is not None]
+                candidates = index.candidates(query, exact=exact)
+                self.assertTrue(set(expected) <= set(candidates))
+                self.assertEqual(index.search(query, structures, exact=exact), expected)
+        core = index.fingerprint(glycans['N-Linked Core'])
+        self.assertFalse(index.fingerprints[2].may_contain(core))
+        self.assertTrue(index.fingerprints[2].may_contain(core, tolerance=1))
+        # Unknown stems match any stem
+        generic = glycans['N-Linked Core'].clone()
+        for node in generic:
+            node.stem = (monosaccharides.Hex.stem[0],)
+        self.assertIn(0, index.candidates(generic))
+        self.assertEqual(index.search(generic, structures)[:1], [0])
+
+    def test_motif_annotate(self):
+        structures = [load(name) for name in (
+            "broad_n_glycan", "complex_glycan", "branchy_glycan", "common_glycan", "sulfated_glycan")]
+        structures.extend(glycans.values())
+        names = list(motifs.keys())
+        for exact in (False, True):
+            expected = [[name for name in names if subtree_search.subtree_of(
+                motifs[name], structure, exact=exact) is not None] for structure in structures]
+            self.assertEqual(subtree_search.motif_annotate(structures, exact=exact), expected)
+        self.assertTrue(expected[0])
+        annotator = subtree_search.MotifAnnotator(motifs)
+        self.assertEqual(subtree_search.motif_annotate(structures[:4], annotator, processes=2),
+                         [annotator(structure) for structure in structures[:4]])
+
     def test_treelet_iterator(self):
         complex_glycan = load("complex_glycan")
         treelets = list(subtree_search.treelets(complex_glycan, 3))
@@ -193,6 +193,41 @@ class TestWURCS(unittest.TestCase):
         self.assertEqual(gc, test)
         self.assertAlmostEqual(gc.mass(), test.mass())
 
+    def test_batch(self):
+        wurcs.clear_node_type_caches()
+        texts = [G71237SD_wurcs, G35323LT_wurcs, G41928NU_wurcs]
+        structures = wurcs.loads_many(texts)
+        self.assertEqual(structures, [glycoct.loads(t) for t in (
+            G71237SD_glycoct, G35323LT_glycoct, G41928NU_glycoct)])
+        # Residues parsed from the cache must not share state
+        self.assertEqual(wurcs.loads(G71237SD_wurcs), structures[0])
+        self.assertIsNot(wurcs.loads(G71237SD_wurcs).root, structures[0].root)
+        encoded = wurcs.dumps_many(structures)
+        self.assertEqual(encoded, [wurcs.dumps(structure) for structure in structures])
+        wurcs.clear_node_type_caches()
+        self.assertEqual(encoded, [wurcs.dumps(structure) for structure in structures])
+
+    def test_composition_of(self):
+        for text in (G71237SD_wurcs, G35323LT_wurcs, G41928NU_wurcs):
+            expected = GlycanComposition.from_glycan(wurcs.loads(text))
+            composition = wurcs.composition_of(text)
+            self.assertEqual(composition, expected)
+            self.assertAlmostEqual(composition.mass(), expected.mass())
+            self.assertEqual(composition.reducing_end, expected.reducing_end)
+        gc = GlycanComposition.parse('{Fuc:1; Gal:4; Man:3; Glc2NAc:6; Neu5Ac:4}')
+        self.assertEqual(wurcs.composition_of(wurcs.dumps(gc)), gc)
+
+    def test_composition_cache_is_bounded(self):
+        max_cache_size = wurcs.node_type.max_cache_size
+        wurcs.node_type.max_cache_size = 2
+        try:
+            for text in (G71237SD_wurcs, G35323LT_wurcs, G41928NU_wurcs):
+                expected = GlycanComposition.from_glycan(wurcs.loads(text))
+                self.assertEqual(wurcs.composition_of(text), expected)
+                self.assertLessEqual(len(wurcs.parser._node_type_residue_cache), 2)
+        finally:
+            wurcs.node_type.max_cache_size = max_cache_size
+
 
 if __name__ == '__main__':
     unittest.main()
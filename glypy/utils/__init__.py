@@ -1,11 +1,12 @@
 from .base import (opener, make_counter, invert_dict, identity,
                    nullop, chrinc, make_struct, classproperty, cyclewarning,
                    root, tree, groupby, pickle, ET, StringIO, where, uid,
-                   basestring, RootProtocolNotSupportedError, TreeProtocolNotSupportedError)
+                   basestring, resource_stream, RootProtocolNotSupportedError, TreeProtocolNotSupportedError,
+                   CacheStats)
 
 from .enum import Enum
 
 __all__ = ['opener', 'make_counter', 'invert_dict', 'identity', 'nullop',
            "chrinc", "make_struct", "classproperty", "cyclewarning",
-           "root", "tree", "groupby", "uid", "Enum", "RootProtocolNotSupportedError",
-           "TreeProtocolNotSupportedError"]
+           "root", "tree", "groupby", "uid", "resource_stream", "Enum", "RootProtocolNotSupportedError",
+           "TreeProtocolNotSupportedError", "CacheStats"]
@@ -4,18 +4,29 @@ import random
 import sys
 import gzip
 
-from collections import defaultdict
+from collections import defaultdict, namedtuple
 try:  # pragma: no cover
     import cPickle as pickle
 except:  # pragma: no cover
     import pickle
-try:  # pragma: no cover
-    from lxml import etree as ET
-except ImportError:  # pragma: no cover
+
+from .lazy import ProxyObject
+
+
+def _load_element_tree():  # pragma: no cover
     try:
-        from xml.etree import cElementTree as ET
-    except:
-        from xml.etree import ElementTree as ET
+        from lxml import etree as ET
+    except ImportError:
+        try:
+            from xml.etree import cElementTree as ET
+        except:
+            from xml.etree import ElementTree as ET
+    return ET
+
+
+# lxml is slow to import and only needed by the XML readers, so defer it
+# until an attribute is first requested
+ET = ProxyObject(_load_element_tree)
 
 try:   # pragma: no cover
     from cStringIO import StringIO
@@ -67,6 +78,35 @@ def opener(obj, mode='r'):
         raise IOError("Can't find a way to open {}".format(obj))
 
 
+def resource_stream(module_name, path):
+    '''
+    Open the data file `path`, given relative to the directory of the module
+    named `module_name`, for reading in binary mode.
+
+    The file is opened directly when it is present on disk, avoiding the cost of
+    importing :mod:`pkg_resources`, which is only used as a fallback for packages
+    that are not installed as plain directories.
+
+    Parameters
+    ----------
+    module_name: str
+        The ``__name__`` of the module the data file belongs to
+    path: str
+        The path to the data file, relative to that module
+
+    Returns
+    -------
+    file-like object
+    '''
+    module_file = getattr(sys.modules.get(module_name), "__file__", None)
+    if module_file is not None:
+        file_path = os.path.join(os.path.dirname(module_file), *path.split("/"))
+        if os.path.exists(file_path):
+            return open(file_path, 'rb')
+    import pkg_resources  # pragma: no cover
+    return pkg_resources.resource_stream(module_name, path)  # pragma: no cover
+
+
 def invert_dict(d):
     return {v: k for k, v in d.items()}
 
@@ -318,3 +358,9 @@ def where(iterable, fn):
 def uid(n=128):
     int_ = random.getrandbits(n)
     return int_
+
+
+#: The counts reported by the caches in :mod:`glypy.io.cache` and
+#: :mod:`glypy.algorithms.similarity`: lookups answered from the cache, lookups
+#: which were not, and the current and maximum number of entries
+CacheStats = namedtuple("CacheStats", ("hits", "misses", "size", "max_size"))
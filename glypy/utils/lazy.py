@@ -25,8 +25,6 @@ class ProxyObject(object):
 
     def _prepare(self):
         self._source = self._initializer()
-        self.__getitem__ = self._source.__getitem__
-        self.__setitem__ = self._source.__setitem__
 
     def __getattribute__(self, name):
         if name in whitelist:
@@ -52,6 +50,21 @@ class ProxyObject(object):
             self._prepare()
         self._source[key] = value
 
+    def __iter__(self):
+        if self._source is None:
+            self._prepare()
+        return iter(self._source)
+
+    def __len__(self):
+        if self._source is None:
+            self._prepare()
+        return len(self._source)
+
+    def __contains__(self, key):
+        if self._source is None:
+            self._prepare()
+        return key in self._source
+
     def __repr__(self):  # pragma: no cover
         rep = r"<ProxyObject>{}{}"
         sep = ""
@@ -65,3 +78,81 @@ class ProxyObject(object):
         if self._source is None:
             self._prepare()
         return dir(self._source)
+
+
+def _clone(obj):
+    return obj.clone()
+
+
+class CopyOnWriteProxy(object):
+    '''A view of a shared object which is only copied when it is about to change.
+
+    Attributes and items are read from :attr:`_shared` without copying it. Assigning
+    or deleting an attribute or item, or looking up one of the methods named in
+    :attr:`_mutators`, first replaces :attr:`_shared` with a private copy made by
+    :attr:`_copier`, so the shared object is never modified through the view.
+
+    The view reports the class of the shared object as its own, so it passes
+    :func:`isinstance` checks. Objects reached through the view, like the members
+    of a container attribute, are still shared and must not be modified in place.
+    '''
+    __slots__ = ("_shared", "_copier", "_mutators", "_copied")
+
+    def __init__(self, shared, copier=_clone, mutators=()):
+        oset(self, "_shared", shared)
+        oset(self, "_copier", copier)
+        oset(self, "_mutators", frozenset(mutators))
+        oset(self, "_copied", False)
+
+    def _copy(self):
+        if not oget(self, "_copied"):
+            oset(self, "_shared", oget(self, "_copier")(oget(self, "_shared")))
+            oset(self, "_copied", True)
+        return oget(self, "_shared")
+
+    def __getattribute__(self, name):
+        if name in oget(self, "_mutators"):
+            return getattr(CopyOnWriteProxy._copy(self), name)
+        return getattr(oget(self, "_shared"), name)
+
+    def __setattr__(self, name, value):
+        setattr(CopyOnWriteProxy._copy(self), name, value)
+
+    def __delattr__(self, name):
+        delattr(CopyOnWriteProxy._copy(self), name)
+
+    def __getitem__(self, key):
+        return oget(self, "_shared")[key]
+
+    def __setitem__(self, key, value):
+        CopyOnWriteProxy._copy(self)[key] = value
+
+    def __delitem__(self, key):
+        del CopyOnWriteProxy._copy(self)[key]
+
+    def __iter__(self):
+        return iter(oget(self, "_shared"))
+
+    def __len__(self):
+        return len(oget(self, "_shared"))
+
+    def __contains__(self, key):
+        return key in oget(self, "_shared")
+
+    def __eq__(self, other):
+        return oget(self, "_shared") == other
+
+    def __ne__(self, other):
+        return oget(self, "_shared") != other
+
+    def __hash__(self):
+        return hash(oget(self, "_shared"))
+
+    def __repr__(self):
+        return repr(oget(self, "_shared"))
+
+    def __str__(self):
+        return str(oget(self, "_shared"))
+
+    def __dir__(self):  # pragma: no cover
+        return dir(oget(self, "_shared"))
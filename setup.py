@@ -1,5 +1,8 @@
+import os
 import sys
+import subprocess
 from setuptools import setup, find_packages, Extension
+from setuptools.command.build_py import build_py
 
 # With gratitude to the SqlAlchemy setup.py authors
 
@@ -83,6 +86,26 @@ class ve_build_ext(build_ext):
 cmdclass['build_ext'] = ve_build_ext
 
 
+class precompile_build_py(build_py):
+    # Precompile the named structure indices into the build so importing glypy
+    # does not need to parse their data files. This is allowed to fail, in which
+    # case they are parsed from their data files whenever they are loaded instead.
+
+    def run(self):
+        build_py.run(self)
+        if self.dry_run:
+            return
+        try:
+            subprocess.check_call(
+                [sys.executable, "-m", "glypy.structure.named_structures"],
+                cwd=os.path.abspath(self.build_lib))
+        except (subprocess.CalledProcessError, OSError):
+            status_msgs("WARNING: The named structure indices could not be precompiled.")
+
+
+cmdclass['build_py'] = precompile_build_py
+
+
 def status_msgs(*msgs):
     print('*' * 75)
     for msg in msgs:
@@ -90,7 +113,11 @@ def status_msgs(*msgs):
     print('*' * 75)
 
 
-required = ["hjson", "six"]
+required = [
+    "hjson", "six",
+    # concurrent.futures backport, used by the sharded database and bulk downloaders
+    'futures; python_version < "3"',
+]
 
 
 extras = {